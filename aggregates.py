@@ -0,0 +1,192 @@
+import json
+import os
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from data_store import fingerprint_matches, load_datasets, source_fingerprint
+
+AGGREGATES_VERSION = 2
+DEFAULT_AGGREGATES_PATH = os.path.join('data', 'aggregates.json')
+DATA_PATHS = ('data/products.csv', 'data/ratings.csv', 'data/users.csv')
+
+TOP_PRODUCT_COLUMNS = ['name', 'category', 'price', 'avg_rating', 'rating_count']
+
+# Outlier points kept per box so the payload does not grow with the catalog
+MAX_BOX_OUTLIERS = 50
+
+
+def category_summary(products_df):
+    """Number of products and average price per category"""
+    stats = products_df.groupby(products_df['category'].astype(str)).agg(
+        product_count=('product_id', 'count'),
+        mean_price=('price', 'mean')
+    )
+    return {
+        'categories': [str(c) for c in stats.index],
+        'product_count': stats['product_count'].tolist(),
+        'mean_price': stats['mean_price'].tolist()
+    }
+
+
+def box_stats(df, column, by=None, max_outliers=MAX_BOX_OUTLIERS):
+    """
+    Box-plot statistics per group in one sorted pass: quartiles (linear
+    interpolation, as pandas and Plotly), mean, whiskers at the most extreme
+    values inside 1.5 IQR of the box, the number of values outside them and
+    an evenly spaced sample of at most max_outliers of those values.
+    Without `by` the whole column is a single group named 'all'.
+    """
+    values = df[column].to_numpy(dtype=np.float64)
+    if by is None:
+        codes, groups = np.zeros(len(values), dtype=np.int64), ['all']
+    else:
+        codes, groups = pd.factorize(df[by].astype(str), sort=True)
+        groups = list(groups)
+    valid = ~np.isnan(values)
+    codes, values = codes[valid], values[valid]
+
+    # Sort once by (group, value); every statistic is then index arithmetic
+    order = np.lexsort((values, codes))
+    values, codes = values[order], codes[order]
+    group_ids = np.arange(len(groups))
+    starts = np.searchsorted(codes, group_ids, side='left')
+    counts = np.searchsorted(codes, group_ids, side='right') - starts
+    present = counts > 0
+    group_ids, starts, counts = group_ids[present], starts[present], counts[present]
+
+    def quantile(q):
+        position = starts + (counts - 1) * q
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        return values[low] + (values[high] - values[low]) * (position - low)
+
+    q1, median, q3 = quantile(0.25), quantile(0.5), quantile(0.75)
+    iqr = q3 - q1
+    low_limit = np.full(len(groups), np.inf)
+    high_limit = np.full(len(groups), -np.inf)
+    low_limit[group_ids] = q1 - 1.5 * iqr
+    high_limit[group_ids] = q3 + 1.5 * iqr
+
+    # Values are ascending within a group, so the values below the lower
+    # limit are a prefix of the group and those above the upper one a suffix
+    below = values < low_limit[codes]
+    above = values > high_limit[codes]
+    n_below = np.bincount(codes[below], minlength=len(groups))[group_ids]
+    n_above = np.bincount(codes[above], minlength=len(groups))[group_ids]
+    sums = np.bincount(codes, weights=values, minlength=len(groups))[group_ids]
+
+    outliers = []
+    for start, count, low_n, high_n in zip(starts, counts, n_below, n_above):
+        positions = np.r_[start:start + low_n, start + count - high_n:start + count]
+        if len(positions) > max_outliers:
+            positions = positions[np.linspace(0, len(positions) - 1, max_outliers).astype(np.int64)]
+        outliers.append(values[positions].tolist())
+
+    return {
+        'groups': [str(groups[g]) for g in group_ids],
+        'count': counts.tolist(),
+        'q1': q1.tolist(),
+        'median': median.tolist(),
+        'q3': q3.tolist(),
+        'lowerfence': values[starts + n_below].tolist(),
+        'upperfence': values[starts + counts - 1 - n_above].tolist(),
+        'mean': (sums / counts).tolist(),
+        'n_outliers': (n_below + n_above).tolist(),
+        'outliers': outliers
+    }
+
+
+def rating_histogram(ratings, bins=10):
+    """Histogram of ratings over the 1-5 scale"""
+    counts, edges = np.histogram(ratings, bins=bins, range=(1, 5))
+    return {'edges': edges.tolist(), 'counts': counts.tolist()}
+
+
+def top_products(products_df, n=10, by='avg_rating'):
+    """Top-N product table rows"""
+    top = products_df.nlargest(n, by)[TOP_PRODUCT_COLUMNS].copy()
+    top['category'] = top['category'].astype(str)
+    return top.round(2).to_dict('records')
+
+
+def compute_aggregates(products_df, ratings_df, users_df):
+    """Compute every aggregate the dashboard renders at startup"""
+    return {
+        'totals': {
+            'products': len(products_df),
+            'categories': int(products_df['category'].nunique()),
+            'users': len(users_df),
+            'ratings': len(ratings_df),
+            'avg_rating': float(ratings_df['rating'].mean()),
+            'avg_price': float(products_df['price'].mean()),
+            'min_price': float(products_df['price'].min()),
+            'max_price': float(products_df['price'].max())
+        },
+        'category_summary': category_summary(products_df),
+        'price_box': box_stats(products_df, 'price', by='category'),
+        'rating_histogram': rating_histogram(ratings_df['rating'].to_numpy()),
+        'top_products': top_products(products_df)
+    }
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def materialize(paths=DATA_PATHS, output_path=DEFAULT_AGGREGATES_PATH):
+    """Compute the aggregates from the source data and write the artifact"""
+    products_df, ratings_df, users_df = load_datasets(*paths)
+    artifact = {
+        'version': AGGREGATES_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'sources': {path: source_fingerprint(path) for path in paths},
+        **compute_aggregates(products_df, ratings_df, users_df)
+    }
+    _write_artifact(artifact, output_path)
+    return artifact
+
+
+def _write_artifact(artifact, path):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(artifact, f, default=_json_default)
+    os.replace(tmp_path, path)
+
+
+def is_stale(artifact, paths=DATA_PATHS):
+    """Whether an artifact was built with another version or from different data"""
+    if artifact.get('version') != AGGREGATES_VERSION:
+        return True
+    sources = artifact.get('sources', {})
+    return any(path not in sources or not fingerprint_matches(path, sources[path]) for path in paths)
+
+
+def load_aggregates(path=DEFAULT_AGGREGATES_PATH, paths=DATA_PATHS):
+    """
+    Load the aggregate artifact, materializing it first if it is missing
+    or out of date with the source data
+    """
+    try:
+        with open(path) as f:
+            artifact = json.load(f)
+    except (OSError, ValueError):
+        artifact = None
+
+    if artifact is None:
+        return materialize(paths, path)
+    mtimes = {p: source.get('mtime_ns') for p, source in artifact.get('sources', {}).items()}
+    if is_stale(artifact, paths):
+        return materialize(paths, path)
+    if any(source['mtime_ns'] != mtimes[p] for p, source in artifact['sources'].items()):
+        # Same content under a new mtime: remember it to skip hashing next time
+        _write_artifact(artifact, path)
+    return artifact
+
+
+if __name__ == "__main__":
+    artifact = materialize()
+    print(f"Aggregates written to {DEFAULT_AGGREGATES_PATH} (version {artifact['version']})")
+    print(f"Products: {artifact['totals']['products']:,}")
+    print(f"Ratings: {artifact['totals']['ratings']:,}")
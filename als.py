@@ -0,0 +1,293 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import scipy.sparse as sp
+from data_store import load_table
+from recommend import ratings_matrix
+
+DEFAULT_MODEL_DIR = os.path.join('data', 'models', 'als')
+
+# Batched solves are bounded to SOLVE_BATCH_CELLS padded ratings and
+# SOLVE_BATCH_ROWS rows, about 16 MB + 32 MB of buffers at 32 factors
+SOLVE_BATCH_CELLS = 65536
+SOLVE_BATCH_ROWS = 4096
+
+# Memory-mapped half-step inputs, opened once per worker process
+_worker_arrays = {}
+
+
+def _shared_array(path):
+    if path not in _worker_arrays:
+        _worker_arrays[path] = np.load(path, mmap_mode='r')
+    return _worker_arrays[path]
+
+
+def solve_rows(indptr, indices, data, fixed, regularization):
+    """
+    Least-squares factors for a run of matrix rows against fixed factors.
+
+    Every row u solves (Y_u^T Y_u + regularization * n_u * I) x = Y_u^T r_u,
+    where Y_u are the fixed factors of the columns the row rated. Rows are
+    batched by rating count; each batch's Y_u are gathered into a zero-padded
+    (rows x max count x factors) array, so the normal equations come from one
+    batched matmul and are solved with one stacked np.linalg.solve call.
+    """
+    n_rows, n_factors = len(indptr) - 1, fixed.shape[1]
+    solved = np.zeros((n_rows, n_factors), dtype=np.float32)
+    counts = np.diff(indptr)
+    identity = np.eye(n_factors)
+
+    # Similar-length rows go together to keep padding small
+    order = np.flatnonzero(counts)
+    order = order[np.argsort(counts[order], kind='stable')]
+
+    i = 0
+    while i < len(order):
+        j = min(len(order), i + SOLVE_BATCH_ROWS, i + max(1, SOLVE_BATCH_CELLS // counts[order[i]]))
+        while j - i > 1 and (j - i) * counts[order[j - 1]] > SOLVE_BATCH_CELLS:
+            j = i + (j - i) // 2
+        rows, i = order[i:j], j
+
+        lengths = counts[rows]
+        batch = np.repeat(np.arange(len(rows)), lengths)
+        position = np.arange(len(batch)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        flat = np.repeat(indptr[rows], lengths) + position
+
+        factors = np.zeros((len(rows), lengths.max(), n_factors))
+        ratings = np.zeros((len(rows), lengths.max()))
+        factors[batch, position] = fixed[indices[flat]]
+        ratings[batch, position] = data[flat]
+
+        gram = np.matmul(factors.transpose(0, 2, 1), factors)
+        gram += regularization * lengths[:, None, None] * identity
+        rhs = np.einsum('blk,bl->bk', factors, ratings)
+        solved[rows] = np.linalg.solve(gram, rhs[:, :, None])[:, :, 0]
+    return solved
+
+
+def _solve_task(matrix_dir, side, fixed_path, row_start, row_stop, regularization):
+    indptr = _shared_array(os.path.join(matrix_dir, f'{side}_indptr.npy'))
+    indices = _shared_array(os.path.join(matrix_dir, f'{side}_indices.npy'))
+    data = _shared_array(os.path.join(matrix_dir, f'{side}_data.npy'))
+    fixed = np.load(fixed_path, mmap_mode='r')
+
+    local_indptr = np.asarray(indptr[row_start:row_stop + 1])
+    start, end = local_indptr[0], local_indptr[-1]
+    return solve_rows(local_indptr - start, indices[start:end], data[start:end], fixed, regularization)
+
+
+class ALSRecommender:
+    """
+    Explicit-feedback matrix factorization trained with alternating least
+    squares on mean-centred ratings.
+
+    Each half-step solves all user (or item) factors against the fixed other
+    side in batched NumPy solves; with n_jobs > 1 the rows are split across a
+    process pool that reads the matrix and fixed factors from memory-mapped
+    .npy files.
+    """
+
+    def __init__(self, factors=32, regularization=0.1, iterations=10, n_jobs=1, seed=0):
+        self.factors = factors
+        self.regularization = regularization
+        self.iterations = iterations
+        self.n_jobs = n_jobs
+        self.seed = seed
+        self.user_ids = None
+        self.item_ids = None
+        self.user_items = None
+        self.user_factors = None
+        self.item_factors = None
+        self.global_mean = 0.0
+
+    def fit(self, ratings_df):
+        """Train user and item factors on a ratings DataFrame"""
+        matrix, self.user_ids, self.item_ids = ratings_matrix(ratings_df)
+        self.user_items = matrix
+        self.global_mean = float(matrix.data.mean()) if matrix.nnz else 0.0
+
+        centered = matrix.copy()
+        centered.data -= self.global_mean
+        sides = {'user': centered, 'item': centered.T.tocsr()}
+
+        rng = np.random.default_rng(self.seed)
+        self.user_factors = (rng.standard_normal((matrix.shape[0], self.factors)) * 0.1).astype(np.float32)
+        self.item_factors = (rng.standard_normal((matrix.shape[1], self.factors)) * 0.1).astype(np.float32)
+
+        work_dir = tempfile.mkdtemp(prefix='als-')
+        try:
+            for side, side_matrix in sides.items():
+                np.save(os.path.join(work_dir, f'{side}_indptr.npy'), side_matrix.indptr)
+                np.save(os.path.join(work_dir, f'{side}_indices.npy'), side_matrix.indices)
+                np.save(os.path.join(work_dir, f'{side}_data.npy'), side_matrix.data)
+
+            pool = ProcessPoolExecutor(self.n_jobs) if self.n_jobs > 1 else None
+            try:
+                for _ in range(self.iterations):
+                    self.user_factors = self._half_step(pool, work_dir, 'user', sides['user'], self.item_factors)
+                    self.item_factors = self._half_step(pool, work_dir, 'item', sides['item'], self.user_factors)
+            finally:
+                if pool is not None:
+                    pool.shutdown()
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return self
+
+    def _half_step(self, pool, work_dir, side, side_matrix, fixed):
+        if pool is None:
+            return solve_rows(side_matrix.indptr, side_matrix.indices, side_matrix.data,
+                              fixed, self.regularization)
+
+        fixed_path = os.path.join(work_dir, f'fixed_{side}.npy')
+        np.save(fixed_path, fixed)
+
+        # Split rows into chunks with about the same number of ratings
+        n_rows = side_matrix.shape[0]
+        n_chunks = min(self.n_jobs * 4, n_rows)
+        targets = np.linspace(0, side_matrix.nnz, n_chunks + 1)
+        bounds = np.unique(np.r_[0, np.searchsorted(side_matrix.indptr, targets[1:-1]), n_rows])
+        futures = [
+            pool.submit(_solve_task, work_dir, side, fixed_path, start, stop, self.regularization)
+            for start, stop in zip(bounds[:-1], bounds[1:])
+        ]
+        return np.vstack([future.result() for future in futures])
+
+    def _index(self, ids, value):
+        i = np.searchsorted(ids, value)
+        return i if i < len(ids) and ids[i] == value else None
+
+    def predict(self, user_ids, product_ids):
+        """Predicted ratings for (user, product) pairs; NaN where either is unknown"""
+        user_ids, product_ids = np.asarray(user_ids), np.asarray(product_ids)
+        u = np.minimum(np.searchsorted(self.user_ids, user_ids), len(self.user_ids) - 1)
+        i = np.minimum(np.searchsorted(self.item_ids, product_ids), len(self.item_ids) - 1)
+        known = (self.user_ids[u] == user_ids) & (self.item_ids[i] == product_ids)
+        predicted = np.einsum('ij,ij->i', self.user_factors[u], self.item_factors[i]) + self.global_mean
+        return np.where(known, predicted, np.nan)
+
+    def recommend_for_user(self, user_id, k=10, exclude_rated=True):
+        """Up to k (product_id, predicted_rating) pairs with the highest predicted rating"""
+        u = self._index(self.user_ids, user_id)
+        if u is None:
+            return []
+        scores = self.item_factors @ self.user_factors[u] + self.global_mean
+        if exclude_rated:
+            scores[self.user_items.indices[self.user_items.indptr[u]:self.user_items.indptr[u + 1]]] = -np.inf
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top = top[np.isfinite(scores[top])]
+        return list(zip(self.item_ids[top].tolist(), scores[top].tolist()))
+
+    def similar_items(self, product_id, k=10):
+        """Up to k (product_id, cosine similarity) pairs in factor space"""
+        i = self._index(self.item_ids, product_id)
+        if i is None:
+            return []
+        norms = np.linalg.norm(self.item_factors, axis=1)
+        scores = self.item_factors @ self.item_factors[i] / np.maximum(norms * norms[i], 1e-12)
+        scores[i] = -np.inf
+        k = min(k, len(scores) - 1)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return list(zip(self.item_ids[top].tolist(), scores[top].tolist()))
+
+    def evaluate(self, test_df, k=10, relevant_rating=4.0, max_users=10000, seed=0):
+        """
+        Held-out RMSE over known (user, product) pairs and recall@k: the share
+        of a user's held-out products rated >= relevant_rating that appear in
+        their top-k recommendations (averaged over up to max_users users)
+        """
+        predicted = self.predict(test_df['user_id'].to_numpy(), test_df['product_id'].to_numpy())
+        known = ~np.isnan(predicted)
+        errors = predicted[known] - test_df['rating'].to_numpy()[known]
+        rmse = float(np.sqrt(np.mean(errors ** 2))) if known.any() else float('nan')
+
+        relevant = test_df[known & (test_df['rating'].to_numpy() >= relevant_rating)]
+        users = relevant['user_id'].unique()
+        if len(users) > max_users:
+            users = np.random.default_rng(seed).choice(users, max_users, replace=False)
+        relevant_by_user = relevant.groupby('user_id')['product_id'].apply(set)
+
+        recalls = []
+        for user_id in users:
+            recommended = {product_id for product_id, _ in self.recommend_for_user(user_id, k)}
+            held_out = relevant_by_user[user_id]
+            recalls.append(len(recommended & held_out) / len(held_out))
+        recall = float(np.mean(recalls)) if recalls else float('nan')
+        return {'rmse': rmse, f'recall@{k}': recall, 'test_ratings': int(known.sum()), 'users': len(users)}
+
+    def save(self, path=DEFAULT_MODEL_DIR):
+        """
+        Write factors, IDs and the rated-items matrix as .npy files, into a
+        new directory that then replaces path, so workers with the old model
+        memory-mapped keep reading its unlinked files
+        """
+        tmp_path = path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        arrays = {
+            'user_ids': self.user_ids,
+            'item_ids': self.item_ids,
+            'user_factors': self.user_factors,
+            'item_factors': self.item_factors,
+            'global_mean': np.array(self.global_mean),
+            'indptr': self.user_items.indptr,
+            'indices': self.user_items.indices,
+            'data': self.user_items.data
+        }
+        for name, array in arrays.items():
+            if array.dtype == object:
+                # String IDs as fixed-width unicode: object arrays cannot be memory-mapped
+                array = array.astype(str)
+            np.save(os.path.join(tmp_path, f'{name}.npy'), array)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_MODEL_DIR, mmap=True):
+        """
+        Load a saved model. With mmap=True the factor matrices are
+        memory-mapped, so worker processes share one copy in the page cache.
+        """
+        mmap_mode = 'r' if mmap else None
+
+        def array(name):
+            return np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+
+        model = cls()
+        model.user_ids = array('user_ids')
+        model.item_ids = array('item_ids')
+        model.user_factors = array('user_factors')
+        model.item_factors = array('item_factors')
+        model.factors = model.user_factors.shape[1]
+        model.global_mean = float(array('global_mean'))
+        model.user_items = sp.csr_matrix(
+            (array('data'), array('indices'), array('indptr')),
+            shape=(len(model.user_ids), len(model.item_ids))
+        )
+        return model
+
+
+def train_test_split(ratings_df, test_fraction=0.2, seed=0):
+    """Random hold-out split of a ratings DataFrame"""
+    test = np.random.default_rng(seed).random(len(ratings_df)) < test_fraction
+    return ratings_df[~test], ratings_df[test]
+
+
+if __name__ == "__main__":
+    ratings_df = load_table('data/ratings.csv')
+    train_df, test_df = train_test_split(ratings_df)
+
+    model = ALSRecommender(n_jobs=os.cpu_count() or 1).fit(train_df)
+    print("Held-out evaluation:")
+    for metric, value in model.evaluate(test_df).items():
+        print(f"- {metric}: {value}")
+
+    model = ALSRecommender(n_jobs=os.cpu_count() or 1).fit(ratings_df)
+    model.save()
+    print(f"\nALS model saved to {DEFAULT_MODEL_DIR}")
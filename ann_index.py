@@ -0,0 +1,287 @@
+import json
+import os
+import shutil
+import numpy as np
+
+DEFAULT_INDEX_DIR = os.path.join('data', 'models', 'ann')
+
+# Pending (not yet clustered) vectors are merged into the inverted lists once
+# they exceed this share of the index
+COMPACT_FRACTION = 0.05
+
+
+def kmeans(vectors, n_clusters, iterations=20, sample_size=None, seed=0, chunk_size=65536):
+    """
+    Lloyd's k-means in NumPy. Centroids are trained on a random sample of at
+    most sample_size vectors (default 256 per cluster); empty clusters are
+    re-seeded from random sample points.
+    """
+    rng = np.random.default_rng(seed)
+    sample_size = sample_size or 256 * n_clusters
+    if len(vectors) > sample_size:
+        vectors = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    vectors = np.asarray(vectors, dtype=np.float32)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+
+    for _ in range(iterations):
+        labels = assign(vectors, centroids, chunk_size)
+        counts = np.bincount(labels, minlength=n_clusters)
+        sums = np.zeros_like(centroids, dtype=np.float64)
+        for dim in range(vectors.shape[1]):
+            sums[:, dim] = np.bincount(labels, weights=vectors[:, dim], minlength=n_clusters)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        centroids[empty] = vectors[rng.choice(len(vectors), empty.sum())]
+    return centroids
+
+
+def assign(vectors, centroids, chunk_size=65536):
+    """Index of the nearest (L2) centroid for every vector, computed in chunks"""
+    half_norms = 0.5 * np.einsum('ij,ij->i', centroids, centroids)
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk_size):
+        chunk = np.asarray(vectors[start:start + chunk_size], dtype=np.float32)
+        labels[start:start + chunk_size] = np.argmax(chunk @ centroids.T - half_norms, axis=1)
+    return labels
+
+
+def _top_k(scores, k):
+    k = min(k, len(scores))
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest-neighbour index.
+
+    Vectors are clustered with k-means and stored grouped by cluster, so a
+    query scores only the n_probe clusters whose centroids match it best.
+    n_probe trades recall for latency. Scores are inner products
+    (metric='ip', for factor models), cosine similarities (metric='cosine')
+    or negated squared L2 distances (metric='l2'); higher is always better.
+    For inner products, vectors get an extra component sqrt(M^2 - |x|^2)
+    (M the largest norm) and queries a zero, which turns the search into a
+    nearest-neighbour one that k-means lists suit. New vectors go to a
+    pending buffer that is scanned exhaustively until it is merged into the
+    lists.
+    """
+
+    def __init__(self, n_lists=None, n_probe=8, metric='ip', seed=0, max_norm=None):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.metric = metric
+        self.seed = seed
+        self.max_norm = max_norm
+        self.centroids = None
+        self.vectors = None
+        self.ids = None
+        self.offsets = None
+        self.pending_vectors = None
+        self.pending_ids = None
+
+    @property
+    def dim(self):
+        """Dimension of the indexed (and query) vectors"""
+        return self.centroids.shape[1] - (self.metric == 'ip')
+
+    def _prepare(self, vectors, queries=False):
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if self.metric == 'cosine':
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.maximum(norms, 1e-12)
+        elif self.metric == 'ip':
+            if queries:
+                extra = np.zeros(len(vectors), dtype=np.float32)
+            else:
+                # Vectors added later with a larger norm are clipped to zero
+                squared_norms = np.einsum('ij,ij->i', vectors, vectors)
+                extra = np.sqrt(np.maximum(self.max_norm ** 2 - squared_norms, 0))
+            vectors = np.hstack([vectors, extra[:, None].astype(np.float32)])
+        return vectors
+
+    def build(self, vectors, ids):
+        """Train centroids and fill the inverted lists"""
+        if self.metric == 'ip':
+            self.max_norm = float(np.linalg.norm(np.asarray(vectors, dtype=np.float32), axis=1).max())
+        vectors = self._prepare(vectors)
+        ids = np.asarray(ids)
+        if self.n_lists is None:
+            self.n_lists = max(1, int(np.sqrt(len(vectors))))
+        self.n_lists = min(self.n_lists, len(vectors))
+        self.centroids = kmeans(vectors, self.n_lists, seed=self.seed)
+        self.pending_vectors = np.empty((0, vectors.shape[1]), dtype=np.float32)
+        self.pending_ids = ids[:0]
+        self._fill(vectors, ids)
+        return self
+
+    def _fill(self, vectors, ids):
+        labels = assign(vectors, self.centroids)
+        order = np.argsort(labels, kind='stable')
+        self.vectors = vectors[order]
+        self.ids = ids[order]
+        self.offsets = np.searchsorted(labels[order], np.arange(self.n_lists + 1))
+
+    def add(self, vectors, ids):
+        """Insert new vectors without retraining the centroids"""
+        self.pending_vectors = np.vstack([self.pending_vectors, self._prepare(vectors)])
+        self.pending_ids = np.concatenate([self.pending_ids, np.asarray(ids)])
+        if len(self.pending_ids) > COMPACT_FRACTION * len(self.ids):
+            self.compact()
+
+    def compact(self):
+        """Merge pending vectors into the inverted lists"""
+        if len(self.pending_ids) == 0:
+            return
+        self._fill(np.vstack([self.vectors, self.pending_vectors]),
+                   np.concatenate([self.ids, self.pending_ids]))
+        self.pending_vectors = self.pending_vectors[:0]
+        self.pending_ids = self.pending_ids[:0]
+
+    def __len__(self):
+        return len(self.ids) + len(self.pending_ids)
+
+    def _empty_ids(self, shape):
+        # Wide enough for pending IDs too (longer strings, say)
+        dtype = np.result_type(self.ids, self.pending_ids)
+        return np.full(shape, '' if dtype.kind in 'OSU' else -1, dtype=dtype)
+
+    def _score(self, candidates, query):
+        if self.metric == 'l2':
+            diff = candidates - query
+            return -np.einsum('ij,ij->i', diff, diff)
+        return candidates @ query
+
+    def search(self, queries, k=10, n_probe=None):
+        """
+        Approximate top-k for each query row. Returns (ids, scores) arrays of
+        shape (n_queries, k), ids in the indexed IDs' dtype. Missing results
+        have score -inf (see found()) and ID -1, or '' for string IDs.
+        """
+        queries = self._prepare(queries, queries=True)
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        # Probe the lists with the nearest centroids, matching the k-means assignment
+        centroid_scores = 2 * queries @ self.centroids.T - np.einsum('ij,ij->i', self.centroids, self.centroids)
+
+        result_ids = self._empty_ids((len(queries), k))
+        result_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for q, query in enumerate(queries):
+            probes = _top_k(centroid_scores[q], n_probe)
+            slices = [slice(self.offsets[p], self.offsets[p + 1]) for p in probes]
+            candidates = np.concatenate([self.vectors[s] for s in slices] + [self.pending_vectors])
+            candidate_ids = np.concatenate([self.ids[s] for s in slices] + [self.pending_ids])
+            scores = self._score(candidates, query)
+            top = _top_k(scores, k)
+            result_ids[q, :len(top)] = candidate_ids[top]
+            result_scores[q, :len(top)] = scores[top]
+        return result_ids, result_scores
+
+    def brute_force_search(self, queries, k=10):
+        """Exact top-k over every indexed vector, for recall measurements"""
+        queries = self._prepare(queries, queries=True)
+        vectors = np.vstack([self.vectors, self.pending_vectors])
+        ids = np.concatenate([self.ids, self.pending_ids])
+        result_ids = self._empty_ids((len(queries), k))
+        result_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for q, query in enumerate(queries):
+            scores = self._score(vectors, query)
+            top = _top_k(scores, k)
+            result_ids[q, :len(top)] = ids[top]
+            result_scores[q, :len(top)] = scores[top]
+        return result_ids, result_scores
+
+    def save(self, path=DEFAULT_INDEX_DIR):
+        """
+        Write the index (pending vectors merged) as .npy files plus metadata.
+        Files are written to a new directory that then replaces path, so an
+        index memory-mapped from path keeps reading the old, unlinked files.
+        """
+        self.compact()
+        tmp_path = path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name in ['centroids', 'vectors', 'ids', 'offsets']:
+            values = getattr(self, name)
+            if values.dtype == object:
+                values = values.astype(str)
+            np.save(os.path.join(tmp_path, f'{name}.npy'), values)
+        with open(os.path.join(tmp_path, 'index.json'), 'w') as f:
+            json.dump({'n_lists': self.n_lists, 'n_probe': self.n_probe,
+                       'metric': self.metric, 'seed': self.seed, 'max_norm': self.max_norm}, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_INDEX_DIR, mmap=True):
+        """Load a saved index; the vector store is memory-mapped unless mmap=False"""
+        with open(os.path.join(path, 'index.json')) as f:
+            index = cls(**json.load(f))
+        mmap_mode = 'r' if mmap else None
+        for name in ['centroids', 'vectors', 'ids', 'offsets']:
+            setattr(index, name, np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode))
+        index.pending_vectors = np.empty((0, index.vectors.shape[1]), dtype=np.float32)
+        index.pending_ids = np.asarray(index.ids[:0])
+        return index
+
+
+def found(scores):
+    """Which slots of a search result hold a result (not padding)"""
+    return np.isfinite(scores)
+
+
+def recall_at_k(approximate, exact):
+    """
+    Mean share of the exact top-k found by the approximate search; both are
+    (ids, scores) results of search / brute_force_search
+    """
+    (approximate_ids, approximate_scores), (exact_ids, exact_scores) = approximate, exact
+    hits = [len(set(a[found(sa)].tolist()) & set(e[found(se)].tolist())) / max(1, found(se).sum())
+            for a, sa, e, se in zip(approximate_ids, approximate_scores, exact_ids, exact_scores)]
+    return float(np.mean(hits))
+
+
+def product_feature_vectors(products_df, n_components=8):
+    """
+    Dense product vectors from the catalogue: standardized price, rating and
+    log rating count plus one-hot categories, reduced with PCA
+    """
+    import pandas as pd
+    from sklearn.decomposition import PCA
+    from sklearn.preprocessing import StandardScaler
+
+    numeric = pd.DataFrame({
+        'price': np.log1p(products_df['price']),
+        'avg_rating': products_df['avg_rating'],
+        'rating_count': np.log1p(products_df['rating_count'])
+    }).fillna(0)
+    features = np.hstack([
+        StandardScaler().fit_transform(numeric),
+        pd.get_dummies(products_df['category'].astype(str)).to_numpy(dtype=np.float64)
+    ])
+    n_components = min(n_components, features.shape[1])
+    return PCA(n_components=n_components, random_state=0).fit_transform(features).astype(np.float32)
+
+
+if __name__ == "__main__":
+    from als import DEFAULT_MODEL_DIR as ALS_MODEL_DIR, ALSRecommender
+
+    if os.path.exists(os.path.join(ALS_MODEL_DIR, 'item_factors.npy')):
+        model = ALSRecommender.load(ALS_MODEL_DIR)
+        vectors, ids, metric = model.item_factors, model.item_ids, 'ip'
+        print(f"Indexing {len(ids):,} ALS item factors")
+    else:
+        from data_store import load_table
+        products_df = load_table('data/products.csv')
+        vectors, ids, metric = product_feature_vectors(products_df), products_df['product_id'].to_numpy(), 'cosine'
+        print(f"Indexing {len(ids):,} product feature vectors (no ALS model found)")
+
+    index = IVFIndex(metric=metric).build(vectors, ids)
+    index.save()
+
+    queries = np.asarray(vectors[:200])
+    approximate = index.search(queries)
+    exact = index.brute_force_search(queries)
+    print(f"Index saved to {DEFAULT_INDEX_DIR} ({index.n_lists} lists, n_probe={index.n_probe})")
+    print(f"recall@10 on 200 queries: {recall_at_k(approximate, exact):.3f}")
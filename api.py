@@ -0,0 +1,258 @@
+import argparse
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+from flask import Flask, jsonify, request
+from als import DEFAULT_MODEL_DIR, ALSRecommender
+from ann_index import DEFAULT_INDEX_DIR, IVFIndex, found
+from data_store import load_table
+
+DEFAULT_PORT = 8054
+DEFAULT_K = 10
+MAX_K = 100
+MAX_BATCH = 64
+MAX_WAIT_MS = 1.0
+POPULAR_COLUMNS = ['product_id', 'name', 'category', 'price', 'avg_rating', 'rating_count']
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests into batches for one vectorized call.
+
+    submit() blocks until the batch containing the item has been handled.
+    A batch is dispatched once it holds max_batch items or the first item
+    has waited max_wait_ms. If the handler raises, the batch is rerun item
+    by item, so the error reaches only the requests that cause it. The
+    worker thread is started lazily so it also exists in processes forked
+    after the batcher was created.
+    """
+
+    def __init__(self, handler, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.handler = handler
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._lock = threading.Lock()
+        self._queue = None
+        self._pid = None
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, item):
+        if self._pid != os.getpid():
+            self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future))
+        return future.result()
+
+    def _run(self):
+        pending = self._queue
+        while True:
+            batch = [pending.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    batch.append(pending.get(timeout=timeout) if timeout > 0 else pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                results = self.handler([item for item, _ in batch])
+            except Exception:
+                # Rerun the items one by one so a bad request fails only itself
+                for item, future in batch:
+                    self._run_one(item, future)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def _run_one(self, item, future):
+        try:
+            future.set_result(self.handler([item])[0])
+        except Exception as e:
+            future.set_exception(e)
+
+
+class RecommendationService:
+    """
+    Batched scoring over a memory-mapped ALS model, optionally using the ANN
+    index for user recommendations. Every request handler takes a list of
+    (id, k) pairs and returns one list of results per pair, or None for
+    unknown IDs.
+    """
+
+    def __init__(self, model, index=None, products_df=None):
+        self.model = model
+        self.index = index
+        norms = np.linalg.norm(model.item_factors, axis=1, keepdims=True)
+        self.unit_item_factors = model.item_factors / np.maximum(norms, 1e-12)
+        self.popular = {}
+        if products_df is not None:
+            self._rank_popular(products_df)
+
+    def _rank_popular(self, products_df, limit=MAX_K):
+        score = products_df['avg_rating'] * np.log1p(products_df['rating_count'])
+        ranked = products_df.assign(_score=score).sort_values('_score', ascending=False)
+        self.popular[None] = ranked[POPULAR_COLUMNS].head(limit).to_dict('records')
+        for category, group in ranked.groupby(ranked['category'].astype(str), sort=False):
+            self.popular[category] = group[POPULAR_COLUMNS].head(limit).to_dict('records')
+
+    def _lookup(self, ids, values):
+        """Positions of URL path IDs in a sorted ID array, and which were found"""
+        valid = np.ones(len(values), dtype=bool)
+        if ids.dtype.kind == 'U':
+            # String IDs keep their own width, so a longer one is not truncated into a match
+            parsed = np.asarray(values, dtype=str)
+        else:
+            parsed = np.zeros(len(values), dtype=ids.dtype)
+            for i, value in enumerate(values):
+                try:
+                    parsed[i] = value
+                except (ValueError, OverflowError):
+                    valid[i] = False
+        positions = np.minimum(np.searchsorted(ids, parsed), len(ids) - 1)
+        return positions, valid & (ids[positions] == parsed)
+
+    def _rated(self, u):
+        items = self.model.user_items
+        return items.indices[items.indptr[u]:items.indptr[u + 1]]
+
+    def recommend_users(self, requests):
+        """Top-k unrated products for each (user_id, k) request"""
+        model = self.model
+        users, known = self._lookup(model.user_ids, [user_id for user_id, _ in requests])
+        results = [None] * len(requests)
+        rows = np.flatnonzero(known)
+        if len(rows) == 0:
+            return results
+        k_max = max(requests[r][1] for r in rows)
+        rated = [self._rated(users[r]) for r in rows]
+        vectors = np.asarray(model.user_factors[users[rows]])
+
+        if self.index is not None:
+            # Over-fetch so that dropping already-rated items still leaves k
+            extra = max(len(r) for r in rated)
+            candidates, scores = self.index.search(vectors, k=k_max + extra)
+            for row, items, ids, row_scores in zip(rows, rated, candidates, scores):
+                keep = found(row_scores) & ~np.isin(ids, model.item_ids[items])
+                results[row] = [{'product_id': p, 'score': s + model.global_mean} for p, s in
+                                zip(ids[keep][:requests[row][1]].tolist(), row_scores[keep][:requests[row][1]].tolist())]
+            return results
+
+        scores = vectors @ np.asarray(model.item_factors).T
+        scores[np.repeat(np.arange(len(rows)), [len(r) for r in rated]), np.concatenate(rated)] = -np.inf
+        k_max = min(k_max, scores.shape[1])
+        top = np.argpartition(-scores, k_max - 1, axis=1)[:, :k_max]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top, top_scores = np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+        for i, row in enumerate(rows):
+            k = requests[row][1]
+            finite = np.isfinite(top_scores[i, :k])
+            results[row] = [{'product_id': p, 'score': s + model.global_mean} for p, s in
+                            zip(model.item_ids[top[i, :k][finite]].tolist(), top_scores[i, :k][finite].tolist())]
+        return results
+
+    def similar_products(self, requests):
+        """Top-k products by factor cosine similarity for each (product_id, k) request"""
+        model = self.model
+        items, known = self._lookup(model.item_ids, [product_id for product_id, _ in requests])
+        results = [None] * len(requests)
+        rows = np.flatnonzero(known)
+        if len(rows) == 0:
+            return results
+        scores = self.unit_item_factors[items[rows]] @ self.unit_item_factors.T
+        scores[np.arange(len(rows)), items[rows]] = -np.inf
+        k_max = min(max(requests[r][1] for r in rows), scores.shape[1] - 1)
+        if k_max <= 0:
+            return [[] if known[r] else None for r in range(len(requests))]
+        top = np.argpartition(-scores, k_max - 1, axis=1)[:, :k_max]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top, top_scores = np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+        for i, row in enumerate(rows):
+            k = requests[row][1]
+            results[row] = [{'product_id': p, 'score': s} for p, s in
+                            zip(model.item_ids[top[i, :k]].tolist(), top_scores[i, :k].tolist())]
+        return results
+
+    def popular_products(self, category=None, k=DEFAULT_K):
+        """Top-k products by popularity score, overall or within a category"""
+        products = self.popular.get(category)
+        return None if products is None else products[:k]
+
+
+def create_app(model_dir=DEFAULT_MODEL_DIR, index_dir=DEFAULT_INDEX_DIR, products_path='data/products.csv',
+               max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+    """
+    Build the API. The ALS model and ANN index are memory-mapped, so worker
+    processes serving the same artifacts share them through the page cache.
+    The index is used only if it was built over this model's item factors.
+    """
+    model = ALSRecommender.load(model_dir)
+    index = None
+    if os.path.exists(os.path.join(index_dir, 'index.json')):
+        index = IVFIndex.load(index_dir)
+        if index.metric != 'ip' or index.dim != model.factors:
+            index = None
+    service = RecommendationService(model, index, load_table(products_path))
+    recommend_batcher = MicroBatcher(service.recommend_users, max_batch, max_wait_ms)
+    similar_batcher = MicroBatcher(service.similar_products, max_batch, max_wait_ms)
+
+    app = Flask(__name__)
+
+    def requested_k():
+        return max(1, min(request.args.get('k', DEFAULT_K, type=int), MAX_K))
+
+    def not_found(message):
+        return jsonify({'error': message}), 404
+
+    @app.route('/recommend/user/<user_id>')
+    def recommend_user(user_id):
+        results = recommend_batcher.submit((user_id, requested_k()))
+        if results is None:
+            return not_found(f"Unknown user {user_id}")
+        return jsonify({'user_id': user_id, 'recommendations': results})
+
+    @app.route('/similar/<product_id>')
+    def similar(product_id):
+        results = similar_batcher.submit((product_id, requested_k()))
+        if results is None:
+            return not_found(f"Unknown product {product_id}")
+        return jsonify({'product_id': product_id, 'similar': results})
+
+    @app.route('/popular')
+    def popular():
+        # An empty ?category= means all categories, like leaving it out
+        category = request.args.get('category') or None
+        results = service.popular_products(category, requested_k())
+        if results is None:
+            return not_found(f"Unknown category {category}")
+        return jsonify({'category': category, 'products': results})
+
+    @app.route('/health')
+    def health():
+        return jsonify({'status': 'ok', 'users': len(model.user_ids), 'products': len(model.item_ids),
+                        'ann_index': index is not None})
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recommendation API")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--model-dir', default=DEFAULT_MODEL_DIR)
+    parser.add_argument('--index-dir', default=DEFAULT_INDEX_DIR)
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH, help="1 disables batching")
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    app = create_app(args.model_dir, args.index_dir, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    app.run(port=args.port, threaded=True)
@@ -0,0 +1,1337 @@
+import argparse
+import email.utils
+import http.server
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+DATA_FILES = ['data/products.csv', 'data/ratings.csv', 'data/users.csv']
+
+# Benchmark suite runs are appended here, one JSON object per line
+SUITE_HISTORY_PATH = 'benchmark_history.jsonl'
+
+# Import-time budgets (ms, cumulative `python -X importtime`) per module, and
+# heavy modules each one must not load at import. dashboard includes its
+# data loading and layout, which run at import.
+IMPORT_BUDGETS_MS = {
+    'product_analysis': 800,
+    'rating_stats': 800,
+    'api': 1100,
+    'dashboard': 1800
+}
+IMPORT_FORBIDDEN = {
+    'product_analysis': ['matplotlib', 'seaborn', 'sklearn'],
+    'rating_stats': ['matplotlib', 'sklearn'],
+    'api': ['matplotlib', 'sklearn', 'dash'],
+    'dashboard': ['matplotlib', 'seaborn', 'sklearn', 'plotly.express']
+}
+
+IMPORT_CHILD = """
+import json, sys
+# An import statement, so -X importtime reports the module itself
+exec(f'import {sys.argv[1]}')
+print(json.dumps([name for name in sys.argv[2:] if name in sys.modules]))
+"""
+
+# Child-process snippet for load measurements; each run gets a fresh
+# interpreter so peak RSS is not polluted by earlier runs.
+LOAD_CHILD = """
+import json, resource, sys, time
+import pandas as pd
+from data_store import load_datasets
+mode, cache_dir = sys.argv[1], sys.argv[2]
+paths = sys.argv[3:]
+rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+if mode == 'csv':
+    frames = [pd.read_csv(p) for p in paths]
+else:
+    frames = load_datasets(*paths, cache_dir=cache_dir)
+elapsed = time.perf_counter() - start
+rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({
+    'seconds': elapsed,
+    'peak_rss_mb': rss_after / 1024,
+    'load_rss_mb': (rss_after - rss_before) / 1024,
+    'rows': sum(len(f) for f in frames)
+}))
+"""
+
+
+# Synthetic ratings with a long-tailed item popularity, shared by child snippets
+SYNTHETIC_RATINGS = """
+import numpy as np
+import pandas as pd
+
+def synthetic_ratings(n, seed=0):
+    rng = np.random.default_rng(seed)
+    n_users, n_items = max(n // 10, 100), max(n // 50, 100)
+    popularity = rng.lognormal(0, 1.5, n_items)
+    return pd.DataFrame({
+        'user_id': rng.integers(0, n_users, n),
+        'product_id': rng.choice(n_items, n, p=popularity / popularity.sum()),
+        'rating': rng.integers(1, 6, n).astype(np.float32)
+    })
+"""
+
+# Child-process snippet for recommender builds: build time, peak RSS and
+# lookup latency
+RECOMMEND_CHILD = SYNTHETIC_RATINGS + """
+import json, resource, sys, time
+from recommend import ItemItemRecommender
+n = int(sys.argv[1])
+rng = np.random.default_rng(0)
+ratings_df = synthetic_ratings(n)
+rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+model = ItemItemRecommender().fit(ratings_df)
+build = time.perf_counter() - start
+rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def latency(fn, ids):
+    times = []
+    for i in ids:
+        t = time.perf_counter()
+        fn(i, 10)
+        times.append(time.perf_counter() - t)
+    return float(np.median(times)) * 1e6
+
+print(json.dumps({
+    'ratings': n,
+    'build_seconds': build,
+    'peak_rss_mb': rss_after / 1024,
+    'build_rss_mb': (rss_after - rss_before) / 1024,
+    'similar_us': latency(model.similar_items, rng.choice(model.item_ids, 1000)),
+    'recommend_us': latency(model.recommend_for_user, rng.choice(model.user_ids, 1000))
+}))
+"""
+
+
+# Child-process snippet for ALS training: fit time and held-out accuracy for
+# one (processes, factors, iterations) setting; BLAS threads come from the env
+ALS_CHILD = SYNTHETIC_RATINGS + """
+import json, sys, time
+from als import ALSRecommender, train_test_split
+from data_store import load_table
+source, n_jobs, factors, iterations = sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4])
+ratings_df = load_table(source) if not source.isdigit() else synthetic_ratings(int(source))
+train_df, test_df = train_test_split(ratings_df)
+start = time.perf_counter()
+model = ALSRecommender(factors=factors, iterations=iterations, n_jobs=n_jobs).fit(train_df)
+fit = time.perf_counter() - start
+print(json.dumps({'fit_seconds': fit, **model.evaluate(test_df)}))
+"""
+
+
+# Child-process snippet for the ANN index: build time and memory, then
+# recall@10 against exact search and single-query QPS per n_probe
+ANN_CHILD = """
+import json, resource, sys, time
+import numpy as np
+from ann_index import IVFIndex, recall_at_k
+n, dim, n_queries = int(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3])
+probes = [int(p) for p in sys.argv[4].split(',')]
+rng = np.random.default_rng(0)
+# Clustered vectors, shaped like learned item factors
+centers = rng.standard_normal((256, dim)).astype(np.float32)
+vectors = centers[rng.integers(0, 256, n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+queries = centers[rng.integers(0, 256, n_queries)] + 0.5 * rng.standard_normal((n_queries, dim)).astype(np.float32)
+
+rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+index = IVFIndex().build(vectors, np.arange(n))
+build = time.perf_counter() - start
+rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+start = time.perf_counter()
+exact = index.brute_force_search(queries)
+runs = [{'n_probe': 'exact', 'recall@10': 1.0, 'qps': n_queries / (time.perf_counter() - start)}]
+for n_probe in probes:
+    start = time.perf_counter()
+    approximate = index.search(queries, n_probe=n_probe)
+    qps = n_queries / (time.perf_counter() - start)
+    runs.append({'n_probe': n_probe, 'recall@10': recall_at_k(approximate, exact), 'qps': qps})
+print(json.dumps({'vectors': n, 'n_lists': index.n_lists, 'build_seconds': build,
+                  'build_rss_mb': (rss_after - rss_before) / 1024, 'runs': runs}))
+"""
+
+
+# Child-process snippet for the synthetic data generator: throughput and
+# peak RSS for one rating count, single stream (workers=0) or sharded
+GENERATE_CHILD = """
+import json, os, resource, shutil, sys, tempfile, time
+from generate_real_data import generate_realistic_dataset, generate_sharded_dataset
+n_ratings, scale, workers = int(sys.argv[1]), float(sys.argv[2]), int(sys.argv[3])
+output_dir = tempfile.mkdtemp(prefix='bench-generate-')
+start = time.perf_counter()
+if workers:
+    counts = generate_sharded_dataset(scale, n_ratings, seed=0, output_dir=output_dir, workers=workers)
+else:
+    counts = generate_realistic_dataset(scale, n_ratings, seed=0, output_dir=output_dir)
+elapsed = time.perf_counter() - start
+size = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(output_dir) for f in files)
+shutil.rmtree(output_dir)
+print(json.dumps({'ratings': counts['ratings'], 'seconds': elapsed, 'bytes': size,
+                  'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+# Child-process snippets for the Amazon preprocessing: the previous
+# whole-file version and the streaming process_dataset
+LEGACY_PREPROCESS_CHILD = """
+import json, os, resource, sys, time
+import numpy as np
+import pandas as pd
+raw_path, output_dir = sys.argv[1], sys.argv[2]
+start = time.perf_counter()
+df = pd.read_csv(raw_path)
+df['price'] = df['price'].str.replace('$', '').str.replace(',', '').astype(float)
+df['rating'] = pd.to_numeric(df['rating'], errors='coerce')
+df['rating_count'] = df['rating_count'].str.replace(',', '').astype(float)
+df['main_category'] = df['category'].str.split('|').str[0]
+df = df[(df['price'] > 0) & (df['price'] < 10000) & (df['rating'].notna()) & (df['rating_count'] > 10)]
+top_categories = df['main_category'].value_counts().nlargest(10).index
+df = df[df['main_category'].isin(top_categories)]
+products_df = df[['product_id', 'product_name', 'main_category', 'price',
+                  'rating', 'rating_count', 'description']].copy()
+products_df.columns = ['product_id', 'name', 'category', 'price', 'avg_rating', 'rating_count', 'description']
+n_users, n_ratings = 10000, 50000
+users_df = pd.DataFrame({'user_id': range(1, n_users + 1),
+                         'name': [f"User_{i}" for i in range(1, n_users + 1)],
+                         'email': [f"user_{i}@example.com" for i in range(1, n_users + 1)]})
+np.random.seed(42)
+ratings_df = pd.DataFrame({
+    'user_id': np.random.choice(users_df['user_id'], n_ratings),
+    'product_id': np.random.choice(products_df['product_id'], n_ratings),
+    'rating': np.random.normal(products_df['avg_rating'].mean(), 0.5, n_ratings).clip(1, 5).round(1),
+    'timestamp': pd.date_range(start='2023-01-01', end='2024-12-31', periods=n_ratings)
+})
+products_df.to_csv(os.path.join(output_dir, 'products.csv'), index=False)
+users_df.to_csv(os.path.join(output_dir, 'users.csv'), index=False)
+ratings_df.to_csv(os.path.join(output_dir, 'ratings.csv'), index=False)
+print(json.dumps({'seconds': time.perf_counter() - start,
+                  'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+PREPROCESS_CHILD = """
+import json, resource, sys, time
+from download_data import process_dataset
+raw_path, output_dir, chunk_size = sys.argv[1], sys.argv[2], int(sys.argv[3])
+start = time.perf_counter()
+process_dataset(raw_path, output_dir, chunk_size)
+print(json.dumps({'seconds': time.perf_counter() - start,
+                  'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+# Child-process snippet for downloads: old one-shot requests.get or the
+# streaming downloader, for a JSON spec of files and workers
+DOWNLOAD_CHILD = """
+import json, resource, sys, time
+import requests
+from download_data import download_files
+spec = json.loads(sys.argv[1])
+start = time.perf_counter()
+try:
+    if spec['legacy']:
+        statuses = {}
+        for file in spec['files']:
+            response = requests.get(file['url'])
+            with open(file['path'], 'wb') as f:
+                f.write(response.content)
+            statuses[file['path']] = 'downloaded'
+    else:
+        statuses = download_files(spec['files'], spec['workers'])
+except Exception as e:
+    statuses = {'error': str(e)}
+print(json.dumps({'seconds': time.perf_counter() - start, 'statuses': statuses,
+                  'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+# Child-process snippets for the scatter benchmark: one generates a dataset
+# of about argv[1] products, one imports the dashboard over it and times the
+# initial scatter figure as the dashboard builds and serializes it
+SCATTER_GENERATE_CHILD = """
+import json, sys
+from generate_real_data import CATEGORIES, PRODUCTS_PER_CATEGORY, generate_realistic_dataset
+products_at_scale_1 = len(CATEGORIES) * sum(PRODUCTS_PER_CATEGORY) / 2
+generate_realistic_dataset(scale=int(sys.argv[1]) / products_at_scale_1, n_ratings=int(sys.argv[2]), seed=0,
+                           output_dir='data')
+print(json.dumps({}))
+"""
+
+SCATTER_CHILD = """
+import json, sys, time
+import plotly.io as pio
+import dashboard as d
+mode, repeat = sys.argv[1], int(sys.argv[2])
+if mode == 'full':
+    d.SCATTER_MAX_POINTS = len(d.products_df)
+times = []
+for _ in range(repeat):
+    d.filtered_scatter_traces.cache_clear()
+    start = time.perf_counter()
+    traces = d.filtered_scatter_traces(d.UNFILTERED)
+    payload = pio.to_json(d.category_performance_figure(traces))
+    times.append(time.perf_counter() - start)
+print(json.dumps({'products': len(d.products_df), 'trace': d.ScatterTrace.__name__,
+                  'points': sum(len(t['x']) for t in traces), 'payload_bytes': len(payload),
+                  'seconds': min(times)}))
+"""
+
+
+# Child-process snippets for the benchmark suite. Each runs in a directory
+# holding a generated data/ tree: one generates it (and warms the columnar
+# cache of the tables named after the rating count), one runs the analysis
+# pipeline with a PhaseRecorder, and one imports the dashboard and times its
+# figure builders and filter callbacks.
+SUITE_GENERATE_CHILD = """
+import json, os, sys, time
+from generate_real_data import generate_realistic_dataset
+from data_store import load_table
+from id_index import load_ratings_index
+from time_partitions import load_manifest
+n_ratings = int(sys.argv[1])
+start = time.perf_counter()
+generate_realistic_dataset(n_ratings=n_ratings, seed=0, output_dir='data')
+generate_seconds = time.perf_counter() - start
+start = time.perf_counter()
+for table in sys.argv[2:]:
+    load_table(os.path.join('data', table + '.csv'))
+if {'products', 'ratings'} <= set(sys.argv[2:]):
+    load_ratings_index()
+    load_manifest()
+print(json.dumps({'generate_seconds': generate_seconds, 'cache_seconds': time.perf_counter() - start}))
+"""
+
+SUITE_ANALYSIS_CHILD = """
+import json
+from instrumentation import PhaseRecorder
+from product_analysis import ProductAnalysis
+recorder = PhaseRecorder(trace_memory=False)
+ProductAnalysis().run_full_analysis('data/products.csv', 'data/ratings.csv', 'data/users.csv', recorder=recorder)
+print(json.dumps(recorder.report()))
+"""
+
+SUITE_DASHBOARD_CHILD = """
+import json, resource, sys, time
+start = time.perf_counter()
+import dashboard as d
+import_seconds = time.perf_counter() - start
+repeat = int(sys.argv[1])
+
+def clear_caches():
+    for value in vars(d).values():
+        if hasattr(value, 'cache_clear'):
+            value.cache_clear()
+
+def best(fn):
+    times = []
+    for _ in range(repeat):
+        clear_caches()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+low, high = int(d.totals['min_price']), int(d.totals['max_price'])
+categories = d.aggregates['category_summary']['categories']
+filters = [([low, high], categories[:3]), ([low + 20, high // 2], []), ([low, low + (high - low) // 4], categories[1:2])]
+
+def update_filters():
+    for price_range, selected in filters:
+        d.update_filters(price_range, selected, {})
+
+def filter_chain():
+    # A filter change: the filter callback, then every chart callback fed by its store
+    for price_range, selected in filters:
+        _, _, store = d.update_filters(price_range, selected, {})
+        d.update_category_analysis(store)
+        d.update_price_distribution(store)
+        d.update_rating_distribution(store)
+        d.update_top_products(store)
+        d.filtered_scatter_traces(d._key_from_store(store['filter']))
+
+seconds = {
+    'category_analysis_figure': best(lambda: d.category_analysis_figure(d.aggregates['category_summary'])),
+    'price_distribution_figure': best(lambda: d.price_distribution_figure(d.aggregates['price_box'])),
+    'rating_distribution_figure': best(lambda: d.rating_distribution_figure(d.aggregates['rating_histogram'],
+                                                                           d.totals['avg_rating'])),
+    'category_performance_figure': best(lambda: d.category_performance_figure(d.filtered_scatter_traces(d.UNFILTERED))),
+    'update_filters': best(update_filters) / len(filters),
+    'filter_chain': best(filter_chain) / len(filters)
+}
+print(json.dumps({'import_seconds': import_seconds, 'seconds': seconds,
+                  'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+# Child-process snippet for the out-of-core check: the analysis pipeline
+# (without plots) over the data/ tree in the working directory
+OUT_OF_CORE_CHILD = """
+import contextlib, hashlib, io, json, resource, sys, time
+import pandas as pd
+from product_analysis import ProductAnalysis
+out_of_core, chunk_size, partition_mb = sys.argv[1] == '1', int(sys.argv[2]), int(sys.argv[3])
+analysis = ProductAnalysis(cache_dir=None, out_of_core=out_of_core, chunk_size=chunk_size,
+                           partition_bytes=partition_mb << 20)
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    analysis.run_full_analysis('data/products.csv', 'data/ratings.csv', 'data/users.csv', plot=False)
+elapsed = time.perf_counter() - start
+metrics = analysis.products_df[['product_id', 'rating_count', 'avg_rating', 'rating_std', 'popularity_score']]
+with open('analysis_summary.txt') as f:
+    summary = f.read()
+print(json.dumps({'seconds': elapsed, 'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                  'metrics_sha256': hashlib.sha256(pd.util.hash_pandas_object(metrics).to_numpy()).hexdigest(),
+                  'summary': summary}))
+"""
+
+# Child-process snippet for the per-product aggregation: pandas groupby, the
+# serial RatingStats and the process pool at each worker count
+GROUPBY_CHILD = SYNTHETIC_RATINGS + """
+import json, sys, time
+from parallel_stats import parallel_rating_stats
+from rating_stats import RatingStats
+n, repeat, workers = int(sys.argv[1]), int(sys.argv[2]), [int(w) for w in sys.argv[3:]]
+ratings_df = synthetic_ratings(n)
+# RatingStats.from_ratings also tracks the watermark
+ratings_df['timestamp'] = np.datetime64('2024-01-01')
+
+def best(fn):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+results = {'pandas_groupby': best(lambda: ratings_df.groupby('product_id').agg(
+    {'rating': ['count', 'mean', 'std']}))[0]}
+results['rating_stats'], expected = best(lambda: RatingStats.from_ratings(ratings_df))
+identical = True
+for w in workers:
+    results[f'workers={w}'], stats = best(lambda: parallel_rating_stats(ratings_df, w))
+    identical = identical and stats.equals(expected)
+print(json.dumps({'seconds': results, 'identical': identical}))
+"""
+
+
+def _run_child(code, args, env=None, cwd=None):
+    here = os.path.dirname(os.path.abspath(__file__)) or '.'
+    if cwd is not None:
+        # Run against the data under cwd, importing the modules from here
+        env = dict(env or os.environ, PYTHONPATH=here)
+    result = subprocess.run(
+        [sys.executable, '-c', code] + [str(a) for a in args],
+        capture_output=True, text=True, check=True,
+        cwd=cwd or here,
+        env=env
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def bench_load(paths=DATA_FILES, repeat=3):
+    """Compare read_csv against the columnar cache (cold build and warm reads)"""
+    paths = [os.path.abspath(p) for p in paths]
+    cache_dir = tempfile.mkdtemp(prefix='bench-cache-')
+    results = {}
+    try:
+        results['read_csv'] = [_run_child(LOAD_CHILD, ['csv', cache_dir] + paths) for _ in range(repeat)]
+        results['cache_cold'] = [_run_child(LOAD_CHILD, ['cache', cache_dir] + paths)]
+        results['cache_warm'] = [_run_child(LOAD_CHILD, ['cache', cache_dir] + paths) for _ in range(repeat)]
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print("Load benchmark")
+    print("--------------")
+    print(f"{'path':<12}{'best (s)':>10}{'peak RSS (MB)':>16}{'load RSS (MB)':>16}")
+    for name, runs in results.items():
+        best = min(runs, key=lambda r: r['seconds'])
+        print(f"{name:<12}{best['seconds']:>10.3f}{best['peak_rss_mb']:>16.1f}{best['load_rss_mb']:>16.1f}")
+    return results
+
+
+def bench_scatter(sizes=(15000, 150000, 1500000), ratings=100000, repeat=3):
+    """
+    Server side of the Price vs Rating scatter's first paint, through the
+    dashboard's own code: filtered_scatter_traces + category_performance_figure
+    for the unfiltered view, serialized to the JSON the browser receives
+    (best of `repeat`, caches cleared), plus payload size and points sent.
+    Each size is a generated dataset with about that many products, run
+    once as the dashboard serves it (downsampled to SCATTER_MAX_POINTS) and
+    once with every point. Browser parse and paint time is not measured;
+    it grows with the payload and point count shown here.
+    """
+    print("Scatter benchmark (server-side first paint)")
+    print("-------------------------------------------")
+    print(f"{'products':>10}{'mode':>14}{'trace':>12}{'points':>10}{'payload (MB)':>14}{'build (s)':>11}")
+    results = []
+    for n in sizes:
+        work_dir = tempfile.mkdtemp(prefix='bench-scatter-')
+        try:
+            _run_child(SCATTER_GENERATE_CHILD, [n, ratings], cwd=work_dir)
+            for mode in ['downsampled', 'full']:
+                r = _run_child(SCATTER_CHILD, [mode, repeat], cwd=work_dir)
+                results.append(dict(r, mode=mode))
+                print(f"{r['products']:>10,}{mode:>14}{r['trace']:>12}{r['points']:>10,}"
+                      f"{r['payload_bytes'] / 1e6:>14.2f}{r['seconds']:>11.3f}")
+        finally:
+            shutil.rmtree(work_dir)
+    return results
+
+
+def bench_recommend(sizes=(100000, 10000000, 100000000)):
+    """Item-item recommender build time, memory and lookup latency per ratings count"""
+    print("Item-item recommender benchmark")
+    print("-------------------------------")
+    print(f"{'ratings':>12}{'build (s)':>11}{'peak RSS (MB)':>15}{'build RSS (MB)':>16}"
+          f"{'similar (us)':>14}{'recommend (us)':>16}")
+    results = []
+    for n in sizes:
+        r = _run_child(RECOMMEND_CHILD, [n])
+        results.append(r)
+        print(f"{n:>12,}{r['build_seconds']:>11.2f}{r['peak_rss_mb']:>15.1f}{r['build_rss_mb']:>16.1f}"
+              f"{r['similar_us']:>14.1f}{r['recommend_us']:>16.1f}")
+    return results
+
+
+def bench_als(source='data/ratings.csv', jobs=(1, 2, 4), threads=(1, 4), factors=(32,), iterations=(10,)):
+    """
+    ALS fit time against process and BLAS thread counts, with held-out RMSE
+    and recall@10 for each factors/iterations setting. `source` is a ratings
+    CSV or a number of synthetic ratings.
+    """
+    print("ALS benchmark")
+    print("-------------")
+    print(f"{'procs':>6}{'threads':>8}{'factors':>8}{'iters':>6}{'fit (s)':>10}{'RMSE':>8}{'recall@10':>11}")
+    results = []
+    for n_threads in threads:
+        env = dict(os.environ, **{var: str(n_threads) for var in
+                                  ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS']})
+        for n_jobs in jobs:
+            for n_factors in factors:
+                for n_iterations in iterations:
+                    r = _run_child(ALS_CHILD, [source, n_jobs, n_factors, n_iterations], env=env)
+                    r.update(processes=n_jobs, threads=n_threads, factors=n_factors, iterations=n_iterations)
+                    results.append(r)
+                    print(f"{n_jobs:>6}{n_threads:>8}{n_factors:>8}{n_iterations:>6}"
+                          f"{r['fit_seconds']:>10.2f}{r['rmse']:>8.3f}{r['recall@10']:>11.4f}")
+    return results
+
+
+def bench_ann(sizes=(100000, 1000000), dim=32, queries=1000, probes=(1, 4, 8, 16, 32)):
+    """IVF index build cost, recall@10 against brute force and QPS per n_probe"""
+    print("ANN index benchmark")
+    print("-------------------")
+    print(f"{'vectors':>10}{'lists':>7}{'build (s)':>11}{'n_probe':>9}{'recall@10':>11}{'QPS':>10}")
+    results = []
+    for n in sizes:
+        r = _run_child(ANN_CHILD, [n, dim, queries, ','.join(str(p) for p in probes)])
+        results.append(r)
+        for run in r['runs']:
+            print(f"{n:>10,}{r['n_lists']:>7}{r['build_seconds']:>11.2f}{run['n_probe']:>9}"
+                  f"{run['recall@10']:>11.3f}{run['qps']:>10.0f}")
+    return results
+
+
+def bench_generate(sizes=(1000000, 10000000), scale=1.0, workers=(0,)):
+    """
+    Synthetic dataset generation throughput and peak RSS per rating count.
+    workers 0 is the single-stream generator, otherwise sharded generation
+    with that many processes (peak RSS is the parent's).
+    """
+    print("Data generation benchmark")
+    print("-------------------------")
+    print(f"{'ratings':>12}{'workers':>9}{'seconds':>10}{'ratings/s':>12}{'output (MB)':>13}{'peak RSS (MB)':>15}")
+    results = []
+    for n in sizes:
+        for n_workers in workers:
+            r = _run_child(GENERATE_CHILD, [n, scale, n_workers])
+            r['workers'] = n_workers
+            results.append(r)
+            print(f"{n:>12,}{n_workers:>9}{r['seconds']:>10.2f}{n / r['seconds']:>12,.0f}"
+                  f"{r['bytes'] / 1e6:>13.1f}{r['peak_rss_mb']:>15.1f}")
+    return results
+
+
+def _git_revision():
+    here = os.path.dirname(os.path.abspath(__file__)) or '.'
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=here,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=here,
+                               capture_output=True, text=True, check=True).stdout.strip() != ''
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('-dirty' if dirty else '')
+
+
+def _suite_metrics(result):
+    """Flat {metric: value} view of one suite result, for comparisons"""
+    metrics = {f"analysis.{p['phase']}_s": p['wall_seconds'] for p in result['analysis']['phases']}
+    metrics['analysis.total_s'] = result['analysis']['total']['wall_seconds']
+    metrics['analysis.peak_rss_mb'] = result['analysis']['total']['max_rss_mb']
+    metrics['dashboard.import_s'] = result['dashboard']['import_seconds']
+    metrics.update({f'dashboard.{name}_s': value for name, value in result['dashboard']['seconds'].items()})
+    metrics['dashboard.peak_rss_mb'] = result['dashboard']['peak_rss_mb']
+    return metrics
+
+
+def bench_suite(sizes=(10000, 1000000, 10000000), history=SUITE_HISTORY_PATH, repeat=3):
+    """
+    End-to-end suite per rating count: generate a dataset with
+    generate_realistic_dataset, time every ProductAnalysis phase (with
+    ratings/s and peak RSS), and time the dashboard import, figure builders,
+    update_filters and the full filter-change callback chain (caches
+    cleared, best of `repeat`). Each run is appended to the JSON-lines
+    history with the git revision, and compared with the previous run at
+    the same size.
+    """
+    try:
+        with open(history) as f:
+            previous_runs = [json.loads(line) for line in f if line.strip()]
+    except OSError:
+        previous_runs = []
+    revision = _git_revision()
+
+    results = []
+    for n in sizes:
+        work_dir = tempfile.mkdtemp(prefix='bench-suite-')
+        try:
+            generated = _run_child(SUITE_GENERATE_CHILD, [n, 'products', 'ratings', 'users'], cwd=work_dir)
+            analysis = _run_child(SUITE_ANALYSIS_CHILD, [], cwd=work_dir)
+            dashboard = _run_child(SUITE_DASHBOARD_CHILD, [repeat], cwd=work_dir)
+        finally:
+            shutil.rmtree(work_dir)
+        result = {'revision': revision, 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'ratings': n,
+                  'generate': generated, 'analysis': analysis, 'dashboard': dashboard}
+        results.append(result)
+
+        print(f"\nBenchmark suite: {n:,} ratings (revision {revision})")
+        print("-" * 60)
+        print(f"generate {generated['generate_seconds']:.2f}s, cache build {generated['cache_seconds']:.2f}s")
+        print(f"{'phase':<30}{'seconds':>10}{'ratings/s':>14}")
+        for p in analysis['phases']:
+            print(f"{p['phase']:<30}{p['wall_seconds']:>10.3f}{n / max(p['wall_seconds'], 1e-9):>14,.0f}")
+        print(f"{'analysis total':<30}{analysis['total']['wall_seconds']:>10.3f}"
+              f"{n / analysis['total']['wall_seconds']:>14,.0f}   peak RSS {analysis['total']['max_rss_mb']:.0f} MB")
+        print(f"{'dashboard import':<30}{dashboard['import_seconds']:>10.3f}")
+        for name, seconds in dashboard['seconds'].items():
+            print(f"{name:<30}{seconds:>10.4f}")
+        print(f"{'dashboard peak RSS (MB)':<30}{dashboard['peak_rss_mb']:>10.0f}")
+
+        baseline = next((r for r in reversed(previous_runs) if r['ratings'] == n), None)
+        if baseline is not None:
+            old, new = _suite_metrics(baseline), _suite_metrics(result)
+            print(f"\nvs {baseline['revision']} ({baseline['time']}):")
+            for name, value in new.items():
+                if old.get(name):
+                    print(f"  {name:<40}{old[name]:>10.3f} -> {value:>10.3f}  ({value / old[name] - 1:+.0%})")
+
+        with open(history, 'a') as f:
+            f.write(json.dumps(result) + '\n')
+    return results
+
+
+def _import_time_ms(module, forbidden):
+    """Cumulative import time of a module in a fresh interpreter, and forbidden modules it loaded"""
+    here = os.path.dirname(os.path.abspath(__file__)) or '.'
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', IMPORT_CHILD, module] + forbidden,
+                            capture_output=True, text=True, check=True, cwd=here)
+    cumulative = None
+    for line in result.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == module:
+            cumulative = int(parts[1]) / 1000
+    return cumulative, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def bench_imports(budgets=IMPORT_BUDGETS_MS, repeat=3):
+    """
+    Startup regression check: best-of-`repeat` import time of each module
+    against its budget, and whether it loaded any module it should load
+    lazily. Returns the results; a module fails if it is over budget or
+    loaded a forbidden module.
+    """
+    print("Import time budget")
+    print("------------------")
+    print(f"{'module':<18}{'best (ms)':>10}{'budget (ms)':>13}  result")
+    results = []
+    for module, budget in budgets.items():
+        forbidden = IMPORT_FORBIDDEN.get(module, [])
+        runs = [_import_time_ms(module, forbidden) for _ in range(repeat)]
+        best = min(ms for ms, _ in runs)
+        loaded = runs[0][1]
+        ok = best <= budget and not loaded
+        results.append({'module': module, 'ms': best, 'budget_ms': budget, 'loaded': loaded, 'ok': ok})
+        note = 'ok' if ok else 'FAIL' + (f" (loaded {', '.join(loaded)})" if loaded else '')
+        print(f"{module:<18}{best:>10.0f}{budget:>13}  {note}")
+    return results
+
+
+def bench_out_of_core(rows=5000000, ceiling_mb=500, chunk_size=200000, partition_mb=16, compare=True):
+    """
+    Memory-ceiling check of the out-of-core analysis: generate a ratings
+    file (with 1% duplicated rows) much larger than the partitions, run the
+    pipeline out-of-core and, with compare, in memory. Passes if the
+    out-of-core peak RSS stays under ceiling_mb and both paths produce the
+    same product metrics and summary. Returns (results, passed).
+    """
+    import pandas as pd
+
+    work_dir = tempfile.mkdtemp(prefix='bench-out-of-core-')
+    try:
+        _run_child(SUITE_GENERATE_CHILD, [rows], cwd=work_dir)
+        # Append a sample of existing rows so there is something to dedupe
+        ratings_path = os.path.join(work_dir, 'data', 'ratings.csv')
+        duplicates = pd.read_csv(ratings_path, nrows=max(rows // 100, 1))
+        duplicates.sample(frac=1, random_state=0).to_csv(ratings_path, mode='a', header=False, index=False)
+        size_mb = os.path.getsize(ratings_path) / (1 << 20)
+
+        results = {'out_of_core': _run_child(OUT_OF_CORE_CHILD, [1, chunk_size, partition_mb], cwd=work_dir)}
+        if compare:
+            results['in_memory'] = _run_child(OUT_OF_CORE_CHILD, [0, chunk_size, partition_mb], cwd=work_dir)
+    finally:
+        shutil.rmtree(work_dir)
+
+    print(f"Out-of-core analysis ({rows:,} ratings + 1% duplicates, {size_mb:.0f} MB CSV, "
+          f"{partition_mb} MB partitions)")
+    print("-" * 72)
+    print(f"{'mode':<14}{'seconds':>10}{'peak RSS (MB)':>16}")
+    for mode, r in results.items():
+        print(f"{mode:<14}{r['seconds']:>10.2f}{r['peak_rss_mb']:>16.1f}")
+    under_ceiling = results['out_of_core']['peak_rss_mb'] <= ceiling_mb
+    print(f"out-of-core peak RSS under {ceiling_mb} MB ceiling: {under_ceiling}")
+    passed = under_ceiling
+    if compare:
+        same = all(results['out_of_core'][k] == results['in_memory'][k] for k in ['metrics_sha256', 'summary'])
+        print(f"results identical to the in-memory path: {same}")
+        passed = passed and same
+    return results, passed
+
+
+def bench_groupby(sizes=(10000000,), workers=(1, 2, 4), repeat=3):
+    """
+    Per-product rating aggregation: pandas groupby and the serial
+    RatingStats vs parallel_rating_stats scaling over worker processes
+    """
+    print(f"Per-product rating aggregation ({os.cpu_count()} CPUs, best of {repeat})")
+    print("-" * 72)
+    print(f"{'ratings':>12}  {'method':<16}{'seconds':>10}{'vs 1 worker':>14}{'vs pandas':>12}")
+    results = {}
+    for n in sizes:
+        result = _run_child(GROUPBY_CHILD, [n, repeat] + list(workers))
+        seconds = result['seconds']
+        single = seconds.get('workers=1')
+        for method, t in seconds.items():
+            scaling = f"{single / t:.2f}x" if single and method.startswith('workers=') else '-'
+            print(f"{n:>12,}  {method:<16}{t:>10.3f}{scaling:>14}{seconds['pandas_groupby'] / t:>11.2f}x")
+        print(f"{'':>12}  identical to RatingStats.from_ratings: {result['identical']}")
+        results[n] = result
+    return results
+
+
+def bench_features(rows=1000000, deltas=(1000, 10000, 100000), seed=0):
+    """
+    Incremental rating statistics (RatingStats.update_from_log) vs a full
+    recompute after appending deltas of various sizes to a ratings log
+    """
+    import numpy as np
+    import pandas as pd
+    from rating_stats import RatingStats, popularity_score
+
+    rng = np.random.default_rng(seed)
+    start_time = np.datetime64('2024-01-01T00:00:00')
+
+    def ratings(n, offset):
+        return pd.DataFrame({
+            'user_id': rng.integers(1, 100001, n),
+            'product_id': rng.integers(1, 20001, n),
+            'rating': rng.integers(1, 6, n),
+            'timestamp': start_time + np.arange(offset, offset + n).astype('timedelta64[s]')
+        })
+
+    work_dir = tempfile.mkdtemp(prefix='bench-features-')
+    path = os.path.join(work_dir, 'ratings.csv')
+    ratings(rows, 0).to_csv(path, index=False)
+    stats = RatingStats()
+    stats.update_from_log(path)
+    total = rows
+
+    print("Incremental feature benchmark")
+    print("-----------------------------")
+    print(f"{'delta':>10}{'log rows':>12}{'incremental (s)':>17}{'full (s)':>10}{'exact':>7}")
+    results = []
+    for delta in deltas:
+        ratings(delta, total).to_csv(path, mode='a', header=False, index=False)
+        total += delta
+        start = time.perf_counter()
+        stats.update_from_log(path)
+        incremental = time.perf_counter() - start
+        start = time.perf_counter()
+        full = RatingStats.from_ratings(pd.read_csv(path).drop_duplicates())
+        full_seconds = time.perf_counter() - start
+        exact = full.equals(stats) and popularity_score(full.metrics()).equals(popularity_score(stats.metrics()))
+        results.append({'delta': delta, 'rows': total, 'incremental_seconds': incremental,
+                        'full_seconds': full_seconds, 'exact': exact})
+        print(f"{delta:>10,}{total:>12,}{incremental:>17.3f}{full_seconds:>10.3f}{str(exact):>7}")
+    shutil.rmtree(work_dir)
+    return results
+
+
+def bench_window(rows=10000000, months=24, days=(1, 7, 30, 365), repeat=3, seed=0):
+    """
+    Time-window reads: month partitions (time_partitions.load_ratings) vs
+    loading the whole ratings table and filtering it, over a synthetic log
+    spread evenly across `months` months
+    """
+    import numpy as np
+    import pandas as pd
+    from data_store import load_table
+    from time_partitions import last_days, load_manifest, load_ratings, select_partitions, window_rows
+
+    rng = np.random.default_rng(seed)
+    work_dir = tempfile.mkdtemp(prefix='bench-window-')
+    path = os.path.join(work_dir, 'ratings.csv')
+    cache_dir = os.path.join(work_dir, '.cache')
+    end_time = np.datetime64('2024-12-31T23:59:59')
+    span = months * 30 * 86400
+    pd.DataFrame({
+        'user_id': rng.integers(1, rows // 10 + 2, rows),
+        'product_id': rng.integers(1, rows // 50 + 2, rows),
+        'rating': rng.integers(1, 6, rows).astype(np.float64),
+        'timestamp': end_time - np.sort(rng.integers(0, span, rows))[::-1].astype('timedelta64[s]')
+    }).to_csv(path, index=False)
+
+    def best(fn):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = fn()
+            times.append(time.perf_counter() - start)
+        return min(times), result
+
+    try:
+        load_table(path, cache_dir)
+        start = time.perf_counter()
+        manifest = load_manifest(path, cache_dir)
+        build = time.perf_counter() - start
+        print(f"Time-window reads ({rows:,} ratings over {months} months, best of {repeat})")
+        print("-" * 72)
+        print(f"month partitions: {len(manifest['partitions'])} built in {build:.2f}s")
+        print(f"{'window':>10}{'rows':>12}{'partitions':>12}{'full + filter (s)':>19}{'partitioned (s)':>17}"
+              f"{'same':>6}")
+        results = []
+        for n_days in days:
+            window = last_days(n_days, path, cache_dir)
+            full_seconds, full = best(lambda: window_rows(load_table(path, cache_dir), *window))
+            seconds, partitioned = best(lambda: load_ratings(path, *window, cache_dir=cache_dir))
+            read = len(select_partitions(manifest, *window))
+            same = len(full) == len(partitioned) and np.array_equal(np.sort(full['timestamp'].to_numpy()),
+                                                                   partitioned['timestamp'].to_numpy())
+            print(f"{n_days:>8} d{len(partitioned):>12,}{read:>12}{full_seconds:>19.3f}{seconds:>17.4f}{str(same):>6}")
+            results.append({'days': n_days, 'rows': len(partitioned), 'full_seconds': full_seconds,
+                            'partitioned_seconds': seconds, 'same': same})
+    finally:
+        shutil.rmtree(work_dir)
+    return results
+
+
+def write_synthetic_amazon_csv(path, rows, chunk_size=500000, seed=0):
+    """
+    Raw file in the amazon_products.csv layout: formatted prices and counts,
+    '|'-separated category paths, long descriptions and unused columns
+    """
+    import numpy as np
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    categories = np.array([f"Category{i}|Sub{i % 7}|Leaf{i % 3}" for i in range(40)])
+    weights = rng.lognormal(0, 1, len(categories))
+    filler = 'Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt. '
+    with open(path, 'w', newline='') as f:
+        for start in range(0, rows, chunk_size):
+            n = min(chunk_size, rows - start)
+            ids = pd.Series(np.arange(start, start + n)).astype(str)
+            price = pd.Series(rng.lognormal(5, 1.5, n)).map('${:,.2f}'.format)
+            rating = pd.Series(rng.uniform(1, 5, n).round(1)).astype(str).where(rng.random(n) > 0.02, '|')
+            count = pd.Series(rng.lognormal(4, 2, n).astype(np.int64)).map('{:,}'.format)
+            pd.DataFrame({
+                'product_id': 'B' + ids.str.zfill(9),
+                'product_name': 'Product ' + ids,
+                'category': categories[rng.choice(len(categories), n, p=weights / weights.sum())],
+                'discounted_price': price,
+                'price': price,
+                'discount_percentage': '10%',
+                'rating': rating,
+                'rating_count': count,
+                'about_product': filler * 3,
+                'description': filler * 2 + ids,
+                'img_link': 'https://example.com/images/' + ids + '.jpg'
+            }).to_csv(f, index=False, header=start == 0)
+
+
+def bench_preprocess(rows=(1000000, 5000000), chunk_size=100000, raw_path=None):
+    """
+    Whole-file vs streaming preprocessing of a synthetic amazon_products.csv:
+    time and peak RSS per input size
+    """
+    print("Preprocessing benchmark")
+    print("-----------------------")
+    print(f"{'rows':>11}{'input (GB)':>12}{'version':>11}{'seconds':>10}{'peak RSS (MB)':>15}")
+    results = []
+    work_dir = tempfile.mkdtemp(prefix='bench-preprocess-')
+    try:
+        for n in rows:
+            path = raw_path or os.path.join(work_dir, 'amazon_products.csv')
+            if raw_path is None:
+                # In a child: Linux carries peak RSS across exec, so a large
+                # parent would inflate the measured children
+                subprocess.run([sys.executable, '-c', 'import sys; from benchmark import write_synthetic_amazon_csv; '
+                                'write_synthetic_amazon_csv(sys.argv[1], int(sys.argv[2]))', path, str(n)],
+                               check=True, cwd=os.path.dirname(os.path.abspath(__file__)) or '.')
+            size = os.path.getsize(path)
+            for version, code, args in [('legacy', LEGACY_PREPROCESS_CHILD, [path, work_dir]),
+                                        ('streaming', PREPROCESS_CHILD, [path, work_dir, chunk_size])]:
+                r = _run_child(code, args)
+                r.update(rows=n, bytes=size, version=version)
+                results.append(r)
+                print(f"{n:>11,}{size / 1e9:>12.2f}{version:>11}{r['seconds']:>10.2f}{r['peak_rss_mb']:>15.1f}")
+    finally:
+        shutil.rmtree(work_dir)
+    return results
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Local stand-in for a dataset host: serves files from `directory` with
+    ETag/Last-Modified, conditional GETs and single byte ranges (with
+    If-Range). A path in `drop_after` has its next response cut off after
+    that many bytes, to simulate a dropped connection.
+    """
+    directory = '.'
+    drop_after = {}
+    bytes_sent = 0
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = os.path.join(self.directory, os.path.basename(self.path))
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        stat = os.stat(path)
+        size = stat.st_size
+        etag = f'"{size:x}-{stat.st_mtime_ns:x}"'
+        last_modified = email.utils.formatdate(stat.st_mtime, usegmt=True)
+
+        if_none_match = self.headers.get('If-None-Match')
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if (if_none_match == etag or if_none_match is None and if_modified_since is not None
+                and email.utils.parsedate_to_datetime(if_modified_since).timestamp() >= int(stat.st_mtime)):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        start, status = 0, 200
+        range_header = self.headers.get('Range', '')
+        if range_header.startswith('bytes=') and self.headers.get('If-Range', etag) in (etag, last_modified):
+            start = int(range_header[len('bytes='):].split('-')[0])
+            if start >= size:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.end_headers()
+                return
+            status = 206
+
+        self.send_response(status)
+        self.send_header('Content-Length', str(size - start))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', last_modified)
+        self.send_header('Accept-Ranges', 'bytes')
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{size - 1}/{size}')
+        self.end_headers()
+
+        with self.lock:
+            limit = self.drop_after.pop(os.path.basename(path), None)
+        remaining = size - start if limit is None else min(limit, size - start)
+        with open(path, 'rb') as f:
+            f.seek(start)
+            while remaining > 0:
+                chunk = f.read(min(1 << 16, remaining))
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+                with self.lock:
+                    StandInHandler.bytes_sent += len(chunk)
+        if limit is not None:
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+
+
+def serve_stand_in(directory):
+    """Start the stand-in server on a free local port; returns (server, base_url)"""
+    StandInHandler.directory = directory
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def bench_download(size_mb=256, n_files=4, workers=(1, 4)):
+    """
+    Downloader against the local stand-in server: old one-shot GET vs
+    streaming (cold, per worker count), resume after dropped connections,
+    conditional re-download and checksum failure
+    """
+    import hashlib
+    work_dir = tempfile.mkdtemp(prefix='bench-download-')
+    serve_dir, dest_dir = os.path.join(work_dir, 'serve'), os.path.join(work_dir, 'dest')
+    os.makedirs(serve_dir)
+    os.makedirs(dest_dir)
+    names = [f'file{i}.bin' for i in range(n_files)]
+    checksums = {}
+    for name in names:
+        digest = hashlib.sha256()
+        with open(os.path.join(serve_dir, name), 'wb') as f:
+            for _ in range(size_mb):
+                chunk = os.urandom(1 << 20)
+                digest.update(chunk)
+                f.write(chunk)
+        checksums[name] = digest.hexdigest()
+
+    server, base_url = serve_stand_in(serve_dir)
+    files = [{'url': f'{base_url}/{name}', 'path': os.path.join(dest_dir, name), 'sha256': checksums[name]}
+             for name in names]
+    total_mb = size_mb * n_files
+
+    def clear():
+        for name in os.listdir(dest_dir):
+            os.remove(os.path.join(dest_dir, name))
+
+    def run(scenario, spec):
+        StandInHandler.bytes_sent = 0
+        r = _run_child(DOWNLOAD_CHILD, [json.dumps(spec)])
+        r.update(scenario=scenario, served_mb=StandInHandler.bytes_sent / (1 << 20))
+        statuses = sorted(set(r['statuses'].values())) if 'error' not in r['statuses'] else ['error']
+        print(f"{scenario:<22}{r['seconds']:>9.2f}{total_mb / r['seconds']:>10.0f}{r['served_mb']:>12.0f}"
+              f"{r['peak_rss_mb']:>15.1f}  {','.join(statuses)}")
+        return r
+
+    print(f"Download benchmark ({n_files} x {size_mb} MB from a local stand-in server)")
+    print("--------------------------------------------------------------")
+    print(f"{'scenario':<22}{'seconds':>9}{'MB/s':>10}{'served MB':>12}{'peak RSS (MB)':>15}  status")
+    results = []
+    try:
+        results.append(run('one-shot GET', {'legacy': True, 'files': files}))
+        for n_workers in workers:
+            clear()
+            results.append(run(f'streaming, {n_workers} workers', {'legacy': False, 'files': files,
+                                                                   'workers': n_workers}))
+        results.append(run('unchanged (304)', {'legacy': False, 'files': files, 'workers': max(workers)}))
+
+        clear()
+        StandInHandler.drop_after = {name: int(0.4 * size_mb * (1 << 20)) for name in names}
+        results.append(run('dropped at 40%', {'legacy': False, 'files': files, 'workers': max(workers)}))
+
+        clear()
+        corrupt = [dict(file, sha256='0' * 64) for file in files]
+        results.append(run('checksum mismatch', {'legacy': False, 'files': corrupt, 'workers': max(workers)}))
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir)
+    return results
+
+
+def _wait_for_server(port, timeout=60, path='/health'):
+    import urllib.request
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}{path}') as response:
+                return json.loads(response.read())
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def _load_test(port, paths, concurrency, n_requests):
+    """Fire n_requests GETs from `concurrency` keep-alive clients; per-request latencies"""
+    import http.client
+    from concurrent.futures import ThreadPoolExecutor
+
+    def client(worker):
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+        latencies = []
+        for path in paths[worker::concurrency]:
+            start = time.perf_counter()
+            connection.request('GET', path)
+            connection.getresponse().read()
+            latencies.append(time.perf_counter() - start)
+        connection.close()
+        return latencies
+
+    paths = paths[:n_requests]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = [t for result in pool.map(client, range(concurrency)) for t in result]
+    return latencies, time.perf_counter() - start
+
+
+def bench_api(concurrency=(1, 8, 32, 64), n_requests=2000, batches=(1, 64), endpoint='recommend', port=8099):
+    """
+    Load test of the recommendation API: p50/p95/p99 latency and throughput
+    per client concurrency, with micro-batching off (max batch 1) and on.
+    Needs a trained ALS model (python als.py).
+    """
+    import numpy as np
+    from als import DEFAULT_MODEL_DIR
+
+    rng = np.random.default_rng(0)
+    if endpoint == 'recommend':
+        ids = np.load(os.path.join(DEFAULT_MODEL_DIR, 'user_ids.npy'))
+        paths = [f'/recommend/user/{i}' for i in rng.choice(ids, n_requests)]
+    else:
+        ids = np.load(os.path.join(DEFAULT_MODEL_DIR, 'item_ids.npy'))
+        paths = [f'/similar/{i}' for i in rng.choice(ids, n_requests)]
+
+    print(f"API load test (/{endpoint}, {n_requests:,} requests per level)")
+    print("------------------------------------------------------")
+    print(f"{'batch':>6}{'clients':>9}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}{'req/s':>9}")
+    results = []
+    here = os.path.dirname(os.path.abspath(__file__)) or '.'
+    for max_batch in batches:
+        server = subprocess.Popen([sys.executable, 'api.py', '--port', str(port), '--max-batch', str(max_batch)],
+                                  cwd=here, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            _wait_for_server(port)
+            for clients in concurrency:
+                latencies, elapsed = _load_test(port, paths, clients, n_requests)
+                p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+                r = {'max_batch': max_batch, 'clients': clients, 'p50_ms': p50, 'p95_ms': p95,
+                     'p99_ms': p99, 'rps': len(latencies) / elapsed}
+                results.append(r)
+                print(f"{max_batch:>6}{clients:>9}{p50:>10.2f}{p95:>10.2f}{p99:>10.2f}{r['rps']:>9.0f}")
+        finally:
+            server.terminate()
+            server.wait()
+    return results
+
+
+def _memory_mb(pid):
+    """RSS and PSS (shared pages split between their users) of a process, in MB"""
+    memory = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            if name in ('Rss', 'Pss'):
+                memory[name.lower()] = int(value.split()[0]) / 1024
+    return memory
+
+
+def _children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(p) for p in f.read().split()]
+
+
+def bench_serve(workers=(1, 4, 8), concurrency=16, n_requests=1000, ratings=None, path='/_dash-layout',
+                port=8098):
+    """
+    Dashboard served by serve.py with 1, 4 and 8 workers: requests/s and
+    latency under load, and RSS / PSS per worker afterwards. PSS counts
+    shared pages once across the processes sharing them, so total PSS is
+    the real footprint. With `ratings`, a synthetic dataset of that size is
+    generated and served instead of data/. Linux only (reads /proc).
+    """
+    import numpy as np
+
+    here = os.path.dirname(os.path.abspath(__file__)) or '.'
+    root, work_dir = here, None
+    if ratings:
+        work_dir = tempfile.mkdtemp(prefix='bench-serve-')
+        root = work_dir
+        subprocess.run([sys.executable, os.path.join(here, 'generate_real_data.py'), '--ratings', str(ratings),
+                        '--seed', '0', '--output-dir', os.path.join(work_dir, 'data')],
+                       cwd=work_dir, check=True, stdout=subprocess.DEVNULL)
+    env = dict(os.environ, PYTHONPATH=here)
+
+    print(f"Dashboard serving benchmark (GET {path}, {concurrency} clients, {n_requests:,} requests)")
+    print("-" * 72)
+    print(f"{'workers':>8}{'req/s':>9}{'p50 (ms)':>10}{'p99 (ms)':>10}"
+          f"{'RSS/worker (MB)':>17}{'PSS/worker (MB)':>17}{'total PSS (MB)':>16}")
+    results = []
+    try:
+        for n_workers in workers:
+            server = subprocess.Popen([sys.executable, os.path.join(here, 'serve.py'), 'dashboard',
+                                       '--workers', str(n_workers), '--port', str(port)],
+                                      cwd=root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                _wait_for_server(port, timeout=300, path=path)
+                latencies, elapsed = _load_test(port, [path] * n_requests, concurrency, n_requests)
+                processes = _children(server.pid) if n_workers > 1 else [server.pid]
+                memory = [_memory_mb(pid) for pid in processes]
+                total_pss = sum(m['pss'] for m in memory)
+                if n_workers > 1:
+                    total_pss += _memory_mb(server.pid)['pss']
+            finally:
+                server.terminate()
+                server.wait()
+            p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+            r = {'workers': n_workers, 'rps': len(latencies) / elapsed, 'p50_ms': p50, 'p99_ms': p99,
+                 'rss_mb_per_worker': float(np.mean([m['rss'] for m in memory])),
+                 'pss_mb_per_worker': float(np.mean([m['pss'] for m in memory])),
+                 'total_pss_mb': total_pss}
+            results.append(r)
+            print(f"{n_workers:>8}{r['rps']:>9.0f}{p50:>10.1f}{p99:>10.1f}{r['rss_mb_per_worker']:>17.1f}"
+                  f"{r['pss_mb_per_worker']:>17.1f}{total_pss:>16.1f}")
+    finally:
+        if work_dir:
+            shutil.rmtree(work_dir)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Performance benchmarks")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    load_parser = subparsers.add_parser('load', help="CSV vs columnar cache load time and peak RSS")
+    load_parser.add_argument('--repeat', type=int, default=3)
+    load_parser.add_argument('paths', nargs='*', default=DATA_FILES)
+
+    scatter_parser = subparsers.add_parser('scatter', help="Server-side first paint of the Price vs Rating scatter")
+    scatter_parser.add_argument('--sizes', type=int, nargs='+', default=[15000, 150000, 1500000],
+                                help="approximate product counts")
+    scatter_parser.add_argument('--ratings', type=int, default=100000)
+    scatter_parser.add_argument('--repeat', type=int, default=3)
+
+    recommend_parser = subparsers.add_parser('recommend', help="Item-item recommender build time and memory")
+    recommend_parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 10000000, 100000000])
+
+    als_parser = subparsers.add_parser('als', help="ALS fit time vs processes/threads and held-out accuracy")
+    als_parser.add_argument('--source', default='data/ratings.csv',
+                            help="ratings CSV, or a number of synthetic ratings")
+    als_parser.add_argument('--jobs', type=int, nargs='+', default=[1, 2, 4])
+    als_parser.add_argument('--threads', type=int, nargs='+', default=[1, 4])
+    als_parser.add_argument('--factors', type=int, nargs='+', default=[32])
+    als_parser.add_argument('--iterations', type=int, nargs='+', default=[10])
+
+    ann_parser = subparsers.add_parser('ann', help="ANN index recall@10 and QPS vs brute force")
+    ann_parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    ann_parser.add_argument('--dim', type=int, default=32)
+    ann_parser.add_argument('--queries', type=int, default=1000)
+    ann_parser.add_argument('--probes', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+
+    api_parser = subparsers.add_parser('api', help="Recommendation API latency percentiles and throughput")
+    api_parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 64])
+    api_parser.add_argument('--requests', type=int, default=2000)
+    api_parser.add_argument('--batches', type=int, nargs='+', default=[1, 64])
+    api_parser.add_argument('--endpoint', choices=['recommend', 'similar'], default='recommend')
+    api_parser.add_argument('--port', type=int, default=8099)
+
+    generate_parser = subparsers.add_parser('generate', help="Synthetic data generation throughput")
+    generate_parser.add_argument('--sizes', type=int, nargs='+', default=[1000000, 10000000])
+    generate_parser.add_argument('--scale', type=float, default=1.0, help="product/user count multiplier")
+    generate_parser.add_argument('--workers', type=int, nargs='+', default=[0],
+                                 help="0 = single stream, N = sharded with N processes")
+
+    preprocess_parser = subparsers.add_parser('preprocess', help="Whole-file vs streaming Amazon preprocessing")
+    preprocess_parser.add_argument('--rows', type=int, nargs='+', default=[1000000, 5000000],
+                                   help="synthetic input sizes (about 0.5 GB per million rows)")
+    preprocess_parser.add_argument('--chunk-size', type=int, default=100000)
+    preprocess_parser.add_argument('--raw-path', default=None, help="use an existing raw file instead")
+
+    download_parser = subparsers.add_parser('download', help="Streaming/resumable downloader vs one-shot GET")
+    download_parser.add_argument('--size-mb', type=int, default=256)
+    download_parser.add_argument('--files', type=int, default=4)
+    download_parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+
+    features_parser = subparsers.add_parser('features', help="Incremental vs full rating statistics")
+    features_parser.add_argument('--rows', type=int, default=1000000, help="ratings in the log before appending")
+    features_parser.add_argument('--deltas', type=int, nargs='+', default=[1000, 10000, 100000])
+
+    groupby_parser = subparsers.add_parser('groupby', help="Per-product aggregation scaling over worker processes")
+    groupby_parser.add_argument('--sizes', type=int, nargs='+', default=[10000000])
+    groupby_parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    groupby_parser.add_argument('--repeat', type=int, default=3)
+
+    window_parser = subparsers.add_parser('window', help="Time-window reads from month partitions vs full scans")
+    window_parser.add_argument('--rows', type=int, default=10000000)
+    window_parser.add_argument('--months', type=int, default=24)
+    window_parser.add_argument('--days', type=int, nargs='+', default=[1, 7, 30, 365])
+    window_parser.add_argument('--repeat', type=int, default=3)
+
+    serve_parser = subparsers.add_parser('serve', help="Dashboard throughput and per-worker memory vs workers")
+    serve_parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    serve_parser.add_argument('--concurrency', type=int, default=16)
+    serve_parser.add_argument('--requests', type=int, default=1000)
+    serve_parser.add_argument('--ratings', type=int, default=None,
+                              help="serve a synthetic dataset with this many ratings instead of data/")
+    serve_parser.add_argument('--port', type=int, default=8098)
+
+    imports_parser = subparsers.add_parser('imports', help="Import time against budgets; exits 1 on a regression")
+    imports_parser.add_argument('--repeat', type=int, default=3)
+
+    suite_parser = subparsers.add_parser('suite', help="Analysis phases and dashboard callbacks at several scales")
+    suite_parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 1000000, 10000000],
+                              help="rating counts of the generated datasets")
+    suite_parser.add_argument('--history', default=SUITE_HISTORY_PATH)
+    suite_parser.add_argument('--repeat', type=int, default=3)
+
+    out_of_core_parser = subparsers.add_parser('out-of-core',
+                                               help="Out-of-core analysis memory ceiling; exits 1 on failure")
+    out_of_core_parser.add_argument('--rows', type=int, default=5000000)
+    out_of_core_parser.add_argument('--ceiling-mb', type=int, default=500)
+    out_of_core_parser.add_argument('--chunk-size', type=int, default=200000)
+    out_of_core_parser.add_argument('--partition-mb', type=int, default=16)
+    out_of_core_parser.add_argument('--no-compare', action='store_true', help="skip the in-memory run")
+
+    args = parser.parse_args(argv)
+    if args.command == 'load':
+        bench_load(args.paths, args.repeat)
+    elif args.command == 'scatter':
+        bench_scatter(args.sizes, args.ratings, args.repeat)
+    elif args.command == 'recommend':
+        bench_recommend(args.sizes)
+    elif args.command == 'als':
+        bench_als(args.source, args.jobs, args.threads, args.factors, args.iterations)
+    elif args.command == 'ann':
+        bench_ann(args.sizes, args.dim, args.queries, args.probes)
+    elif args.command == 'generate':
+        bench_generate(args.sizes, args.scale, args.workers)
+    elif args.command == 'preprocess':
+        bench_preprocess(args.rows, args.chunk_size, args.raw_path)
+    elif args.command == 'download':
+        bench_download(args.size_mb, args.files, args.workers)
+    elif args.command == 'features':
+        bench_features(args.rows, args.deltas)
+    elif args.command == 'groupby':
+        bench_groupby(args.sizes, args.workers, args.repeat)
+    elif args.command == 'window':
+        bench_window(args.rows, args.months, args.days, args.repeat)
+    elif args.command == 'serve':
+        bench_serve(args.workers, args.concurrency, args.requests, args.ratings, port=args.port)
+    elif args.command == 'suite':
+        bench_suite(args.sizes, args.history, args.repeat)
+    elif args.command == 'out-of-core':
+        _, passed = bench_out_of_core(args.rows, args.ceiling_mb, args.chunk_size, args.partition_mb,
+                                      not args.no_compare)
+        if not passed:
+            sys.exit(1)
+    elif args.command == 'imports':
+        if not all(r['ok'] for r in bench_imports(repeat=args.repeat)):
+            sys.exit(1)
+    elif args.command == 'api':
+        bench_api(args.concurrency, args.requests, args.batches, args.endpoint, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,531 @@
+import argparse
 import dash
-from dash import html, dcc, Input, Output, State, no_update
-import plotly.express as px
+from dash import html, dcc, Input, Output, State, Patch, no_update
 import plotly.graph_objects as go
 import pandas as pd
 import numpy as np
 from datetime import datetime
+from functools import lru_cache
 import dash_bootstrap_components as dbc
+from aggregates import box_stats, load_aggregates, rating_histogram, top_products
+from data_store import load_table
+from downsample import bin_downsample
+from filter_index import FilterIndex
+from id_index import load_ratings_index
+from live_ratings import LiveRatings, complete_size
+from time_partitions import last_days, load_ratings
 
-# Load data
-products_df = pd.read_csv('data/products.csv')
-ratings_df = pd.read_csv('data/ratings.csv')
-users_df = pd.read_csv('data/users.csv')
+RATINGS_LOG = 'data/ratings.csv'
+# How often connected clients ask for newly ingested ratings
+LIVE_INTERVAL_MS = 2000
+
+# Ratings appended to the log after this point are ingested live
+live_start = complete_size(RATINGS_LOG)
+
+# Load data (from the columnar cache, rebuilt only when a CSV changes).
+# Numeric columns are memory-mapped, so worker processes forked by serve.py
+# share one copy through the page cache. Ratings are read through the
+# persisted ratings index (grouped by product), not as a table.
+products_df = load_table('data/products.csv')
+ratings_index = load_ratings_index(RATINGS_LOG, 'data/products.csv')
+
+# Precomputed chart aggregates (run `python aggregates.py` to rebuild)
+aggregates = load_aggregates()
+totals = aggregates['totals']
 
 # Calculate popularity score
 products_df['popularity_score'] = products_df['avg_rating'] * np.log1p(products_df['rating_count'])
 
+# Price / category index answering the filter modal's queries
+filter_index = FilterIndex(products_df)
+
+# Ratings appended to the log while the dashboard runs; they feed the
+# unfiltered totals and rating histogram, not the filtered views
+live_ratings = LiveRatings(RATINGS_LOG, live_start)
+
+# Rating histogram and rating sum of each product, in products_df order, so
+# a filtered rating histogram sums the rows of the selected products
+# instead of scanning every rating
+_product_index = ratings_index.products.encode(products_df['product_id'].to_numpy())
+product_rating_histograms, product_rating_sums = (a[_product_index] for a in ratings_index.product_histograms())
+product_rating_counts = ratings_index.rating_counts()[_product_index]
+
+# Daily rating counts and averages over the longest trend window, read from
+# the month partitions overlapping it only (so the cost follows the window,
+# not the history); shorter windows are its last days
+TREND_DAYS = (7, 30, 90)
+DEFAULT_TREND_DAYS = 30
+
+
+def daily_rating_trend(days):
+    """Rating count and average per day over the `days` days up to the newest rating"""
+    start, end = last_days(days, RATINGS_LOG)
+    window = load_ratings(RATINGS_LOG, start, end, columns=['rating', 'timestamp'])
+    daily = window.groupby(window['timestamp'].dt.floor('D'))['rating'].agg(['count', 'mean'])
+    return {
+        'days': [day.strftime('%Y-%m-%d') for day in daily.index],
+        'count': daily['count'].tolist(),
+        'mean': daily['mean'].tolist()
+    }
+
+
+rating_trend = daily_rating_trend(max(TREND_DAYS))
+
+# Filter key of the unfiltered view; charts for it come from the aggregates
+UNFILTERED = (None, None, ())
+
+# Number of distinct filters whose chart data is kept per chart
+FILTER_CACHE_SIZE = 128
+
+CATEGORY_COLORS = ['#4361ee', '#06d6a0', '#ff9f1c', '#9b5de5', '#f15bb5', '#00bbf9', '#ff5a5f', '#0fa3b1', '#fb5607', '#7209b7']
+
+# Bubble scaling for the scatter, fixed so filtering does not resize bubbles
+SCATTER_SIZE_MAX = 25
+SCATTER_SIZEREF = 2.0 * products_df['rating_count'].max() / SCATTER_SIZE_MAX ** 2
+
+# Above this many products the scatter renders with WebGL, and any view with
+# more points than SCATTER_MAX_POINTS is sent as a density-preserving sample
+SCATTERGL_THRESHOLD = 5000
+SCATTER_MAX_POINTS = 5000
+ScatterTrace = go.Scattergl if len(products_df) > SCATTERGL_THRESHOLD else go.Scatter
+
+
+def normalize_filter(price_range, categories):
+    """
+    Canonical, hashable filter key: slider ends map to open bounds and a
+    category selection covering every category maps to no selection
+    """
+    min_price, max_price = price_range
+    min_price = None if min_price <= int(totals['min_price']) else float(min_price)
+    max_price = None if max_price >= int(totals['max_price']) else float(max_price)
+    categories = tuple(sorted(set(categories or []) & set(filter_index.categories)))
+    if len(categories) == len(filter_index.categories):
+        categories = ()
+    return (min_price, max_price, categories)
+
+
+def _key_from_store(data):
+    if data is None:
+        return None
+    min_price, max_price, categories = data
+    return (min_price, max_price, tuple(categories))
+
+
+@lru_cache(maxsize=FILTER_CACHE_SIZE)
+def filtered_rows(key):
+    """Positional rows of products_df matching a normalized filter key"""
+    min_price, max_price, categories = key
+    return filter_index.row_ids(
+        -np.inf if min_price is None else min_price,
+        np.inf if max_price is None else max_price,
+        categories
+    )
+
+
+@lru_cache(maxsize=FILTER_CACHE_SIZE)
+def filtered_category_summary(key):
+    if key == UNFILTERED:
+        return aggregates['category_summary']
+    rows = filtered_rows(key)
+    codes = filter_index.codes[rows]
+    counts = np.bincount(codes, minlength=len(filter_index.categories))
+    price_sums = np.bincount(codes, weights=products_df['price'].to_numpy()[rows],
+                             minlength=len(filter_index.categories))
+    present = np.flatnonzero(counts)
+    return {
+        'categories': [filter_index.categories[c] for c in present],
+        'product_count': counts[present].tolist(),
+        'mean_price': (price_sums[present] / counts[present]).tolist()
+    }
+
+
+@lru_cache(maxsize=FILTER_CACHE_SIZE)
+def filtered_price_box(key):
+    if key == UNFILTERED:
+        return aggregates['price_box']
+    return box_stats(products_df.iloc[filtered_rows(key)], 'price', by='category')
+
+
+def live_rating_totals(count, total, histogram):
+    """Rating histogram, average and count with live ratings added to the aggregates"""
+    n_ratings = totals['ratings'] + count
+    counts = (np.asarray(aggregates['rating_histogram']['counts']) + histogram).tolist()
+    avg_rating = (totals['avg_rating'] * totals['ratings'] + total) / n_ratings if n_ratings else 0.0
+    return {'edges': aggregates['rating_histogram']['edges'], 'counts': counts}, avg_rating, n_ratings
+
+
+def filtered_rating_histogram(key):
+    if key == UNFILTERED:
+        live = live_ratings.delta_since(live_ratings.start_offset)
+        if live is None:
+            return aggregates['rating_histogram'], totals['avg_rating']
+        histogram, avg_rating, _ = live_rating_totals(live['count'], live['total'], live['histogram'])
+        return histogram, avg_rating
+    return _filtered_rating_histogram(key)
+
+
+@lru_cache(maxsize=FILTER_CACHE_SIZE)
+def _filtered_rating_histogram(key):
+    rows = filtered_rows(key)
+    counts = product_rating_histograms[rows].sum(axis=0)
+    n_ratings = int(product_rating_counts[rows].sum())
+    avg_rating = float(product_rating_sums[rows].sum()) / n_ratings if n_ratings else 0.0
+    return {'edges': rating_histogram([])['edges'], 'counts': counts.tolist()}, avg_rating
+
+
+@lru_cache(maxsize=FILTER_CACHE_SIZE)
+def filtered_top_products(key):
+    if key == UNFILTERED:
+        return aggregates['top_products']
+    return top_products(products_df.iloc[filtered_rows(key)])
+
+
+def parse_viewport(relayout):
+    """
+    Visible (x0, x1, y0, y1) ranges from a graph's relayoutData, None for an
+    unbounded side, or None when the event carries no axis range (autorange)
+    """
+    if not relayout:
+        return None
+    bounds = []
+    for axis in ('xaxis', 'yaxis'):
+        axis_range = relayout.get(f'{axis}.range') or [relayout.get(f'{axis}.range[0]'),
+                                                       relayout.get(f'{axis}.range[1]')]
+        bounds.extend(None if v is None else float(v) for v in axis_range)
+    return None if all(v is None for v in bounds) else tuple(bounds)
+
+
+@lru_cache(maxsize=FILTER_CACHE_SIZE)
+def filtered_scatter_traces(key, viewport=None):
+    """
+    Per-category scatter trace data, in filter_index.categories order, for
+    the products matching a filter inside the visible viewport
+    """
+    rows = filtered_rows(key)
+    if viewport is not None:
+        x0, x1, y0, y1 = [b if b is not None else default
+                          for b, default in zip(viewport, (-np.inf, np.inf, -np.inf, np.inf))]
+        prices = products_df['price'].to_numpy()[rows]
+        ratings = products_df['avg_rating'].to_numpy()[rows]
+        rows = rows[(prices >= x0) & (prices <= x1) & (ratings >= y0) & (ratings <= y1)]
+    if len(rows) > SCATTER_MAX_POINTS:
+        rows = rows[bin_downsample(
+            products_df['price'].to_numpy()[rows],
+            products_df['avg_rating'].to_numpy()[rows],
+            products_df['rating_count'].to_numpy()[rows],
+            SCATTER_MAX_POINTS
+        )]
+    df = products_df.iloc[rows]
+    codes = filter_index.codes[rows]
+    traces = []
+    for code in range(len(filter_index.categories)):
+        sub = df[codes == code]
+        traces.append({
+            'x': sub['price'].tolist(),
+            'y': sub['avg_rating'].tolist(),
+            'marker.size': sub['rating_count'].tolist(),
+            'customdata': list(zip(sub['name'], sub['rating_count'].tolist(),
+                                   sub['category'].astype(str)))
+        })
+    return traces
+
+
+def box_trace_props(box):
+    """
+    Per-trace data of the price box plot: one box per category in the
+    aggregates' order, then the trace holding the sampled outliers
+    """
+    index = {group: i for i, group in enumerate(box['groups'])}
+    traces = []
+    outlier_x, outlier_y, outlier_colors = [], [], []
+    for n, group in enumerate(aggregates['price_box']['groups']):
+        i = index.get(group)
+        if i is None:
+            traces.append({'visible': False})
+            continue
+        traces.append({
+            'visible': True,
+            **{stat: [box[stat][i]] for stat in ['q1', 'median', 'q3', 'lowerfence', 'upperfence', 'mean']}
+        })
+        outlier_x.extend([group] * len(box['outliers'][i]))
+        outlier_y.extend(box['outliers'][i])
+        outlier_colors.extend([CATEGORY_COLORS[n % len(CATEGORY_COLORS)]] * len(box['outliers'][i]))
+    traces.append({'x': outlier_x, 'y': outlier_y, 'marker.color': outlier_colors})
+    return traces
+
+
+def trace_patch(old_traces, new_traces):
+    """
+    Patch that updates only the traces whose data changed. Property names
+    with a dot (e.g. 'marker.size') address nested attributes.
+    """
+    patch = Patch()
+    changed = False
+    for i, props in enumerate(new_traces):
+        if old_traces is not None and old_traces[i] == props:
+            continue
+        for prop, value in props.items():
+            target = patch['data'][i]
+            *parents, leaf = prop.split('.')
+            for parent in parents:
+                target = target[parent]
+            target[leaf] = value
+        changed = True
+    return patch if changed else None
+
+
+def category_analysis_figure(summary):
+    """Grouped bar chart of product count and average price per category"""
+    return go.Figure([
+        go.Bar(name='Number of Products', x=summary['categories'], y=summary['product_count'],
+               marker_color='#4361ee'),
+        go.Bar(name='Average Price ($)', x=summary['categories'], y=summary['mean_price'],
+               marker_color='#06d6a0')
+    ]).update_layout(
+        barmode='group',
+        plot_bgcolor='rgba(248, 249, 250, 0.5)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font={'color': '#2c3e50', 'family': 'Inter, sans-serif'},
+        showlegend=True,
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
+        margin=dict(l=40, r=40, t=40, b=40),
+        xaxis=dict(
+            showgrid=False,
+            tickangle=45,
+            title=dict(text='Category', font=dict(size=12))
+        ),
+        yaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(236, 240, 241, 0.5)',
+            title=dict(font=dict(size=12))
+        ),
+        hoverlabel=dict(
+            bgcolor='white',
+            font_size=12,
+            font_family='Inter, sans-serif'
+        )
+    )
+
+
+def price_distribution_figure(box):
+    """
+    Box plot of prices per category from precomputed statistics, with a
+    capped sample of outliers, so the payload does not depend on the
+    number of products
+    """
+    traces = box_trace_props(box)
+    return go.Figure([
+        go.Box(
+            name=group,
+            x=[group],
+            q1=trace['q1'],
+            median=trace['median'],
+            q3=trace['q3'],
+            lowerfence=trace['lowerfence'],
+            upperfence=trace['upperfence'],
+            mean=trace['mean'],
+            boxmean=True,  # adds mean to box plots
+            line=dict(width=1.5),
+            marker_color=CATEGORY_COLORS[i % len(CATEGORY_COLORS)]
+        )
+        for i, (group, trace) in enumerate(zip(box['groups'], traces))
+    ] + [
+        go.Scatter(
+            name='Outliers',
+            x=traces[-1]['x'],
+            y=traces[-1]['y'],
+            mode='markers',
+            marker=dict(size=3, color=traces[-1]['marker.color']),
+            hovertemplate="%{x}: $%{y:.2f}<extra>Outlier</extra>"
+        )
+    ]).update_layout(
+        plot_bgcolor='rgba(248, 249, 250, 0.5)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font={'color': '#2c3e50', 'family': 'Inter, sans-serif'},
+        showlegend=False,
+        margin=dict(l=40, r=40, t=40, b=80),
+        xaxis=dict(
+            showgrid=False,
+            tickangle=45,
+            title=dict(text='Category', font=dict(size=12))
+        ),
+        yaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(236, 240, 241, 0.5)',
+            title=dict(text='Price ($)', font=dict(size=12))
+        ),
+        hoverlabel=dict(
+            bgcolor='white',
+            font_size=12,
+            font_family='Inter, sans-serif'
+        )
+    )
+
+
+def rating_distribution_figure(histogram, avg_rating):
+    """Rating histogram from precomputed bin counts"""
+    edges = np.asarray(histogram['edges'])
+    return go.Figure(
+        go.Bar(
+            x=(edges[:-1] + edges[1:]) / 2,
+            y=histogram['counts'],
+            marker_color='#ff9f1c'
+        )
+    ).update_layout(
+        plot_bgcolor='rgba(248, 249, 250, 0.5)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font={'color': '#2c3e50', 'family': 'Inter, sans-serif'},
+        showlegend=False,
+        bargap=0.1,
+        margin=dict(l=40, r=40, t=40, b=40),
+        xaxis=dict(
+            showgrid=False,
+            title=dict(text='Rating', font=dict(size=12)),
+            tickvals=[1, 2, 3, 4, 5]
+        ),
+        yaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(236, 240, 241, 0.5)',
+            title=dict(text='Number of Ratings', font=dict(size=12))
+        ),
+        hoverlabel=dict(
+            bgcolor='white',
+            font_size=12,
+            font_family='Inter, sans-serif'
+        )
+    ).add_annotation(
+        text=f'Average: {avg_rating:.2f}/5',
+        xref='paper', yref='paper',
+        x=0.98, y=0.95,
+        showarrow=False,
+        font=dict(size=13, color='#2c3e50', family='Inter, sans-serif'),
+        bgcolor='rgba(255, 255, 255, 0.7)',
+        borderpad=4,
+        bordercolor='#f1c40f',
+        borderwidth=2
+    ).update_traces(
+        marker=dict(
+            line=dict(width=1, color='white'),
+            opacity=0.8
+        )
+    )
+
+
+def rating_trend_figure(trend, days):
+    """Ratings per day (bars) and their average (line) over the last `days` days of a trend"""
+    if trend['days']:
+        first = (pd.Timestamp(trend['days'][-1]) - pd.Timedelta(days=days - 1)).strftime('%Y-%m-%d')
+        start = np.searchsorted(trend['days'], first)
+    else:
+        start = 0
+    return go.Figure([
+        go.Bar(
+            x=trend['days'][start:],
+            y=trend['count'][start:],
+            name='Ratings',
+            marker_color='#4361ee',
+            opacity=0.8
+        ),
+        go.Scatter(
+            x=trend['days'][start:],
+            y=trend['mean'][start:],
+            name='Average rating',
+            yaxis='y2',
+            mode='lines+markers',
+            line=dict(color='#ff9f1c', width=2)
+        )
+    ]).update_layout(
+        plot_bgcolor='rgba(248, 249, 250, 0.5)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font={'color': '#2c3e50', 'family': 'Inter, sans-serif'},
+        margin=dict(l=40, r=40, t=40, b=40),
+        legend=dict(orientation='h', y=1.1),
+        xaxis=dict(showgrid=False, type='date'),
+        yaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(236, 240, 241, 0.5)',
+            title=dict(text='Ratings per Day', font=dict(size=12))
+        ),
+        yaxis2=dict(
+            overlaying='y',
+            side='right',
+            range=[1, 5],
+            showgrid=False,
+            title=dict(text='Average Rating', font=dict(size=12))
+        ),
+        hoverlabel=dict(
+            bgcolor='white',
+            font_size=12,
+            font_family='Inter, sans-serif'
+        )
+    )
+
+
+def category_performance_figure(traces):
+    """Price vs rating scatter with one bubble per product and one trace per category"""
+    return go.Figure([
+        ScatterTrace(
+            name=category,
+            x=trace['x'],
+            y=trace['y'],
+            customdata=trace['customdata'],
+            mode='markers',
+            marker=dict(
+                size=trace['marker.size'],
+                sizemode='area',
+                sizeref=SCATTER_SIZEREF,
+                color=CATEGORY_COLORS[i % len(CATEGORY_COLORS)],
+                line=dict(width=1, color='white'),
+                opacity=0.8
+            )
+        )
+        for i, (category, trace) in enumerate(zip(filter_index.categories, traces))
+    ]).update_layout(
+        plot_bgcolor='rgba(248, 249, 250, 0.5)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font={'color': '#2c3e50', 'family': 'Inter, sans-serif'},
+        showlegend=True,
+        legend=dict(
+            orientation='h',
+            yanchor='bottom',
+            y=1.02,
+            xanchor='right',
+            x=1,
+            title=None,
+            font=dict(size=10),
+            bgcolor='rgba(255, 255, 255, 0.8)',
+            bordercolor='rgba(0, 0, 0, 0.1)',
+            borderwidth=1
+        ),
+        margin=dict(l=40, r=40, t=40, b=40),
+        xaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(236, 240, 241, 0.5)',
+            zeroline=False,
+            title=dict(text='Price ($)', font=dict(size=12))
+        ),
+        yaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(236, 240, 241, 0.5)',
+            zeroline=False,
+            title=dict(text='Average Rating', font=dict(size=12)),
+            range=[0, 5.5]
+        ),
+        hoverlabel=dict(
+            bgcolor='white',
+            font_size=12,
+            font_family='Inter, sans-serif',
+            bordercolor='rgba(0,0,0,0.1)'
+        )
+    ).update_traces(
+        hovertemplate="<b>%{customdata[0]}</b><br>" +
+                      "Category: %{customdata[2]}<br>" +
+                      "Price: $%{x:.2f}<br>" +
+                      "Rating: %{y:.1f}/5<br>" +
+                      "Reviews: %{customdata[1]}<extra></extra>"
+    )
+
+
 # Initialize the Dash app with a modern theme
 app = dash.Dash(
     __name__,
@@ -63,7 +574,7 @@ navbar = dbc.Navbar(
                         html.I(className="fas fa-clock me-2"),
                         html.Span("Updated: ", style={"fontWeight": "500"}),
                         html.Span(datetime.now().strftime("%B %d, %Y %H:%M"),
-                                className="text-white-50")
+                                id="last-updated", className="text-white-50")
                     ], className="d-flex align-items-center bg-dark px-3 py-1 rounded")
                 ], className="d-flex align-items-center justify-content-end")
             ])
@@ -92,24 +603,174 @@ def toggle_modal(n1, n2, is_open):
 
 @app.callback(
     [Output("price-range-output", "children"),
-     Output("filtered-products", "children")],
+     Output("filtered-products", "children"),
+     Output("filter-store", "data")],
     [Input("price-range", "value"),
-     Input("category-dropdown", "value")]
+     Input("category-dropdown", "value")],
+    [State("filter-store", "data")]
 )
-def update_filters(price_range, selected_categories):
+def update_filters(price_range, selected_categories, store):
     min_price, max_price = price_range
+    key = normalize_filter(price_range, selected_categories)
     
-    # Filter by price
-    filtered_df = products_df[(products_df['price'] >= min_price) & 
-                             (products_df['price'] <= max_price)]
+    # Count products in the price range, restricted to the selected categories
+    # (binary searches only; the rows themselves are not materialized)
+    min_key, max_key, categories = key
+    n_products = filter_index.count(-np.inf if min_key is None else min_key,
+                                    np.inf if max_key is None else max_key, categories)
     
-    # Filter by category if categories selected
-    if selected_categories and len(selected_categories) > 0:
-        filtered_df = filtered_df[filtered_df['category'].isin(selected_categories)]
+    # Charts react to the store; keep the previous filter so they can send
+    # only the traces that changed
+    current = _key_from_store((store or {}).get('filter'))
+    if current == key:
+        store_update = no_update
+    else:
+        store_update = {'filter': key, 'previous': (store or {}).get('filter')}
     
     return (
         f"Price Range: ${min_price} - ${max_price}",
-        f"Showing {len(filtered_df)} products"
+        f"Showing {n_products} products",
+        store_update
+    )
+
+
+def _store_keys(store):
+    # Charts in the initial layout show the unfiltered view
+    previous = _key_from_store(store.get('previous')) or UNFILTERED
+    return previous, _key_from_store(store['filter'])
+
+
+@app.callback(
+    Output("category-analysis-chart", "figure"),
+    [Input("filter-store", "data")],
+    prevent_initial_call=True
+)
+def update_category_analysis(store):
+    previous, key = _store_keys(store)
+
+    def traces(summary):
+        return [{'x': summary['categories'], 'y': summary['product_count']},
+                {'x': summary['categories'], 'y': summary['mean_price']}]
+
+    patch = trace_patch(traces(filtered_category_summary(previous)),
+                        traces(filtered_category_summary(key)))
+    return no_update if patch is None else patch
+
+
+@app.callback(
+    Output("price-distribution-chart", "figure"),
+    [Input("filter-store", "data")],
+    prevent_initial_call=True
+)
+def update_price_distribution(store):
+    previous, key = _store_keys(store)
+    patch = trace_patch(box_trace_props(filtered_price_box(previous)),
+                        box_trace_props(filtered_price_box(key)))
+    return no_update if patch is None else patch
+
+
+@app.callback(
+    Output("rating-distribution-chart", "figure"),
+    [Input("filter-store", "data")],
+    prevent_initial_call=True
+)
+def update_rating_distribution(store):
+    # update_live_ratings also patches this chart, so the client's figure may
+    # not be the one the previous filter produced: always send the full trace
+    _, key = _store_keys(store)
+    histogram, avg_rating = filtered_rating_histogram(key)
+
+    patch = trace_patch(None, [{'y': histogram['counts']}])
+    patch['layout']['annotations'][0]['text'] = f'Average: {avg_rating:.2f}/5'
+    return patch
+
+
+@app.callback(
+    Output("rating-trend-chart", "figure"),
+    [Input("trend-days", "value")],
+    prevent_initial_call=True
+)
+def update_rating_trend(days):
+    return rating_trend_figure(rating_trend, days)
+
+
+@app.callback(
+    Output("top-products-table", "data"),
+    [Input("filter-store", "data")],
+    prevent_initial_call=True
+)
+def update_top_products(store):
+    previous, key = _store_keys(store)
+    rows = filtered_top_products(key)
+    return no_update if rows == filtered_top_products(previous) else rows
+
+
+@app.callback(
+    Output("category-performance-chart", "figure"),
+    [Input("filter-store", "data"),
+     Input("category-performance-chart", "relayoutData")],
+    prevent_initial_call=True
+)
+def update_category_performance(store, relayout):
+    if not store:
+        return no_update
+    previous, key = _store_keys(store)
+    viewport = parse_viewport(relayout)
+
+    if dash.callback_context.triggered_id == "category-performance-chart":
+        # Zoom/pan: send the full-resolution points of the visible region
+        # (or a sample of it if still too dense); other relayout events
+        # such as autosize need no data
+        if not any(k.startswith(('xaxis.', 'yaxis.')) for k in relayout or {}):
+            return no_update
+        patch = trace_patch(None, filtered_scatter_traces(key, viewport))
+        return no_update if patch is None else patch
+
+    # The scatter starts empty, so its first render is a full figure
+    if store.get('previous') is None:
+        return category_performance_figure(filtered_scatter_traces(key, viewport))
+    patch = trace_patch(filtered_scatter_traces(previous, viewport), filtered_scatter_traces(key, viewport))
+    return no_update if patch is None else patch
+
+@app.callback(
+    [Output("live-store", "data"),
+     Output("last-updated", "children"),
+     Output("total-ratings", "children"),
+     Output("avg-rating-badge", "children"),
+     Output("rating-count-note", "children"),
+     Output("rating-distribution-chart", "figure", allow_duplicate=True)],
+    [Input("live-interval", "n_intervals")],
+    [State("live-store", "data"),
+     State("filter-store", "data")],
+    prevent_initial_call=True
+)
+def update_live_ratings(n_intervals, live, store):
+    live_ratings.start()
+    # Only the ratings ingested since this client's version are fetched
+    # and sent; nothing is sent while the log is idle
+    delta = live_ratings.delta_since(live['version'])
+    if delta is None:
+        return [no_update] * 6
+    if not delta['full']:
+        delta['count'] += live['count']
+        delta['total'] += live['total']
+        delta['histogram'] = [a + b for a, b in zip(live['histogram'], delta['histogram'])]
+    histogram, avg_rating, n_ratings = live_rating_totals(delta['count'], delta['total'], delta['histogram'])
+
+    # The chart shows a filtered view while a filter is active
+    chart = no_update
+    if (_key_from_store((store or {}).get('filter')) or UNFILTERED) == UNFILTERED:
+        chart = Patch()
+        chart['data'][0]['y'] = histogram['counts']
+        chart['layout']['annotations'][0]['text'] = f'Average: {avg_rating:.2f}/5'
+    return (
+        {'version': delta['version'], 'count': delta['count'], 'total': delta['total'],
+         'histogram': delta['histogram']},
+        delta['updated'].strftime("%B %d, %Y %H:%M"),
+        f"{n_ratings:,}",
+        f"Avg: {avg_rating:.1f}/5",
+        f"{n_ratings:,}",
+        chart
     )
 
 # Layout
@@ -176,6 +837,10 @@ app.clientside_callback(
 
 app.layout = dbc.Container([
     dcc.Store(id='filter-store', data={}),
+    # Live ratings this client has applied, as of log offset 'version'
+    dcc.Store(id='live-store', data={'version': live_start, 'count': 0, 'total': 0.0,
+                                     'histogram': [0] * len(aggregates['rating_histogram']['counts'])}),
+    dcc.Interval(id='live-interval', interval=LIVE_INTERVAL_MS),
     dcc.Location(id='url', refresh=False),
     loading_overlay,
     notification,
@@ -190,11 +855,11 @@ app.layout = dbc.Container([
                 html.H6("Price Range", className="mt-3"),
                 dcc.RangeSlider(
                     id="price-range",
-                    min=int(products_df['price'].min()),
-                    max=int(products_df['price'].max()),
+                    min=int(totals['min_price']),
+                    max=int(totals['max_price']),
                     step=5,
-                    value=[int(products_df['price'].min()), int(products_df['price'].max() / 2)],
-                    marks={i: f"${i}" for i in range(0, int(products_df['price'].max()) + 1, 100)},
+                    value=[int(totals['min_price']), int(totals['max_price'])],
+                    marks={i: f"${i}" for i in range(0, int(totals['max_price']) + 1, 100)},
                     className="mt-2 mb-4",
                 ),
                 html.Div(id="price-range-output", className="text-center mb-4"),
@@ -202,7 +867,7 @@ app.layout = dbc.Container([
                 html.H6("Categories", className="mt-3"),
                 dcc.Dropdown(
                     id="category-dropdown",
-                    options=[{"label": cat, "value": cat} for cat in sorted(products_df['category'].unique())],
+                    options=[{"label": cat, "value": cat} for cat in aggregates['category_summary']['categories']],
                     multi=True,
                     placeholder="Select categories",
                     className="mb-4"
@@ -233,10 +898,10 @@ app.layout = dbc.Container([
                 dbc.CardBody([
                     html.Div([
                         html.I(className="fas fa-box fa-2x mb-3", style={"color": "#3498db"}),
-                        html.H4(f"{len(products_df):,}", className="mb-1"),
+                        html.H4(f"{totals['products']:,}", className="mb-1"),
                         html.P("Total Products", className="text-muted mb-0"),
                         html.Div([
-                            html.Span(f"{len(products_df['category'].unique())} Categories", 
+                            html.Span(f"{totals['categories']} Categories", 
                                    className="badge bg-light text-primary mt-2")
                         ])
                     ], className="text-center")
@@ -248,7 +913,7 @@ app.layout = dbc.Container([
                 dbc.CardBody([
                     html.Div([
                         html.I(className="fas fa-users fa-2x mb-3", style={"color": "#2ecc71"}),
-                        html.H4(f"{len(users_df):,}", className="mb-1"),
+                        html.H4(f"{totals['users']:,}", className="mb-1"),
                         html.P("Total Users", className="text-muted mb-0"),
                         html.Div([
                             html.Span("Active Community", 
@@ -263,10 +928,10 @@ app.layout = dbc.Container([
                 dbc.CardBody([
                     html.Div([
                         html.I(className="fas fa-star fa-2x mb-3", style={"color": "#f1c40f"}),
-                        html.H4(f"{len(ratings_df):,}", className="mb-1"),
+                        html.H4(f"{totals['ratings']:,}", id="total-ratings", className="mb-1"),
                         html.P("Total Ratings", className="text-muted mb-0"),
                         html.Div([
-                            html.Span(f"Avg: {ratings_df['rating'].mean():.1f}/5", 
+                            html.Span(f"Avg: {totals['avg_rating']:.1f}/5", id="avg-rating-badge",
                                    className="badge bg-light text-warning mt-2")
                         ])
                     ], className="text-center")
@@ -278,10 +943,10 @@ app.layout = dbc.Container([
                 dbc.CardBody([
                     html.Div([
                         html.I(className="fas fa-dollar-sign fa-2x mb-3", style={"color": "#9b59b6"}),
-                        html.H4(f"${products_df['price'].mean():.2f}", className="mb-1"),
+                        html.H4(f"${totals['avg_price']:.2f}", className="mb-1"),
                         html.P("Average Price", className="text-muted mb-0"),
                         html.Div([
-                            html.Span(f"Range: ${products_df['price'].min():.0f}-${products_df['price'].max():.0f}", 
+                            html.Span(f"Range: ${totals['min_price']:.0f}-${totals['max_price']:.0f}", 
                                    className="badge bg-light text-info mt-2")
                         ])
                     ], className="text-center")
@@ -304,40 +969,7 @@ app.layout = dbc.Container([
                 dbc.CardBody([
                     dcc.Graph(
                         id='category-analysis-chart',
-                        figure=px.bar(
-                            products_df.groupby('category').agg({
-                                'product_id': 'count',
-                                'price': 'mean'
-                            }).reset_index(),
-                            x='category',
-                            y=['product_id', 'price'],
-                            barmode='group',
-                            title='',
-                            labels={'product_id': 'Number of Products', 'price': 'Average Price ($)', 'category': 'Category'},
-                            color_discrete_sequence=['#4361ee', '#06d6a0']
-                        ).update_layout(
-                            plot_bgcolor='rgba(248, 249, 250, 0.5)',
-                            paper_bgcolor='rgba(0,0,0,0)',
-                            font={'color': '#2c3e50', 'family': 'Inter, sans-serif'},
-                            showlegend=True,
-                            legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
-                            margin=dict(l=40, r=40, t=40, b=40),
-                            xaxis=dict(
-                                showgrid=False,
-                                tickangle=45,
-                                title=dict(font=dict(size=12))
-                            ),
-                            yaxis=dict(
-                                showgrid=True,
-                                gridcolor='rgba(236, 240, 241, 0.5)',
-                                title=dict(font=dict(size=12))
-                            ),
-                            hoverlabel=dict(
-                                bgcolor='white',
-                                font_size=12,
-                                font_family='Inter, sans-serif'
-                            )
-                        )
+                        figure=category_analysis_figure(aggregates['category_summary'])
                     ),
                     html.Div([
                         html.Small(["Click on categories to filter - ", 
@@ -363,40 +995,7 @@ app.layout = dbc.Container([
                 dbc.CardBody([
                     dcc.Graph(
                         id='price-distribution-chart',
-                        figure=px.box(
-                            products_df,
-                            x='category',
-                            y='price',
-                            color='category',
-                            title='',
-                            labels={'price': 'Price ($)', 'category': 'Category'},
-                            color_discrete_sequence=['#4361ee', '#06d6a0', '#ff9f1c', '#9b5de5', '#f15bb5', '#00bbf9', '#ff5a5f', '#0fa3b1', '#fb5607', '#7209b7']
-                        ).update_layout(
-                            plot_bgcolor='rgba(248, 249, 250, 0.5)',
-                            paper_bgcolor='rgba(0,0,0,0)',
-                            font={'color': '#2c3e50', 'family': 'Inter, sans-serif'},
-                            showlegend=False,
-                            margin=dict(l=40, r=40, t=40, b=80),
-                            xaxis=dict(
-                                showgrid=False, 
-                                tickangle=45,
-                                title=dict(font=dict(size=12))
-                            ),
-                            yaxis=dict(
-                                showgrid=True, 
-                                gridcolor='rgba(236, 240, 241, 0.5)',
-                                title=dict(font=dict(size=12))
-                            ),
-                            hoverlabel=dict(
-                                bgcolor='white',
-                                font_size=12,
-                                font_family='Inter, sans-serif'
-                            )
-                        ).update_traces(
-                            boxmean=True,  # adds mean to box plots
-                            line=dict(width=1.5),
-                            marker=dict(size=3)
-                        )
+                        figure=price_distribution_figure(aggregates['price_box'])
                     ),
                     html.Div([
                         html.Small(["Showing ", html.Strong("median"), " and ", html.Strong("quartile"), " ranges"], 
@@ -417,55 +1016,11 @@ app.layout = dbc.Container([
                 dbc.CardBody([
                     dcc.Graph(
                         id='rating-distribution-chart',
-                        figure=px.histogram(
-                            ratings_df,
-                            x='rating',
-                            nbins=10,
-                            title='',
-                            labels={'rating': 'Rating', 'count': 'Number of Ratings'},
-                            opacity=0.8,
-                            color_discrete_sequence=['#ff9f1c']
-                        ).update_layout(
-                            plot_bgcolor='rgba(248, 249, 250, 0.5)',
-                            paper_bgcolor='rgba(0,0,0,0)',
-                            font={'color': '#2c3e50', 'family': 'Inter, sans-serif'},
-                            showlegend=False,
-                            bargap=0.1,
-                            margin=dict(l=40, r=40, t=40, b=40),
-                            xaxis=dict(
-                                showgrid=False,
-                                title=dict(font=dict(size=12)),
-                                tickvals=[1, 2, 3, 4, 5]
-                            ),
-                            yaxis=dict(
-                                showgrid=True, 
-                                gridcolor='rgba(236, 240, 241, 0.5)',
-                                title=dict(font=dict(size=12))
-                            ),
-                            hoverlabel=dict(
-                                bgcolor='white',
-                                font_size=12,
-                                font_family='Inter, sans-serif'
-                            )
-                        ).add_annotation(
-                            text=f'Average: {ratings_df["rating"].mean():.2f}/5',
-                            xref='paper', yref='paper',
-                            x=0.98, y=0.95,
-                            showarrow=False,
-                            font=dict(size=13, color='#2c3e50', family='Inter, sans-serif'),
-                            bgcolor='rgba(255, 255, 255, 0.7)',
-                            borderpad=4,
-                            bordercolor='#f1c40f',
-                            borderwidth=2
-                        ).update_traces(
-                            marker=dict(
-                                line=dict(width=1, color='white'),
-                                opacity=0.8
-                            )
-                        )
+                        figure=rating_distribution_figure(aggregates['rating_histogram'], totals['avg_rating'])
                     ),
                     html.Div([
-                        html.Small(["Distribution across ", html.Strong(f"{len(ratings_df):,}"), " ratings"], 
+                        html.Small(["Distribution across ", html.Strong(f"{totals['ratings']:,}", id="rating-count-note"),
+                                    " ratings"], 
                                  className="text-muted mt-2")
                     ], className="text-center")
                 ])
@@ -473,6 +1028,38 @@ app.layout = dbc.Container([
         ])
     ]),
     
+    # Rating Trend
+    dbc.Row([
+        dbc.Col([
+            dbc.Card([
+                dbc.CardHeader(
+                    html.Div([
+                        html.H5([
+                            html.Span(className="me-2"),
+                            html.I(className="fas fa-chart-line me-2"),
+                            "Rating Trend"
+                        ], className="mb-0 d-flex align-items-center"),
+                        dbc.RadioItems(
+                            id='trend-days',
+                            options=[{'label': f'{days} days', 'value': days} for days in TREND_DAYS],
+                            value=DEFAULT_TREND_DAYS,
+                            inline=True
+                        )
+                    ], className="d-flex justify-content-between align-items-center")
+                ),
+                dbc.CardBody([
+                    dcc.Graph(
+                        id='rating-trend-chart',
+                        figure=rating_trend_figure(rating_trend, DEFAULT_TREND_DAYS)
+                    ),
+                    html.Div([
+                        html.Small("Days up to the newest rating in the data", className="text-muted mt-2")
+                    ], className="text-center")
+                ])
+            ], className="mb-4 shadow-sm card-accent-primary hover-card")
+        ])
+    ]),
+
     # Top Products
     dbc.Row([
         dbc.Col([
@@ -483,9 +1070,8 @@ app.layout = dbc.Container([
                 ),
                 dbc.CardBody([
                     dash.dash_table.DataTable(
-                        data=products_df.nlargest(10, 'avg_rating')[
-                            ['name', 'category', 'price', 'avg_rating', 'rating_count']
-                        ].round(2).to_dict('records'),
+                        id='top-products-table',
+                        data=aggregates['top_products'],
                         columns=[
                             {'name': 'Name', 'id': 'name'},
                             {'name': 'Category', 'id': 'category'},
@@ -538,71 +1124,7 @@ app.layout = dbc.Container([
                 ),
                 dbc.CardBody([
                     dcc.Graph(
-                        id='category-performance-chart',
-                        figure=px.scatter(
-                            products_df,
-                            x='price',
-                            y='avg_rating',
-                            color='category',
-                            size='rating_count',
-                            size_max=25,
-                            hover_data=['name', 'rating_count', 'category'],
-                            title='',
-                            labels={
-                                'price': 'Price ($)',
-                                'avg_rating': 'Average Rating',
-                                'rating_count': 'Number of Ratings',
-                                'category': 'Category'
-                            },
-                            color_discrete_sequence=['#4361ee', '#06d6a0', '#ff9f1c', '#9b5de5', '#f15bb5', '#00bbf9', '#ff5a5f', '#0fa3b1', '#fb5607', '#7209b7']
-                        ).update_layout(
-                            plot_bgcolor='rgba(248, 249, 250, 0.5)',
-                            paper_bgcolor='rgba(0,0,0,0)',
-                            font={'color': '#2c3e50', 'family': 'Inter, sans-serif'},
-                            showlegend=True,
-                            legend=dict(
-                                orientation='h',
-                                yanchor='bottom',
-                                y=1.02,
-                                xanchor='right',
-                                x=1,
-                                title=None,
-                                font=dict(size=10),
-                                bgcolor='rgba(255, 255, 255, 0.8)',
-                                bordercolor='rgba(0, 0, 0, 0.1)',
-                                borderwidth=1
-                            ),
-                            margin=dict(l=40, r=40, t=40, b=40),
-                            xaxis=dict(
-                                showgrid=True,
-                                gridcolor='rgba(236, 240, 241, 0.5)',
-                                zeroline=False,
-                                title=dict(font=dict(size=12))
-                            ),
-                            yaxis=dict(
-                                showgrid=True,
-                                gridcolor='rgba(236, 240, 241, 0.5)',
-                                zeroline=False,
-                                title=dict(font=dict(size=12)),
-                                range=[0, 5.5]
-                            ),
-                            hoverlabel=dict(
-                                bgcolor='white',
-                                font_size=12,
-                                font_family='Inter, sans-serif',
-                                bordercolor='rgba(0,0,0,0.1)'
-                            )
-                        ).update_traces(
-                            marker=dict(
-                                line=dict(width=1, color='white'),
-                                opacity=0.8
-                            ),
-                            hovertemplate="<b>%{customdata[0]}</b><br>" +
-                                          "Category: %{customdata[2]}<br>" +
-                                          "Price: $%{x:.2f}<br>" +
-                                          "Rating: %{y:.1f}/5<br>" +
-                                          "Reviews: %{customdata[1]}<extra></extra>"
-                        )
+                        id='category-performance-chart'
                     ),
                     html.Div([
                         html.Small(["Bubble size represents number of ratings"], 
@@ -701,5 +1223,14 @@ app.clientside_callback(
     prevent_initial_call=True
 )
 
+# WSGI entry point for multi-worker servers (python serve.py, or gunicorn
+# --preload dashboard:server)
+server = app.server
+
 if __name__ == '__main__':
-    app.run(debug=True, port=8053)
+    parser = argparse.ArgumentParser(description="Product analysis dashboard (development server)")
+    parser.add_argument('--port', type=int, default=8053)
+    parser.add_argument('--debug', action='store_true', help="enable Dash debug mode and reloading")
+    args = parser.parse_args()
+
+    app.run(debug=args.debug, port=args.port)
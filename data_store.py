@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from schema import apply_schema, side_columns
+
+CACHE_VERSION = 2
+DEFAULT_CACHE_DIR = os.path.join('data', '.cache')
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Hash a file in fixed-size chunks so large sources are never fully in memory"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_fingerprint(path):
+    """Return the size/mtime/hash fingerprint recorded for a source file"""
+    stat = os.stat(path)
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': file_sha256(path)
+    }
+
+
+def fingerprint_matches(path, fingerprint):
+    """
+    Check a source file against a recorded fingerprint.
+
+    Size and mtime are compared first; the file is only re-hashed when the
+    mtime differs. On a hash match the fingerprint's mtime is updated in place.
+    """
+    stat = os.stat(path)
+    if stat.st_size != fingerprint['size']:
+        return False
+    if stat.st_mtime_ns == fingerprint['mtime_ns']:
+        return True
+    if file_sha256(path) != fingerprint['sha256']:
+        return False
+    fingerprint['mtime_ns'] = stat.st_mtime_ns
+    return True
+
+
+def cache_key(*paths):
+    """
+    Cache entry name for source files: the first file's stem plus a short
+    hash of their absolute paths, so same-named files in different
+    directories do not share (and keep overwriting) one entry
+    """
+    digest = hashlib.sha256('\0'.join(os.path.abspath(p) for p in paths).encode()).hexdigest()[:12]
+    return f"{os.path.splitext(os.path.basename(paths[0]))[0]}-{digest}"
+
+
+def cache_path_for(path, cache_dir=DEFAULT_CACHE_DIR):
+    """Directory holding the columnar cache of a CSV file"""
+    return os.path.join(cache_dir, cache_key(path))
+
+
+def _read_manifest(cache_path):
+    try:
+        with open(os.path.join(cache_path, 'manifest.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(cache_path, manifest):
+    tmp_path = os.path.join(cache_path, 'manifest.json.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(cache_path, 'manifest.json'))
+
+
+def is_cache_fresh(path, cache_path):
+    """
+    Check whether the cache still matches its source file. A touched but
+    unchanged file does not trigger a rebuild.
+    """
+    manifest = _read_manifest(cache_path)
+    if manifest is None or manifest.get('version') != CACHE_VERSION:
+        return False
+
+    source = manifest['source']
+    mtime_ns = source['mtime_ns']
+    if not fingerprint_matches(path, source):
+        return False
+
+    # Same content under a new mtime: remember it to skip hashing next time
+    if source['mtime_ns'] != mtime_ns:
+        _write_manifest(cache_path, manifest)
+    return True
+
+
+def build_cache(path, cache_path):
+    """
+    Convert a CSV file into one .npy file per column, in the compact types
+    of its schema (schema.py).
+
+    Numeric and datetime columns are stored as-is; string columns are
+    dictionary encoded as int32 codes plus a unique-values array. Side
+    columns are stored too, but only loaded when asked for by name.
+    """
+    df = apply_schema(pd.read_csv(path), path)
+    side = side_columns(path)
+    tmp_path = cache_path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    columns = []
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        if (pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series)
+                or pd.api.types.is_datetime64_dtype(series)):
+            np.save(os.path.join(tmp_path, f'c{i}.npy'), series.to_numpy())
+            kind = 'numeric'
+        else:
+            codes, uniques = pd.factorize(series)
+            np.save(os.path.join(tmp_path, f'c{i}.codes.npy'), codes.astype(np.int32))
+            np.save(os.path.join(tmp_path, f'c{i}.values.npy'), np.array([str(v) for v in uniques], dtype=str))
+            kind = 'category' if isinstance(series.dtype, pd.CategoricalDtype) else 'string'
+        columns.append({'name': name, 'kind': kind, 'side': name in side})
+
+    _write_manifest(tmp_path, {
+        'version': CACHE_VERSION,
+        'source': source_fingerprint(path),
+        'rows': len(df),
+        'columns': columns
+    })
+
+    shutil.rmtree(cache_path, ignore_errors=True)
+    os.replace(tmp_path, cache_path)
+
+
+def read_cache(cache_path, mmap=True, columns=None):
+    """
+    Assemble a DataFrame from a columnar cache directory, optionally with
+    only the named columns. Side columns are only read when named.
+    """
+    manifest = _read_manifest(cache_path)
+    mmap_mode = 'r' if mmap else None
+
+    data = {}
+    for i, column in enumerate(manifest['columns']):
+        name = column['name']
+        wanted = name in columns if columns is not None else not column['side']
+        if not wanted:
+            continue
+        if column['kind'] == 'numeric':
+            data[name] = np.load(os.path.join(cache_path, f'c{i}.npy'), mmap_mode=mmap_mode)
+            continue
+
+        codes = np.load(os.path.join(cache_path, f'c{i}.codes.npy'), mmap_mode=mmap_mode)
+        values = np.load(os.path.join(cache_path, f'c{i}.values.npy')).astype(object)
+        categorical = pd.Categorical.from_codes(codes, categories=values)
+        if column['kind'] == 'category':
+            data[name] = categorical
+        else:
+            data[name] = np.asarray(categorical, dtype=object)
+
+    return pd.DataFrame(data, copy=False)
+
+
+def load_table(path, cache_dir=DEFAULT_CACHE_DIR, mmap=True, columns=None, compact=True):
+    """
+    Load a CSV file through the columnar cache, rebuilding it only when the
+    source has changed. Passing cache_dir=None falls back to read_csv.
+    columns limits the load to those columns; by default every column
+    except the schema's side columns is loaded.
+
+    Columns come in the compact types of the table's schema. compact=False
+    reads the CSV with the types read_csv infers instead (no cache).
+    """
+    if not compact:
+        return pd.read_csv(path, usecols=columns)
+    if cache_dir is None:
+        side = side_columns(path)
+        usecols = columns if columns is not None else (lambda name: name not in side)
+        return apply_schema(pd.read_csv(path, usecols=usecols), path)
+
+    cache_path = cache_path_for(path, cache_dir)
+    if not is_cache_fresh(path, cache_path):
+        os.makedirs(cache_dir, exist_ok=True)
+        build_cache(path, cache_path)
+    return read_cache(cache_path, mmap=mmap, columns=columns)
+
+
+def load_datasets(products_path, ratings_path, users_path, cache_dir=DEFAULT_CACHE_DIR):
+    """Load products, ratings and users through the columnar cache"""
+    return (
+        load_table(products_path, cache_dir),
+        load_table(ratings_path, cache_dir),
+        load_table(users_path, cache_dir)
+    )
+
+
+if __name__ == "__main__":
+    for path in ['data/products.csv', 'data/ratings.csv', 'data/users.csv']:
+        cache_path = cache_path_for(path)
+        if is_cache_fresh(path, cache_path):
+            print(f"{path}: cache up to date")
+        else:
+            os.makedirs(DEFAULT_CACHE_DIR, exist_ok=True)
+            build_cache(path, cache_path)
+            print(f"{path}: cache rebuilt")
@@ -0,0 +1,65 @@
+import numpy as np
+
+
+def bin_downsample(x, y, weights, max_points, bins=64, log_x=True):
+    """
+    Density-preserving downsample for scatter plots.
+
+    Points are binned on a bins x bins grid and each occupied cell keeps a
+    share of max_points proportional to its population (at least one), so
+    dense regions stay dense and sparse outliers are never dropped. Shares
+    are rounded down and the points left over go to the largest remainders,
+    so exactly max_points are kept. Within a cell the points with the
+    largest weight are kept. Returns the positions of the kept points in
+    ascending order.
+    """
+    n = len(x)
+    if n <= max_points:
+        return np.arange(n)
+
+    x = np.nan_to_num(np.log1p(np.maximum(x, 0)) if log_x else np.asarray(x, dtype=np.float64))
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    cells = _grid_cells(x, bins) * bins + _grid_cells(y, bins)
+
+    counts = np.bincount(cells, minlength=bins * bins)
+    quota = _quotas(counts, max_points)
+
+    # Sort by cell, heaviest first, and rank each point within its cell
+    order = np.lexsort((-np.nan_to_num(weights), cells))
+    sorted_cells = cells[order]
+    run_starts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+    run_lengths = np.diff(np.r_[run_starts, n])
+    rank = np.arange(n) - np.repeat(run_starts, run_lengths)
+
+    return np.sort(order[rank < quota[sorted_cells]])
+
+
+def _quotas(counts, max_points):
+    """Per-cell point budgets summing to max_points, at least one per occupied cell"""
+    share = counts * (max_points / counts.sum())
+    quota = np.floor(share).astype(np.int64)
+    occupied = counts > 0
+    quota[occupied & (quota == 0)] = 1
+    spare = max_points - int(quota.sum())
+    if spare > 0:
+        # Largest remainders first, among cells with points left to give
+        open_cells = np.flatnonzero(quota < counts)
+        quota[open_cells[np.argsort(quota[open_cells] - share[open_cells], kind='stable')[:spare]]] += 1
+    while spare < 0:
+        # The ones given to sparse cells overshot: take them back from the
+        # biggest budgets, or if every cell is down to one, the densest cells
+        shrinkable = np.flatnonzero(quota > 1)
+        if len(shrinkable) == 0:
+            shrinkable = np.flatnonzero(occupied & (quota > 0))
+        take = shrinkable[np.argsort(-quota[shrinkable] - counts[shrinkable] / (counts.max() + 1),
+                                     kind='stable')[:-spare]]
+        quota[take] -= 1
+        spare += len(take)
+    return quota
+
+
+def _grid_cells(values, bins):
+    low, high = values.min(), values.max()
+    if high <= low:
+        return np.zeros(len(values), dtype=np.int64)
+    return np.minimum(((values - low) / (high - low) * bins).astype(np.int64), bins - 1)
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+
+class FilterIndex:
+    """
+    Price-range / category-set index over the products table.
+
+    Products are encoded by integer category code and sorted by price within
+    each category, so a query is one pair of searchsorted calls per selected
+    category instead of boolean masks over the whole table.
+    """
+
+    def __init__(self, products_df, price_column='price', category_column='category'):
+        categories = products_df[category_column].astype(str)
+        self.categories = sorted(categories.unique())
+        self.category_codes = {name: code for code, name in enumerate(self.categories)}
+
+        self.codes = pd.Categorical(categories, categories=self.categories).codes
+        prices = products_df[price_column].to_numpy(dtype=np.float64)
+
+        # Row positions ordered by (category code, price); NaN prices sort last
+        self.order = np.lexsort((prices, self.codes))
+        self.sorted_prices = prices[self.order]
+        self.offsets = np.searchsorted(self.codes[self.order], np.arange(len(self.categories) + 1))
+
+    def _codes(self, categories):
+        # No selection means every category, matching the dashboard filter
+        if not categories:
+            return range(len(self.categories))
+        return [self.category_codes[c] for c in categories if c in self.category_codes]
+
+    def _ranges(self, min_price, max_price, categories):
+        for code in self._codes(categories):
+            start, end = self.offsets[code], self.offsets[code + 1]
+            prices = self.sorted_prices[start:end]
+            yield (start + np.searchsorted(prices, min_price, side='left'),
+                   start + np.searchsorted(prices, max_price, side='right'))
+
+    def count(self, min_price, max_price, categories=None):
+        """Number of products with min_price <= price <= max_price in the categories"""
+        return int(sum(hi - lo for lo, hi in self._ranges(min_price, max_price, categories)))
+
+    def row_ids(self, min_price, max_price, categories=None):
+        """Positional row IDs (ascending) of the products matching the filter"""
+        slices = [self.order[lo:hi] for lo, hi in self._ranges(min_price, max_price, categories)]
+        if not slices:
+            return np.empty(0, dtype=self.order.dtype)
+        return np.sort(np.concatenate(slices))
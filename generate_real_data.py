@@ -1,130 +1,382 @@
+import argparse
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-
-def generate_realistic_dataset():
-    """Generate a realistic e-commerce dataset based on Amazon product patterns"""
-    
-    # Categories with subcategories
-    categories = {
-        'Electronics': ['Smartphones', 'Laptops', 'Cameras', 'Audio', 'Gaming'],
-        'Fashion': ['Clothing', 'Shoes', 'Watches', 'Jewelry', 'Accessories'],
-        'Home & Kitchen': ['Furniture', 'Appliances', 'Decor', 'Kitchen', 'Storage'],
-        'Books': ['Fiction', 'Non-Fiction', 'Textbooks', 'Children', 'Comics'],
-        'Beauty': ['Skincare', 'Makeup', 'Haircare', 'Fragrance', 'Tools'],
-        'Sports': ['Exercise', 'Outdoor', 'Team Sports', 'Fitness', 'Accessories'],
-        'Toys': ['Educational', 'Games', 'Outdoor', 'Arts & Crafts', 'Electronics'],
-        'Automotive': ['Parts', 'Tools', 'Electronics', 'Interior', 'Exterior'],
-        'Health': ['Vitamins', 'Medical Supplies', 'Personal Care', 'Wellness', 'Nutrition'],
-        'Pet Supplies': ['Food', 'Toys', 'Health', 'Grooming', 'Accessories']
+from data_store import file_sha256
+
+# Categories with subcategories
+CATEGORIES = {
+    'Electronics': ['Smartphones', 'Laptops', 'Cameras', 'Audio', 'Gaming'],
+    'Fashion': ['Clothing', 'Shoes', 'Watches', 'Jewelry', 'Accessories'],
+    'Home & Kitchen': ['Furniture', 'Appliances', 'Decor', 'Kitchen', 'Storage'],
+    'Books': ['Fiction', 'Non-Fiction', 'Textbooks', 'Children', 'Comics'],
+    'Beauty': ['Skincare', 'Makeup', 'Haircare', 'Fragrance', 'Tools'],
+    'Sports': ['Exercise', 'Outdoor', 'Team Sports', 'Fitness', 'Accessories'],
+    'Toys': ['Educational', 'Games', 'Outdoor', 'Arts & Crafts', 'Electronics'],
+    'Automotive': ['Parts', 'Tools', 'Electronics', 'Interior', 'Exterior'],
+    'Health': ['Vitamins', 'Medical Supplies', 'Personal Care', 'Wellness', 'Nutrition'],
+    'Pet Supplies': ['Food', 'Toys', 'Health', 'Grooming', 'Accessories']
+}
+
+# Lognormal (mean, sigma) of prices: higher for Electronics/Automotive, lower
+# for Books/Beauty/Pet Supplies, medium otherwise
+PRICE_PARAMS = {
+    'Electronics': (5, 1), 'Automotive': (5, 1),
+    'Books': (2.5, 0.5), 'Beauty': (2.5, 0.5), 'Pet Supplies': (2.5, 0.5)
+}
+DEFAULT_PRICE_PARAMS = (4, 0.8)
+
+# At scale 1: 1000-2000 products per category, 10,000 users, 100,000 ratings
+PRODUCTS_PER_CATEGORY = (1000, 2000)
+N_USERS = 10000
+N_RATINGS = 100000
+ACTIVE_USER_SHARE = 0.2
+ACTIVE_RATING_SHARE = 0.6
+RECENCY_DAYS = 30
+CHUNK_SIZE = 1000000
+SHARD_SIZE = 1000000
+MANIFEST_VERSION = 1
+
+CATEGORY_NAMES = np.array(list(CATEGORIES))
+SUBCATEGORY_NAMES = np.array(list(CATEGORIES.values()))
+# Ratings are rounded to 0.1 in [1, 5]
+RATING_LABELS = [f'{r / 10:.1f}' for r in range(10, 51)]
+
+
+def product_categories(rng, scale=1.0):
+    """Category code of every product, in product_id order"""
+    low, high = PRODUCTS_PER_CATEGORY
+    counts = np.maximum((rng.integers(low, high, len(CATEGORIES)) * scale).astype(np.int64), 1)
+    return np.repeat(np.arange(len(CATEGORIES), dtype=np.int8), counts)
+
+
+def generate_products(rng, scale=1.0):
+    """
+    Product attributes as NumPy arrays (category and subcategory as codes
+    into CATEGORY_NAMES / SUBCATEGORY_NAMES), in product_id order
+    """
+    return product_attributes(rng, product_categories(rng, scale))
+
+
+def product_attributes(rng, category, first_id=1):
+    """Attributes of the products with the given category codes, numbered from first_id"""
+    n = len(category)
+    mean, sigma = np.array([PRICE_PARAMS.get(c, DEFAULT_PRICE_PARAMS) for c in CATEGORIES]).T
+    return {
+        'product_id': np.arange(first_id, first_id + n),
+        'category': category,
+        'subcategory': rng.integers(0, SUBCATEGORY_NAMES.shape[1], n).astype(np.int8),
+        'price': rng.lognormal(mean[category], sigma[category]).round(2),
+        # Slightly skewed towards positive; some products very popular
+        'avg_rating': np.clip(rng.normal(4.2, 0.5, n), 1, 5).round(1),
+        'rating_count': rng.lognormal(5, 1, n).astype(np.int64)
     }
-    
-    # Generate products (15,000 products)
-    products = []
-    product_id = 1
-    
-    for category, subcategories in categories.items():
-        # Number of products per category (random between 1000-2000)
-        n_products = np.random.randint(1000, 2000)
-        
-        for _ in range(n_products):
-            subcategory = np.random.choice(subcategories)
-            
-            # Generate realistic price based on category
-            if category in ['Electronics', 'Automotive']:
-                price = np.random.lognormal(5, 1)  # Higher prices
-            elif category in ['Books', 'Beauty', 'Pet Supplies']:
-                price = np.random.lognormal(2.5, 0.5)  # Lower prices
-            else:
-                price = np.random.lognormal(4, 0.8)  # Medium prices
-                
-            # Generate realistic rating (slightly skewed towards positive)
-            avg_rating = np.clip(np.random.normal(4.2, 0.5), 1, 5)
-            rating_count = int(np.random.lognormal(5, 1))  # Some products very popular
-            
-            products.append({
-                'product_id': product_id,
-                'name': f"{category} Product {product_id}",
-                'category': category,
-                'subcategory': subcategory,
-                'price': round(price, 2),
-                'avg_rating': round(avg_rating, 1),
-                'rating_count': rating_count,
-                'description': f"This is a {subcategory} product in the {category} category."
-            })
-            product_id += 1
-    
-    # Convert to DataFrame
-    products_df = pd.DataFrame(products)
-    
-    # Generate users (10,000 users)
-    n_users = 10000
-    users = []
-    
-    for user_id in range(1, n_users + 1):
-        users.append({
-            'user_id': user_id,
-            'name': f"User_{user_id}",
-            'email': f"user_{user_id}@example.com",
-            'registration_date': datetime(2023, 1, 1) + timedelta(days=np.random.randint(0, 365))
-        })
-    
-    users_df = pd.DataFrame(users)
-    
-    # Generate ratings (100,000 ratings)
-    n_ratings = 100000
-    ratings = []
-    
+
+
+def product_frame(products, start=0, stop=None):
+    """Rows start:stop of the products table as a DataFrame"""
+    ids = products['product_id'][start:stop]
+    category = products['category'][start:stop]
+    subcategory = products['subcategory'][start:stop]
+    category_names = pd.Series(CATEGORY_NAMES[category])
+    subcategory_names = pd.Series(SUBCATEGORY_NAMES[category, subcategory])
+    return pd.DataFrame({
+        'product_id': ids,
+        'name': category_names + ' Product ' + pd.Series(ids).astype(str),
+        'category': category_names,
+        'subcategory': subcategory_names,
+        'price': products['price'][start:stop],
+        'avg_rating': products['avg_rating'][start:stop],
+        'rating_count': products['rating_count'][start:stop],
+        'description': 'This is a ' + subcategory_names + ' product in the ' + category_names + ' category.'
+    })
+
+
+def user_frame(rng, start, stop):
+    """Users start+1..stop, registered on a random day of 2023"""
+    ids = np.arange(start + 1, stop + 1)
+    id_strings = pd.Series(ids).astype(str)
+    return pd.DataFrame({
+        'user_id': ids,
+        'name': 'User_' + id_strings,
+        'email': 'user_' + id_strings + '@example.com',
+        'registration_date': np.datetime64('2023-01-01') + rng.integers(0, 365, len(ids)).astype('timedelta64[D]')
+    })
+
+
+def rating_frame(rng, n, avg_rating, user_ids, active_users, now):
+    """
+    n ratings: 60% from the active-user pool, products drawn uniformly,
+    ratings centred on the product average and exponentially recent
+    timestamps. rating and timestamp have few distinct values and are
+    categoricals of their CSV text, which to_csv writes several times
+    faster than floats and datetimes.
+    """
+    from_active = rng.random(n) < ACTIVE_RATING_SHARE
+    users = np.where(from_active,
+                     active_users[rng.integers(0, len(active_users), n)],
+                     user_ids[rng.integers(0, len(user_ids), n)])
+    products = rng.integers(0, len(avg_rating), n)
+    rating = np.clip(rng.normal(avg_rating[products], 0.5), 1, 5)
+    days_ago = rng.exponential(RECENCY_DAYS, n).astype(np.int64)
+    timestamps = pd.Series(now - np.arange(days_ago.max() + 1).astype('timedelta64[D]')).astype(str)
+    return pd.DataFrame({
+        'user_id': users,
+        'product_id': products + 1,
+        'rating': pd.Categorical.from_codes(np.rint(rating * 10).astype(np.int64) - 10, RATING_LABELS),
+        'timestamp': pd.Categorical.from_codes(days_ago, timestamps)
+    })
+
+
+def write_chunks(frames, path):
+    """Stream DataFrames to one CSV file; returns the number of rows written"""
+    rows = 0
+    with open(path, 'w', newline='') as f:
+        for frame in frames:
+            frame.to_csv(f, index=False, header=rows == 0)
+            rows += len(frame)
+    return rows
+
+
+def _chunks(total, chunk_size):
+    for start in range(0, total, chunk_size):
+        yield start, min(start + chunk_size, total)
+
+
+def generate_realistic_dataset(scale=1.0, n_ratings=None, seed=None, output_dir='data', chunk_size=CHUNK_SIZE):
+    """
+    Generate a realistic e-commerce dataset based on Amazon product patterns.
+
+    scale multiplies the product, user and rating counts; n_ratings
+    overrides the rating count alone. All columns are drawn as vectors and
+    users and ratings are written in chunks of chunk_size rows, so memory
+    stays bounded whatever the rating count. The same seed and chunk_size
+    give the same dataset.
+    """
+    rng = np.random.default_rng(seed)
+    n_users = max(int(N_USERS * scale), 1)
+    n_ratings = int(N_RATINGS * scale) if n_ratings is None else n_ratings
+    os.makedirs(output_dir, exist_ok=True)
+
+    products = generate_products(rng, scale)
+    n_products = len(products['product_id'])
+    write_chunks((product_frame(products, start, stop) for start, stop in _chunks(n_products, chunk_size)),
+                 os.path.join(output_dir, 'products.csv'))
+    write_chunks((user_frame(rng, start, stop) for start, stop in _chunks(n_users, chunk_size)),
+                 os.path.join(output_dir, 'users.csv'))
+
     # Users who rate more frequently
-    active_users = np.random.choice(users_df['user_id'], size=int(n_users * 0.2))
-    
-    for _ in range(n_ratings):
-        # 60% chance of rating coming from active users
-        if np.random.random() < 0.6:
-            user_id = np.random.choice(active_users)
-        else:
-            user_id = np.random.choice(users_df['user_id'])
-            
-        product = products_df.sample(n=1).iloc[0]
-        
-        # Rating tends to be close to product's average rating
-        rating = np.clip(
-            np.random.normal(product['avg_rating'], 0.5),
-            1, 5
-        )
-        
-        # Generate timestamp (more recent products have more recent ratings)
-        days_ago = int(np.random.exponential(30))  # Exponential distribution for recency
-        timestamp = datetime.now() - timedelta(days=days_ago)
-        
-        ratings.append({
-            'user_id': user_id,
-            'product_id': product['product_id'],
-            'rating': round(rating, 1),
-            'timestamp': timestamp
-        })
-    
-    ratings_df = pd.DataFrame(ratings)
-    
-    # Save datasets
-    print("Saving datasets...")
-    products_df.to_csv('data/products.csv', index=False)
-    users_df.to_csv('data/users.csv', index=False)
-    ratings_df.to_csv('data/ratings.csv', index=False)
-    
+    user_ids = np.arange(1, n_users + 1)
+    active_users = rng.choice(user_ids, size=max(int(n_users * ACTIVE_USER_SHARE), 1))
+    now = np.datetime64(datetime.now(), 'us')
+    # Exact rating histogram, for the statistics
+    rating_counts = np.zeros(len(RATING_LABELS), dtype=np.int64)
+
+    def rating_chunks():
+        for start, stop in _chunks(n_ratings, chunk_size):
+            frame = rating_frame(rng, stop - start, products['avg_rating'], user_ids, active_users, now)
+            rating_counts[:] += np.bincount(frame['rating'].cat.codes, minlength=len(RATING_LABELS))
+            yield frame
+
+    write_chunks(rating_chunks(), os.path.join(output_dir, 'ratings.csv'))
+    print_statistics(products['category'], products['price'], n_users, rating_counts)
+    return {'products': n_products, 'users': n_users, 'ratings': n_ratings}
+
+
+def shard_ranges(total, shard_size):
+    """(start, stop) row ranges of consecutive shards"""
+    return list(_chunks(total, shard_size))
+
+
+def shard_path(output_dir, table, index):
+    return os.path.join(output_dir, table, f'part-{index:05d}.csv')
+
+
+def run_shards(function, tasks, workers=None):
+    """
+    Run function(*task) for every task, in a process pool when workers > 1.
+    Results come back in task order.
+    """
+    if workers is not None and workers <= 1:
+        return [function(*task) for task in tasks]
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(function, *zip(*tasks)))
+
+
+def write_shard(frame, path):
+    """Write one shard as a standalone CSV; returns its manifest entry"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    frame.to_csv(path, index=False)
+    return {'path': path, 'rows': len(frame), 'sha256': file_sha256(path)}
+
+
+def write_manifest(output_dir, manifest):
+    """
+    Write manifest.json. Shard paths are stored relative to output_dir and
+    tables get their total row counts.
+    """
+    for table in manifest['tables'].values():
+        for shard in table['shards']:
+            shard['path'] = os.path.relpath(shard['path'], output_dir)
+        table['rows'] = sum(shard['rows'] for shard in table['shards'])
+    with open(os.path.join(output_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def combine_shards(output_dir, table, path=None):
+    """Concatenate a table's shards into one CSV, keeping only the first header"""
+    with open(os.path.join(output_dir, 'manifest.json')) as f:
+        shards = json.load(f)['tables'][table]['shards']
+    path = path or os.path.join(output_dir, f'{table}.csv')
+    with open(path, 'wb') as out:
+        for i, shard in enumerate(shards):
+            with open(os.path.join(output_dir, shard['path']), 'rb') as f:
+                if i > 0:
+                    f.readline()
+                shutil.copyfileobj(f, out)
+    return path
+
+
+def _product_shard(seed, category, first_id, path):
+    products = product_attributes(np.random.default_rng(seed), category, first_id)
+    entry = write_shard(product_frame(products), path)
+    return entry, products['price'], products['avg_rating']
+
+
+def _user_shard(seed, start, stop, path):
+    return write_shard(user_frame(np.random.default_rng(seed), start, stop), path)
+
+
+def _rating_shard(seed, n, avg_rating_path, active_users_path, n_users, now, path):
+    avg_rating = np.load(avg_rating_path, mmap_mode='r')
+    active_users = np.load(active_users_path, mmap_mode='r')
+    frame = rating_frame(np.random.default_rng(seed), n, avg_rating, np.arange(1, n_users + 1), active_users, now)
+    return write_shard(frame, path), np.bincount(frame['rating'].cat.codes, minlength=len(RATING_LABELS))
+
+
+def generate_sharded_dataset(scale=1.0, n_ratings=None, seed=None, output_dir='data', shard_size=SHARD_SIZE,
+                             workers=None, reference_time=None, combine=False):
+    """
+    Generate the dataset as independent shards in a process pool.
+
+    Every shard draws from its own SeedSequence child of the root seed, so
+    the output does not depend on the number of workers: a fixed seed and
+    reference_time (the "now" rating timestamps count back from) give
+    byte-identical files. Shards are written to <output_dir>/<table>/ with a
+    manifest.json recording the seed, row counts and SHA-256 of each shard;
+    combine also concatenates them into <table>.csv.
+    """
+    root = np.random.SeedSequence(seed)
+    category_seed, product_seed, user_seed, active_seed, rating_seed = root.spawn(5)
+    n_users = max(int(N_USERS * scale), 1)
+    n_ratings = int(N_RATINGS * scale) if n_ratings is None else n_ratings
+    now = np.datetime64(reference_time or datetime.now(), 'us')
+    for table in ['products', 'users', 'ratings']:
+        shutil.rmtree(os.path.join(output_dir, table), ignore_errors=True)
+    os.makedirs(output_dir, exist_ok=True)
+
+    category = product_categories(np.random.default_rng(category_seed), scale)
+    ranges = shard_ranges(len(category), shard_size)
+    results = run_shards(_product_shard, [
+        (child, category[start:stop], start + 1, shard_path(output_dir, 'products', i))
+        for i, (child, (start, stop)) in enumerate(zip(product_seed.spawn(len(ranges)), ranges))
+    ], workers)
+    product_shards = [entry for entry, _, _ in results]
+    prices = np.concatenate([price for _, price, _ in results])
+
+    ranges = shard_ranges(n_users, shard_size)
+    user_shards = run_shards(_user_shard, [
+        (child, start, stop, shard_path(output_dir, 'users', i))
+        for i, (child, (start, stop)) in enumerate(zip(user_seed.spawn(len(ranges)), ranges))
+    ], workers)
+
+    # Product ratings and the active-user pool are shared with rating workers
+    # through memory-mapped .npy files
+    avg_rating_path = os.path.join(output_dir, '.avg_rating.npy')
+    active_users_path = os.path.join(output_dir, '.active_users.npy')
+    np.save(avg_rating_path, np.concatenate([avg_rating for _, _, avg_rating in results]))
+    np.save(active_users_path, np.random.default_rng(active_seed).choice(
+        np.arange(1, n_users + 1), size=max(int(n_users * ACTIVE_USER_SHARE), 1)))
+    ranges = shard_ranges(n_ratings, shard_size)
+    try:
+        results = run_shards(_rating_shard, [
+            (child, stop - start, avg_rating_path, active_users_path, n_users, now,
+             shard_path(output_dir, 'ratings', i))
+            for i, (child, (start, stop)) in enumerate(zip(rating_seed.spawn(len(ranges)), ranges))
+        ], workers)
+    finally:
+        os.remove(avg_rating_path)
+        os.remove(active_users_path)
+    rating_shards = [entry for entry, _ in results]
+    rating_counts = np.sum([counts for _, counts in results], axis=0)
+
+    write_manifest(output_dir, {
+        'version': MANIFEST_VERSION,
+        'seed': str(root.entropy),
+        'reference_time': str(now),
+        'scale': scale,
+        'shard_size': shard_size,
+        'tables': {
+            'products': {'shards': product_shards},
+            'users': {'shards': user_shards},
+            'ratings': {'shards': rating_shards}
+        }
+    })
+    if combine:
+        for table in ['products', 'users', 'ratings']:
+            combine_shards(output_dir, table)
+    print_statistics(category, prices, n_users, rating_counts)
+    return {'products': len(category), 'users': n_users, 'ratings': n_ratings, 'seed': root.entropy}
+
+
+def print_statistics(category, price, n_users, rating_counts):
+    values = np.arange(10, 51) / 10
+    n_ratings = rating_counts.sum()
     print("\nDataset statistics:")
-    print(f"Products: {len(products_df):,}")
-    print(f"Users: {len(users_df):,}")
-    print(f"Ratings: {len(ratings_df):,}")
-    
+    print(f"Products: {len(category):,}")
+    print(f"Users: {n_users:,}")
+    print(f"Ratings: {n_ratings:,}")
+
     print("\nCategory distribution:")
-    print(products_df['category'].value_counts())
-    
+    counts = pd.Series(np.bincount(category, minlength=len(CATEGORIES)), index=CATEGORY_NAMES)
+    print(counts.sort_values(ascending=False))
+
     print("\nPrice statistics:")
-    print(products_df['price'].describe())
-    
-    print("\nRating statistics:")
-    print(ratings_df['rating'].describe())
+    print(pd.Series(price, name='price').describe())
+
+    if n_ratings:
+        mean = (values * rating_counts).sum() / n_ratings
+        std = np.sqrt((rating_counts * (values - mean) ** 2).sum() / max(n_ratings - 1, 1))
+        cumulative = np.cumsum(rating_counts)
+        q1, median, q3 = (values[np.searchsorted(cumulative, q * n_ratings)] for q in (0.25, 0.5, 0.75))
+        print("\nRating statistics:")
+        print(f"count  {n_ratings:,}\nmean   {mean:.4f}\nstd    {std:.4f}\n"
+              f"min    {values[rating_counts > 0][0]}\n25%    {q1}\n50%    {median}\n75%    {q3}\n"
+              f"max    {values[rating_counts > 0][-1]}")
+
 
 if __name__ == "__main__":
-    generate_realistic_dataset()
+    parser = argparse.ArgumentParser(description="Generate the synthetic e-commerce dataset")
+    parser.add_argument('--scale', type=float, default=1.0, help="multiplier for products, users and ratings")
+    parser.add_argument('--ratings', type=int, default=None, help="number of ratings (overrides the scale)")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output-dir', default='data')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--shards', action='store_true', help="write independent shards in parallel")
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE)
+    parser.add_argument('--workers', type=int, default=None, help="processes for --shards (default: all CPUs)")
+    parser.add_argument('--reference-time', default=None, help="ISO time rating timestamps count back from")
+    parser.add_argument('--combine', action='store_true', help="also concatenate shards into one CSV per table")
+    args = parser.parse_args()
+
+    print("Saving datasets...")
+    if args.shards:
+        counts = generate_sharded_dataset(args.scale, args.ratings, args.seed, args.output_dir, args.shard_size,
+                                          args.workers, args.reference_time, args.combine)
+        print(f"\nManifest written to {os.path.join(args.output_dir, 'manifest.json')} (seed {counts['seed']})")
+    else:
+        generate_realistic_dataset(args.scale, args.ratings, args.seed, args.output_dir, args.chunk_size)
@@ -1,107 +1,180 @@
+import argparse
+import os
+from datetime import datetime
 import pandas as pd
 import numpy as np
 from faker import Faker
-import random
-from datetime import datetime, timedelta
-
-fake = Faker()
-
-def generate_sample_data(n_products=1000, n_users=500, n_ratings=5000):
-    """Generate sample product, user, and rating data"""
-    
-    # Product categories and subcategories
-    categories = {
-        'Electronics': ['Smartphones', 'Laptops', 'Accessories', 'Audio', 'Gaming'],
-        'Fashion': ['Men', 'Women', 'Kids', 'Footwear', 'Accessories'],
-        'Home': ['Furniture', 'Decor', 'Kitchen', 'Bedding', 'Storage'],
-        'Books': ['Fiction', 'Non-Fiction', 'Academic', 'Children', 'Comics'],
-        'Sports': ['Equipment', 'Clothing', 'Shoes', 'Accessories', 'Nutrition']
-    }
-    
-    # Product name templates
-    product_templates = {
-        'Electronics': ['{}Tech {}', '{}Smart {}', 'Pro {} {}', 'Ultra {} {}'],
-        'Fashion': ['{} Style {}', '{} Fashion {}', 'Trendy {} {}', 'Classic {} {}'],
-        'Home': ['{} Home {}', 'Modern {} {}', 'Luxury {} {}', 'Essential {} {}'],
-        'Books': ['{} Guide to {}', 'The {} {}', 'Complete {} {}', 'Advanced {} {}'],
-        'Sports': ['{} Sport {}', 'Professional {} {}', 'Elite {} {}', 'Premium {} {}']
+from generate_real_data import run_shards, shard_path, shard_ranges, write_manifest, write_shard, MANIFEST_VERSION
+
+# Product categories and subcategories
+CATEGORIES = {
+    'Electronics': ['Smartphones', 'Laptops', 'Accessories', 'Audio', 'Gaming'],
+    'Fashion': ['Men', 'Women', 'Kids', 'Footwear', 'Accessories'],
+    'Home': ['Furniture', 'Decor', 'Kitchen', 'Bedding', 'Storage'],
+    'Books': ['Fiction', 'Non-Fiction', 'Academic', 'Children', 'Comics'],
+    'Sports': ['Equipment', 'Clothing', 'Shoes', 'Accessories', 'Nutrition']
+}
+
+# Product name templates
+PRODUCT_TEMPLATES = {
+    'Electronics': ['{}Tech {}', '{}Smart {}', 'Pro {} {}', 'Ultra {} {}'],
+    'Fashion': ['{} Style {}', '{} Fashion {}', 'Trendy {} {}', 'Classic {} {}'],
+    'Home': ['{} Home {}', 'Modern {} {}', 'Luxury {} {}', 'Essential {} {}'],
+    'Books': ['{} Guide to {}', 'The {} {}', 'Complete {} {}', 'Advanced {} {}'],
+    'Sports': ['{} Sport {}', 'Professional {} {}', 'Elite {} {}', 'Premium {} {}']
+}
+ADJECTIVES = ['Premium', 'Deluxe', 'Basic', 'Pro', 'Ultra', 'Essential']
+
+FIRST_PRODUCT_ID = 1001
+REVIEW_SHARE = 0.7
+# Faker output is drawn once into pools of this size and sampled per row
+VOCAB_SIZE = 1000
+
+
+def build_vocab(seed, size=VOCAB_SIZE):
+    """Pools of Faker words, names, emails and texts, reproducible for a seed"""
+    fake = Faker()
+    fake.seed_instance(seed)
+    return {
+        'words': np.array([fake.word().title() for _ in range(size)]),
+        'names': np.array([fake.name() for _ in range(size)]),
+        'emails': np.array([fake.email() for _ in range(size)]),
+        'descriptions': np.array([fake.text(max_nb_chars=200) for _ in range(size)]),
+        'reviews': np.array([fake.text(max_nb_chars=100) for _ in range(size)])
     }
-    
-    # Generate products
-    products = []
-    product_id = 1001
-    
-    for category, subcategories in categories.items():
-        n_category_products = n_products // len(categories)
-        templates = product_templates[category]
-        
-        for _ in range(n_category_products):
-            subcategory = random.choice(subcategories)
-            price = round(random.uniform(10, 1000), 2)
-            
-            # Generate product name
-            template = random.choice(templates)
-            name = template.format(
-                random.choice(['Premium', 'Deluxe', 'Basic', 'Pro', 'Ultra', 'Essential']),
-                fake.word().title()
-            )
-            
-            products.append({
-                'product_id': product_id,
-                'name': name,
-                'category': category,
-                'subcategory': subcategory,
-                'price': price,
-                'description': fake.text(max_nb_chars=200)
-            })
-            product_id += 1
-    
-    # Generate users
-    users = []
-    for user_id in range(1, n_users + 1):
-        users.append({
-            'user_id': user_id,
-            'name': fake.name(),
-            'email': fake.email(),
-            'join_date': fake.date_between(start_date='-2y', end_date='today')
-        })
-    
-    # Generate ratings
-    ratings = []
-    start_date = datetime.now() - timedelta(days=365)
-    
-    for _ in range(n_ratings):
-        user_id = random.randint(1, n_users)
-        product_id = random.randint(1001, 1001 + n_products - 1)
-        rating = random.randint(1, 5)
-        date = fake.date_time_between(start_date=start_date)
-        
-        ratings.append({
-            'user_id': user_id,
-            'product_id': product_id,
-            'rating': rating,
-            'timestamp': date,
-            'review': fake.text(max_nb_chars=100) if random.random() > 0.3 else None
+
+
+def product_names(words):
+    """
+    Every template/adjective/word combination, one row per category (in
+    CATEGORIES order)
+    """
+    return np.array([[template.format(adjective, word)
+                      for template in PRODUCT_TEMPLATES[category]
+                      for adjective in ADJECTIVES
+                      for word in words]
+                     for category in CATEGORIES])
+
+
+def _product_shard(seed, vocab, start, stop, n_category_products, path):
+    rng = np.random.default_rng(seed)
+    n = stop - start
+    # Products are numbered category by category, n_category_products each
+    category = np.arange(start, stop) // n_category_products
+    names = product_names(vocab['words'])
+    subcategories = np.array(list(CATEGORIES.values()))
+    frame = pd.DataFrame({
+        'product_id': np.arange(FIRST_PRODUCT_ID + start, FIRST_PRODUCT_ID + stop),
+        'name': names[category, rng.integers(0, names.shape[1], n)],
+        'category': np.array(list(CATEGORIES))[category],
+        'subcategory': subcategories[category, rng.integers(0, subcategories.shape[1], n)],
+        'price': rng.uniform(10, 1000, n).round(2),
+        'description': vocab['descriptions'][rng.integers(0, len(vocab['descriptions']), n)]
+    })
+    return write_shard(frame, path)
+
+
+def _user_shard(seed, vocab, start, stop, today, path):
+    rng = np.random.default_rng(seed)
+    n = stop - start
+    return write_shard(pd.DataFrame({
+        'user_id': np.arange(start + 1, stop + 1),
+        'name': vocab['names'][rng.integers(0, len(vocab['names']), n)],
+        'email': vocab['emails'][rng.integers(0, len(vocab['emails']), n)],
+        'join_date': today - rng.integers(0, 2 * 365 + 1, n).astype('timedelta64[D]')
+    }), path)
+
+
+def _rating_shard(seed, vocab, n, n_users, n_products, start_time, end_time, path):
+    rng = np.random.default_rng(seed)
+    span = int((end_time - start_time) / np.timedelta64(1, 's'))
+    reviews = vocab['reviews'][rng.integers(0, len(vocab['reviews']), n)].astype(object)
+    reviews[rng.random(n) >= REVIEW_SHARE] = None
+    return write_shard(pd.DataFrame({
+        'user_id': rng.integers(1, n_users + 1, n),
+        'product_id': rng.integers(FIRST_PRODUCT_ID, FIRST_PRODUCT_ID + n_products, n),
+        'rating': rng.integers(1, 6, n),
+        'timestamp': start_time + rng.integers(0, span + 1, n).astype('timedelta64[s]'),
+        'review': reviews
+    }), path)
+
+
+def generate_sample_data(n_products=1000, n_users=500, n_ratings=5000, seed=None, output_dir='data',
+                         shard_size=None, workers=1, reference_time=None):
+    """
+    Generate sample product, user, and rating data.
+
+    Faker text comes from pre-generated vocab pools, and all other columns
+    are drawn as vectors. Without shard_size each table is written to
+    <table>.csv as before. With it, tables are split into shards of
+    shard_size rows under <output_dir>/<table>/ plus a manifest.json, and
+    generated in `workers` processes. Every shard has its own SeedSequence
+    child of the root seed, so a fixed seed and reference_time give
+    byte-identical output for any worker count.
+    """
+    root = np.random.SeedSequence(seed)
+    vocab_seed, product_seed, user_seed, rating_seed = root.spawn(4)
+    vocab = build_vocab(int(vocab_seed.generate_state(1)[0]))
+    end_time = np.datetime64(reference_time or datetime.now(), 's')
+    today = end_time.astype('datetime64[D]')
+    os.makedirs(output_dir, exist_ok=True)
+
+    sharded = shard_size is not None
+    shard_size = shard_size or max(n_products, n_users, n_ratings, 1)
+
+    def path(table, i):
+        return shard_path(output_dir, table, i) if sharded else os.path.join(output_dir, f'{table}.csv')
+
+    n_category_products = n_products // len(CATEGORIES)
+    ranges = shard_ranges(n_category_products * len(CATEGORIES), shard_size)
+    product_shards = run_shards(_product_shard, [
+        (child, vocab, start, stop, n_category_products, path('products', i))
+        for i, (child, (start, stop)) in enumerate(zip(product_seed.spawn(len(ranges)), ranges))
+    ], workers)
+
+    ranges = shard_ranges(n_users, shard_size)
+    user_shards = run_shards(_user_shard, [
+        (child, vocab, start, stop, today, path('users', i))
+        for i, (child, (start, stop)) in enumerate(zip(user_seed.spawn(len(ranges)), ranges))
+    ], workers)
+
+    ranges = shard_ranges(n_ratings, shard_size)
+    start_time = end_time - np.timedelta64(365, 'D')
+    rating_shards = run_shards(_rating_shard, [
+        (child, vocab, stop - start, n_users, n_products, start_time, end_time, path('ratings', i))
+        for i, (child, (start, stop)) in enumerate(zip(rating_seed.spawn(len(ranges)), ranges))
+    ], workers)
+
+    if sharded:
+        write_manifest(output_dir, {
+            'version': MANIFEST_VERSION,
+            'seed': str(root.entropy),
+            'reference_time': str(end_time),
+            'shard_size': shard_size,
+            'tables': {
+                'products': {'shards': product_shards},
+                'users': {'shards': user_shards},
+                'ratings': {'shards': rating_shards}
+            }
         })
-    
-    # Convert to DataFrames
-    products_df = pd.DataFrame(products)
-    users_df = pd.DataFrame(users)
-    ratings_df = pd.DataFrame(ratings)
-    
-    # Create data directory
-    import os
-    os.makedirs('data', exist_ok=True)
-    
-    # Save to CSV
-    products_df.to_csv('data/products.csv', index=False)
-    users_df.to_csv('data/users.csv', index=False)
-    ratings_df.to_csv('data/ratings.csv', index=False)
-    
+
     print(f"Generated and saved:")
-    print(f"- {len(products_df)} products")
-    print(f"- {len(users_df)} users")
-    print(f"- {len(ratings_df)} ratings")
+    print(f"- {sum(s['rows'] for s in product_shards)} products")
+    print(f"- {sum(s['rows'] for s in user_shards)} users")
+    print(f"- {sum(s['rows'] for s in rating_shards)} ratings")
+
 
 if __name__ == "__main__":
-    generate_sample_data()
+    parser = argparse.ArgumentParser(description="Generate sample product, user and rating data")
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--ratings', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output-dir', default='data')
+    parser.add_argument('--shard-size', type=int, default=None, help="rows per shard (default: one file per table)")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--reference-time', default=None, help="ISO time dates count back from")
+    args = parser.parse_args()
+
+    generate_sample_data(args.products, args.users, args.ratings, args.seed, args.output_dir,
+                         args.shard_size, args.workers, args.reference_time)
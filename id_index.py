@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+import shutil
+import time
+import numpy as np
+from data_store import DEFAULT_CACHE_DIR, cache_key, fingerprint_matches, load_table, source_fingerprint
+
+INDEX_VERSION = 1
+INDEX_ARRAYS = ['product_ids', 'user_ids', 'product_indptr', 'product_users', 'product_ratings',
+                'user_indptr', 'user_products', 'user_ratings']
+
+
+class IdDictionary:
+    """
+    External IDs (ints, or the Amazon data's strings) and their dense int32
+    indices: an ID's index is its position in the sorted ID array, so
+    encoding is a binary search and decoding an array lookup.
+    """
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    @classmethod
+    def from_values(cls, *columns):
+        """Dictionary of every distinct ID in the given columns"""
+        values = [np.asarray(c) for c in columns]
+        if any(v.dtype == object for v in values):
+            values = [v.astype(str) for v in values]
+        return cls(np.unique(np.concatenate(values)))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def encode(self, values):
+        """Dense indices of external IDs, -1 for IDs not in the dictionary"""
+        values = np.asarray(values)
+        if values.dtype == object:
+            values = values.astype(str)
+        index = np.searchsorted(self.ids, values)
+        index[index == len(self.ids)] = 0
+        found = len(self.ids) > 0 and self.ids[index] == values
+        return np.where(found, index, -1).astype(np.int32)
+
+    def decode(self, index):
+        """External IDs of dense indices"""
+        return self.ids[index]
+
+
+def gather(values, index):
+    """
+    values[index] with NaN where index is -1, as a left merge fills rows
+    without a match (integer columns become float only if one is missing)
+    """
+    missing = index < 0
+    taken = values[np.where(missing, 0, index)] if len(values) else np.zeros(len(index))
+    if missing.any():
+        taken = taken.astype(np.float64)
+        taken[missing] = np.nan
+    return taken
+
+
+def _group(keys, n_keys, *columns):
+    """CSR layout of rows grouped by key: offsets per key and the reordered columns"""
+    order = np.argsort(keys, kind='stable')
+    indptr = np.zeros(n_keys + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n_keys), out=indptr[1:])
+    return [indptr] + [c[order] for c in columns]
+
+
+class RatingsIndex:
+    """
+    Ratings keyed by dense product and user indices, in two layouts: grouped
+    by product (CSC of the user x product matrix) and by user (CSR). All
+    ratings of a product or by a user are then one slice between two
+    offsets, and per-product aggregates are reductions over the slices.
+    Products that appear only in the catalogue have empty slices.
+    """
+
+    def __init__(self, products, users, arrays):
+        self.products = products
+        self.users = users
+        for name, values in arrays.items():
+            setattr(self, name, values)
+
+    @classmethod
+    def build(cls, ratings_df, product_ids=()):
+        """Index ratings, with product IDs from the catalogue in the dictionary too"""
+        products = IdDictionary.from_values(ratings_df['product_id'].to_numpy(), product_ids)
+        users = IdDictionary.from_values(ratings_df['user_id'].to_numpy())
+        product = products.encode(ratings_df['product_id'].to_numpy())
+        user = users.encode(ratings_df['user_id'].to_numpy())
+        ratings = ratings_df['rating'].to_numpy(dtype=np.float64)
+
+        product_indptr, product_users, product_ratings = _group(product, len(products), user, ratings)
+        user_indptr, user_products, user_ratings = _group(user, len(users), product, ratings)
+        return cls(products, users, {
+            'product_indptr': product_indptr, 'product_users': product_users, 'product_ratings': product_ratings,
+            'user_indptr': user_indptr, 'user_products': user_products, 'user_ratings': user_ratings
+        })
+
+    def product_ratings_of(self, product_id):
+        """(dense user indices, ratings) of one product; empty if unknown"""
+        i = self.products.encode([product_id])[0]
+        start, stop = (self.product_indptr[i], self.product_indptr[i + 1]) if i >= 0 else (0, 0)
+        return self.product_users[start:stop], self.product_ratings[start:stop]
+
+    def user_ratings_of(self, user_id):
+        """(dense product indices, ratings) by one user; empty if unknown"""
+        i = self.users.encode([user_id])[0]
+        start, stop = (self.user_indptr[i], self.user_indptr[i + 1]) if i >= 0 else (0, 0)
+        return self.user_products[start:stop], self.user_ratings[start:stop]
+
+    def rating_counts(self):
+        """Number of ratings per dense product index"""
+        return np.diff(self.product_indptr)
+
+    def product_histograms(self, bins=10, value_range=(1, 5)):
+        """
+        Per-product rating histograms (bins as np.histogram, so summing the
+        rows of any product subset gives np.histogram of its ratings) and
+        per-product rating sums
+        """
+        edges = np.linspace(value_range[0], value_range[1], bins + 1)
+        bin_index = np.searchsorted(edges, self.product_ratings, side='right') - 1
+        bin_index[self.product_ratings == edges[-1]] = bins - 1
+        in_range = (bin_index >= 0) & (bin_index < bins)
+        product = np.repeat(np.arange(len(self.products)), self.rating_counts())
+        counts = np.bincount(product[in_range] * bins + bin_index[in_range],
+                             minlength=len(self.products) * bins).reshape(len(self.products), bins)
+        sums = np.bincount(product, weights=self.product_ratings, minlength=len(self.products))
+        return counts, sums
+
+    def save(self, path, sources=None):
+        """Write the dictionaries and offsets (.npy per array) and manifest.json atomically"""
+        tmp_path = path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name in INDEX_ARRAYS:
+            if name == 'product_ids':
+                values = self.products.ids
+            elif name == 'user_ids':
+                values = self.users.ids
+            else:
+                values = getattr(self, name)
+            np.save(os.path.join(tmp_path, f'{name}.npy'), values)
+        with open(os.path.join(tmp_path, 'manifest.json'), 'w') as f:
+            json.dump({'version': INDEX_VERSION, 'sources': sources or {}}, f, indent=2)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load a saved index, memory-mapping the offsets and ratings"""
+        mmap_mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+                  for name in INDEX_ARRAYS[2:]}
+        products = IdDictionary(np.load(os.path.join(path, 'product_ids.npy')))
+        users = IdDictionary(np.load(os.path.join(path, 'user_ids.npy')))
+        return cls(products, users, arrays)
+
+
+def _index_is_fresh(index_path, paths):
+    try:
+        with open(os.path.join(index_path, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+    sources = manifest.get('sources', {})
+    return (manifest.get('version') == INDEX_VERSION
+            and all(p in sources and fingerprint_matches(p, sources[p]) for p in paths))
+
+
+def load_ratings_index(ratings_path='data/ratings.csv', products_path='data/products.csv',
+                       cache_dir=DEFAULT_CACHE_DIR):
+    """
+    The ratings index persisted under cache_dir, rebuilt (through the
+    columnar cache) only when the ratings or products file has changed
+    """
+    paths = [ratings_path, products_path]
+    index_path = os.path.join(cache_dir, cache_key(*paths) + '_index')
+    if not _index_is_fresh(index_path, paths):
+        ratings_df = load_table(ratings_path, cache_dir, columns=['user_id', 'product_id', 'rating'])
+        product_ids = load_table(products_path, cache_dir, columns=['product_id'])['product_id'].to_numpy()
+        os.makedirs(cache_dir, exist_ok=True)
+        RatingsIndex.build(ratings_df, product_ids).save(index_path, {p: source_fingerprint(p) for p in paths})
+    return RatingsIndex.load(index_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the dense ID dictionary and per-user / per-product rating offsets")
+    parser.add_argument('--ratings', default='data/ratings.csv')
+    parser.add_argument('--products', default='data/products.csv')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = load_ratings_index(args.ratings, args.products, args.cache_dir)
+    print(f"{len(index.products):,} products, {len(index.users):,} users, "
+          f"{int(index.product_indptr[-1]):,} ratings indexed in {time.perf_counter() - start:.2f}s")
+
+    # Lookups by slice vs a boolean scan of the ratings table
+    ratings_df = load_table(args.ratings, args.cache_dir, columns=['user_id', 'product_id', 'rating'])
+    product_id = index.products.ids[np.argmax(index.rating_counts())]
+    start = time.perf_counter()
+    _, ratings = index.product_ratings_of(product_id)
+    sliced = time.perf_counter() - start
+    start = time.perf_counter()
+    scanned = ratings_df['rating'].to_numpy()[ratings_df['product_id'].to_numpy() == product_id]
+    scan = time.perf_counter() - start
+    same = np.array_equal(np.sort(ratings), np.sort(scanned))
+    print(f"Ratings of product {product_id}: slice {sliced * 1e6:.0f} us vs scan {scan * 1e6:.0f} us (same: {same})")
@@ -0,0 +1,171 @@
+import importlib.util
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+REPORT_VERSION = 1
+PROFILERS = ('cprofile', 'pyinstrument')
+METRIC_PREFIX = 'product_analysis'
+
+
+def _max_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    scale = 1 << 20 if sys.platform == 'darwin' else 1 << 10
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+class PhaseRecorder:
+    """
+    Per-phase measurements of a pipeline run: wall and CPU time, peak
+    traced memory (tracemalloc, which also sees NumPy buffers), the
+    process's peak RSS so far, and row counts before and after.
+
+    trace_memory=False skips tracemalloc, which slows allocation-heavy
+    code. With profile='cprofile' or 'pyinstrument' every phase is also
+    profiled into profile_dir (<phase>.prof for pstats / snakeviz, or
+    <phase>.html).
+    """
+
+    def __init__(self, trace_memory=True, profile=None, profile_dir='profiles'):
+        if profile not in (None,) + PROFILERS:
+            raise ValueError(f"Unknown profiler {profile!r}; expected one of {PROFILERS}")
+        if profile == 'pyinstrument':
+            # Fail before the run rather than after the first phase
+            if importlib.util.find_spec('pyinstrument') is None:
+                raise ImportError("profile='pyinstrument' needs the pyinstrument package")
+        self.trace_memory = trace_memory
+        self.profile = profile
+        self.profile_dir = profile_dir
+        self.phases = []
+        self.started = datetime.now()
+
+    @contextmanager
+    def phase(self, name, rows=None):
+        """
+        Measure the enclosed block as phase `name`. rows is a callable
+        returning a {table: row count} dict, sampled before and after.
+        """
+        record = {'phase': name, 'rows_in': rows() if rows else None}
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+        profiler = self._start_profiler()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record['wall_seconds'] = time.perf_counter() - wall
+            record['cpu_seconds'] = time.process_time() - cpu
+            if profiler is not None:
+                record['profile'] = self._stop_profiler(profiler, name)
+            if self.trace_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                record['peak_traced_mb'] = (peak - traced_before) / (1 << 20)
+                record['retained_traced_mb'] = (current - traced_before) / (1 << 20)
+            record['max_rss_mb'] = _max_rss_mb()
+            record['rows_out'] = rows() if rows else None
+            self.phases.append(record)
+
+    def _start_profiler(self):
+        if self.profile == 'cprofile':
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+            return profiler
+        if self.profile == 'pyinstrument':
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+        return None
+
+    def _stop_profiler(self, profiler, name):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        if self.profile == 'cprofile':
+            profiler.disable()
+            path = os.path.join(self.profile_dir, f'{name}.prof')
+            profiler.dump_stats(path)
+        else:
+            profiler.stop()
+            path = os.path.join(self.profile_dir, f'{name}.html')
+            with open(path, 'w') as f:
+                f.write(profiler.output_html())
+        return path
+
+    def report(self):
+        """The run as a JSON-serializable dict"""
+        return {
+            'version': REPORT_VERSION,
+            'started': self.started.isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'host': platform.node(),
+            'trace_memory': self.trace_memory,
+            'phases': self.phases,
+            'total': {
+                'wall_seconds': sum(p['wall_seconds'] for p in self.phases),
+                'cpu_seconds': sum(p['cpu_seconds'] for p in self.phases),
+                'max_rss_mb': self.phases[-1]['max_rss_mb'] if self.phases else None
+            }
+        }
+
+    def print_table(self):
+        print(f"\n{'phase':<22}{'wall (s)':>10}{'cpu (s)':>10}{'peak traced (MB)':>18}{'max RSS (MB)':>14}")
+        for p in self.phases:
+            traced = f"{p['peak_traced_mb']:.1f}" if 'peak_traced_mb' in p else '-'
+            rss = f"{p['max_rss_mb']:.1f}" if p['max_rss_mb'] is not None else '-'
+            print(f"{p['phase']:<22}{p['wall_seconds']:>10.3f}{p['cpu_seconds']:>10.3f}{traced:>18}{rss:>14}")
+
+    def write_json(self, path):
+        """Write the report, replacing the file atomically"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    def write_prometheus(self, path, prefix=METRIC_PREFIX):
+        """
+        Write the phases as Prometheus text exposition for the node_exporter
+        textfile collector (atomically, as the collector requires)
+        """
+        metrics = [
+            ('phase_wall_seconds', 'gauge', 'Wall-clock time of the last run per phase', 'wall_seconds'),
+            ('phase_cpu_seconds', 'gauge', 'CPU time of the last run per phase', 'cpu_seconds'),
+            ('phase_peak_traced_bytes', 'gauge', 'Peak traced memory above the phase start', 'peak_traced_mb'),
+            ('phase_max_rss_bytes', 'gauge', 'Process peak RSS at the end of the phase', 'max_rss_mb')
+        ]
+        lines = []
+        for name, kind, help_text, key in metrics:
+            samples = [(p['phase'], p[key]) for p in self.phases if p.get(key) is not None]
+            if not samples:
+                continue
+            lines.append(f'# HELP {prefix}_{name} {help_text}')
+            lines.append(f'# TYPE {prefix}_{name} {kind}')
+            for phase, value in samples:
+                if key.endswith('_mb'):
+                    value = value * (1 << 20)
+                lines.append(f'{prefix}_{name}{{phase="{phase}"}} {value:.6g}')
+        row_samples = [(p['phase'], table, n) for p in self.phases for table, n in (p['rows_out'] or {}).items()]
+        if row_samples:
+            lines.append(f'# HELP {prefix}_phase_rows Rows per table at the end of the phase')
+            lines.append(f'# TYPE {prefix}_phase_rows gauge')
+            for phase, table, n in row_samples:
+                lines.append(f'{prefix}_phase_rows{{phase="{phase}",table="{table}"}} {n}')
+        lines.append(f'# HELP {prefix}_last_run_timestamp_seconds Start time of the last run')
+        lines.append(f'# TYPE {prefix}_last_run_timestamp_seconds gauge')
+        lines.append(f'{prefix}_last_run_timestamp_seconds {self.started.timestamp():.0f}')
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, path)
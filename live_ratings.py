@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+import numpy as np
+from aggregates import rating_histogram
+from rating_stats import read_appended
+
+# How often the ingestion thread looks for appended ratings
+POLL_SECONDS = 1.0
+# Ingested batches remembered for delta queries; clients further behind get
+# a full snapshot instead
+MAX_DELTAS = 256
+
+
+def complete_size(path):
+    """Byte offset just past the last complete line of a file (0 if missing)"""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(size - 65536, 0))
+            tail = f.read()
+    except OSError:
+        return 0
+    return size - len(tail) + tail.rfind(b'\n') + 1
+
+
+class LiveRatings:
+    """
+    Running totals of the ratings appended to a CSV log after `offset`.
+
+    A background thread tails the log and folds each new batch into the
+    rating count, sum and histogram. The version of the totals is the log
+    offset read up to, which is the same in every process tailing the log,
+    and delta_since() returns what a client at an older version is missing,
+    so a poll that finds nothing new costs no data work. The thread is
+    started lazily so it also exists in processes forked after creation.
+    """
+
+    def __init__(self, path, offset=0, poll_seconds=POLL_SECONDS):
+        self.path = path
+        self.start_offset = offset
+        self.offset = offset
+        self.poll_seconds = poll_seconds
+        self.count = 0
+        self.total = 0.0
+        self.histogram = np.zeros(len(rating_histogram([])['counts']), dtype=np.int64)
+        self.updated = datetime.now()
+        self._deltas = deque(maxlen=MAX_DELTAS)
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def poll(self):
+        """Fold in any complete lines appended since the last poll; returns how many"""
+        if os.path.getsize(self.path) < self.offset:
+            # The log was truncated or replaced: carry on from its end
+            with self._lock:
+                self.offset = complete_size(self.path)
+            return 0
+        start = self.offset
+        delta, offset = read_appended(self.path, start)
+        if delta is None or len(delta) == 0:
+            with self._lock:
+                self.offset = offset
+            return 0
+        ratings = delta['rating'].to_numpy(dtype=np.float64)
+        counts = np.asarray(rating_histogram(ratings)['counts'], dtype=np.int64)
+        with self._lock:
+            self.count += len(ratings)
+            self.total += float(ratings.sum())
+            self.histogram += counts
+            self.offset = offset
+            self.updated = datetime.now()
+            self._deltas.append((start, len(ratings), float(ratings.sum()), counts))
+        return len(ratings)
+
+    def start(self):
+        """Start the ingestion thread in this process if it is not running"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+            except (OSError, ValueError) as e:
+                print(f"Live ratings: skipping poll of {self.path}: {e}")
+            time.sleep(self.poll_seconds)
+
+    def delta_since(self, version):
+        """
+        Ratings ingested after log offset `version` as {'version', 'count',
+        'total', 'histogram', 'updated', 'full'}, or None if there are none.
+        'full' means the totals are everything since start_offset, because
+        `version` is not the start of a remembered batch. A version past
+        this process's offset comes from another worker that has read
+        further, so there is nothing newer to send it.
+        """
+        with self._lock:
+            if version >= self.offset:
+                return None
+            starts = [d[0] for d in self._deltas]
+            if version in starts:
+                batches = list(self._deltas)[starts.index(version):]
+                count = sum(d[1] for d in batches)
+                total = sum(d[2] for d in batches)
+                histogram = np.sum([d[3] for d in batches], axis=0)
+                full = False
+            else:
+                count, total, histogram, full = self.count, self.total, self.histogram.copy(), True
+            return {'version': self.offset, 'count': count, 'total': total,
+                    'histogram': histogram.tolist(), 'updated': self.updated, 'full': full}
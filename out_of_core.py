@@ -0,0 +1,106 @@
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from rating_stats import RATING_SCALE, RatingStats
+
+CHUNK_SIZE = 1000000
+# Target CSV bytes per hash partition; each partition must fit in memory
+# for its dedupe, so this bounds peak memory whatever the file size
+PARTITION_BYTES = 256 << 20
+
+
+def csv_dtypes(path, sample_rows=10000):
+    """
+    Column dtypes for reading a ratings CSV chunk by chunk: inferred from
+    the first rows, with rating forced to float64 so every chunk parses
+    (and hashes) the same values the same way
+    """
+    dtypes = pd.read_csv(path, nrows=sample_rows).dtypes.to_dict()
+    dtypes['rating'] = np.dtype('float64')
+    return dtypes
+
+
+def _read_spill(path):
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def _write_spill(path, frame, mode='ab'):
+    with open(path, mode) as f:
+        pickle.dump(frame, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def partition_by_row_hash(path, spill_dir, partition_bytes=PARTITION_BYTES, chunk_size=CHUNK_SIZE):
+    """
+    Stream a CSV into hash partitions of whole rows under spill_dir, about
+    partition_bytes of CSV each, so identical rows always land in the same
+    partition. Returns the partition paths (those that received rows) and
+    the number of rows.
+    """
+    n_partitions = max(1, -(-os.path.getsize(path) // partition_bytes))
+    os.makedirs(spill_dir, exist_ok=True)
+    paths = [os.path.join(spill_dir, f'part-{i:05d}.pkl') for i in range(n_partitions)]
+    used = set()
+    rows = 0
+    for chunk in pd.read_csv(path, chunksize=chunk_size, dtype=csv_dtypes(path)):
+        partition = pd.util.hash_pandas_object(chunk, index=False).to_numpy() % np.uint64(n_partitions)
+        order = np.argsort(partition, kind='stable')
+        bounds = np.searchsorted(partition[order], np.arange(n_partitions + 1))
+        for p in np.flatnonzero(np.diff(bounds)):
+            _write_spill(paths[p], chunk.iloc[order[bounds[p]:bounds[p + 1]]])
+            used.add(p)
+        rows += len(chunk)
+    return [paths[p] for p in sorted(used)], rows
+
+
+def dedupe_partitions(paths):
+    """
+    Drop duplicate rows within each partition, rewriting it as one frame.
+    Only one partition is in memory at a time. Returns the rows kept.
+    """
+    kept = 0
+    for path in paths:
+        frame = pd.concat(_read_spill(path), ignore_index=True).drop_duplicates()
+        _write_spill(path, frame, mode='wb')
+        kept += len(frame)
+    return kept
+
+
+def _aggregate_partition(path, scale):
+    stats = RatingStats(scale)
+    value_counts = pd.Series(dtype=np.int64)
+    for frame in _read_spill(path):
+        stats.merge(RatingStats.from_ratings(frame, scale))
+        value_counts = value_counts.add(frame['rating'].value_counts(), fill_value=0)
+    return stats, value_counts
+
+
+def aggregate_partitions(paths, scale=RATING_SCALE, workers=1):
+    """
+    Merge per-partition partial aggregates: RatingStats (exact, so the
+    result equals RatingStats.from_ratings over all rows) and the count of
+    every distinct rating value. With workers > 1 partitions are aggregated
+    in a process pool, one partition in memory per worker.
+    """
+    if workers > 1 and len(paths) > 1:
+        pool = ProcessPoolExecutor(min(workers, len(paths)))
+        partials = pool.map(_aggregate_partition, paths, [scale] * len(paths))
+    else:
+        pool = None
+        partials = (_aggregate_partition(path, scale) for path in paths)
+    stats = RatingStats(scale)
+    value_counts = pd.Series(dtype=np.int64)
+    try:
+        for partial_stats, partial_counts in partials:
+            stats.merge(partial_stats)
+            value_counts = value_counts.add(partial_counts, fill_value=0)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return stats, value_counts.astype(np.int64).sort_index()
@@ -0,0 +1,123 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from rating_stats import MOMENTS, RATING_SCALE, RatingStats, scaled_moments
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+# Row-range tasks per worker, so a slow worker does not hold up the merge
+TASKS_PER_WORKER = 4
+# Integer product IDs are counted directly (bincount over id - min) unless
+# their range is this many times sparser than the rows; others are factorized
+MAX_ID_SPAN_RATIO = 4
+
+# Per-process cache of memory-mapped inputs, as in als.py
+_worker_arrays = {}
+
+
+def _shared_array(path):
+    if path not in _worker_arrays:
+        _worker_arrays[path] = np.load(path, mmap_mode='r')
+    return _worker_arrays[path]
+
+
+def _shared_dir():
+    # Inputs in /dev/shm are shared memory: workers map the same pages
+    return '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+def partial_stats(codes, ratings, n_codes, scale=RATING_SCALE):
+    """
+    RatingStats over ratings whose products are dense codes in [0, n_codes),
+    keyed by code. Counting is a bincount, so no sort or hash is needed, and
+    partials over any split of the rows merge to the exact full result.
+    Products whose ratings are all NaN are kept with a count of 0.
+    """
+    present = np.flatnonzero(np.bincount(codes, minlength=n_codes))
+    stats = RatingStats(scale)
+    stats.product_ids = present
+    for name, values in zip(MOMENTS, scaled_moments(codes, ratings, n_codes, scale)):
+        setattr(stats, name, values[present])
+    return stats
+
+
+def combine_partials(partials, n_codes, scale=RATING_SCALE):
+    """
+    Sum code-keyed partial RatingStats into one. Same result as chaining
+    RatingStats.merge, but accumulates into dense arrays, so each partial
+    costs time proportional to its own size.
+    """
+    moments = {name: np.zeros(n_codes, dtype=np.int64) for name in MOMENTS}
+    seen = np.zeros(n_codes, dtype=bool)
+    for partial in partials:
+        seen[partial.product_ids] = True
+        for name in MOMENTS:
+            values = getattr(partial, name)
+            # Float sums from off-grid ratings make the total float too
+            moments[name] = moments[name].astype(np.result_type(moments[name], values), copy=False)
+            moments[name][partial.product_ids] += values
+    present = np.flatnonzero(seen)
+    stats = RatingStats(scale)
+    stats.product_ids = present
+    for name, values in moments.items():
+        setattr(stats, name, values[present])
+    return stats
+
+
+def _partial_task(work_dir, start, stop, n_codes, scale):
+    codes = _shared_array(os.path.join(work_dir, 'codes.npy'))[start:stop]
+    ratings = _shared_array(os.path.join(work_dir, 'ratings.npy'))[start:stop]
+    return partial_stats(codes, ratings, n_codes, scale)
+
+
+def _product_codes(product_ids):
+    """Dense int64 codes for product IDs and the sorted ID of every code"""
+    if product_ids.dtype.kind in 'iu' and len(product_ids):
+        low, high = int(product_ids.min()), int(product_ids.max())
+        if high - low < MAX_ID_SPAN_RATIO * len(product_ids):
+            return (product_ids - low).astype(np.int64), np.arange(low, high + 1, dtype=product_ids.dtype)
+    if product_ids.dtype == object:
+        product_ids = product_ids.astype(str)
+    codes, uniques = pd.factorize(product_ids, sort=True)
+    return codes.astype(np.int64), np.asarray(uniques)
+
+
+def parallel_rating_stats(ratings_df, workers=DEFAULT_WORKERS, scale=RATING_SCALE):
+    """
+    Per-product RatingStats computed across a process pool; equal (see
+    RatingStats.equals) to RatingStats.from_ratings on the same frame, and
+    for ratings off the 1/scale grid equal to rounding.
+
+    Product IDs are mapped to dense codes and written with the ratings to
+    .npy files in shared memory. Workers map them and reduce row ranges to
+    partial count / sum / sum-of-squares arrays, which are exact integers,
+    so merging the partials needs no shuffle by product. The result carries
+    no watermark: it is a full recompute, not state for update().
+    """
+    # Rows without a product ID are skipped, as groupby does (and they
+    # would factorize to code -1)
+    keep = ratings_df['product_id'].notna().to_numpy()
+    codes, ids = _product_codes(ratings_df['product_id'].to_numpy()[keep])
+    ratings = ratings_df['rating'].to_numpy(dtype=np.float64)[keep]
+    n_rows = len(codes)
+
+    if workers <= 1 or n_rows == 0:
+        stats = partial_stats(codes, ratings, len(ids), scale)
+    else:
+        work_dir = tempfile.mkdtemp(prefix='rating-stats-', dir=_shared_dir())
+        try:
+            np.save(os.path.join(work_dir, 'codes.npy'), codes)
+            np.save(os.path.join(work_dir, 'ratings.npy'), ratings)
+            del codes, ratings
+            bounds = np.unique(np.linspace(0, n_rows, workers * TASKS_PER_WORKER + 1).astype(np.int64))
+            with ProcessPoolExecutor(workers) as pool:
+                futures = [pool.submit(_partial_task, work_dir, start, stop, len(ids), scale)
+                           for start, stop in zip(bounds[:-1], bounds[1:])]
+                stats = combine_partials((future.result() for future in futures), len(ids), scale)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    stats.product_ids = ids[stats.product_ids]
+    return stats
@@ -1,20 +1,80 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.preprocessing import StandardScaler
-from sklearn.impute import SimpleImputer
-from sklearn.decomposition import PCA
-from sklearn.cluster import KMeans
 import warnings
+from aggregates import box_stats
+from contextlib import nullcontext
+from data_store import DEFAULT_CACHE_DIR, load_table
+from id_index import IdDictionary, gather
+from instrumentation import PROFILERS, PhaseRecorder
+from out_of_core import CHUNK_SIZE, PARTITION_BYTES, aggregate_partitions, dedupe_partitions, partition_by_row_hash
+from parallel_stats import parallel_rating_stats
+from rating_stats import DEFAULT_STATS_DIR, RatingStats, popularity_score
+from schema import memory_mb
+from time_partitions import last_days, load_ratings, window_rows
 warnings.filterwarnings('ignore')
 
+
+def _pyplot():
+    """
+    matplotlib.pyplot, imported on first use so runs that do not plot never
+    load it. Unless a backend was chosen (MPLBACKEND, or pyplot already in
+    use), figures render headless with Agg.
+    """
+    import matplotlib
+    if 'MPLBACKEND' not in os.environ and 'matplotlib.pyplot' not in sys.modules:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
 class ProductAnalysis:
-    def __init__(self):
+    """
+    With out_of_core=True ratings are never loaded as a whole: clean_data
+    streams them into hash partitions under spill_dir (default: the system
+    temp dir) and drops duplicates one partition at a time, and
+    feature_engineering merges per-partition aggregates. Memory then
+    depends on chunk_size and partition_bytes (CSV bytes per partition),
+    not the ratings file, and results match the in-memory path.
+
+    With workers > 1 the per-product rating statistics are aggregated
+    across that many processes (parallel_stats, or one spill partition per
+    process out of core), with results identical to workers=1.
+
+    Tables are loaded in the compact types of schema.py; compact=False
+    loads them as read_csv infers them, which gives the same results.
+
+    time_window=(start, end) restricts the analysis to ratings with
+    start <= timestamp < end (either may be None). Ratings are then read
+    from month partitions (time_partitions.py), only those overlapping the
+    window, so the load costs in proportion to the window.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, stats_dir=DEFAULT_STATS_DIR, out_of_core=False,
+                 spill_dir=None, chunk_size=CHUNK_SIZE, partition_bytes=PARTITION_BYTES, workers=1,
+                 compact=True, time_window=None):
+        self.cache_dir = cache_dir
+        self.stats_dir = stats_dir
+        self.out_of_core = out_of_core
+        self.spill_dir = spill_dir
+        self.chunk_size = chunk_size
+        self.partition_bytes = partition_bytes
+        self.workers = workers
+        self.compact = compact
+        self.time_window = time_window
+        self.rating_partitions = None
+        self.rating_value_counts = None
+        self._spill_path = None
+        self.ratings_path = None
         self.products_df = None
         self.ratings_df = None
         self.users_df = None
         self.cleaned_data = None
+        self.box_stats = {}
         
     def load_data(self, products_path, ratings_path, users_path):
         """
@@ -23,21 +83,40 @@ class ProductAnalysis:
         print("1. Data Loading and Initial Checks")
         print("---------------------------------")
         
-        # Load datasets
-        self.products_df = pd.read_csv(products_path)
-        self.ratings_df = pd.read_csv(ratings_path)
-        self.users_df = pd.read_csv(users_path)
+        # Load datasets (through the columnar cache unless cache_dir is None)
+        self.ratings_path = ratings_path
+        self.products_df = load_table(products_path, self.cache_dir, compact=self.compact)
+        if self.time_window is not None:
+            if self.out_of_core:
+                raise ValueError("A time window is not available in out-of-core mode")
+            if self.cache_dir is None:
+                self.ratings_df = window_rows(load_table(ratings_path, None, compact=self.compact),
+                                              *self.time_window)
+            else:
+                # Only the month partitions overlapping the window are read
+                self.ratings_df = load_ratings(ratings_path, *self.time_window, cache_dir=self.cache_dir)
+        elif not self.out_of_core:
+            self.ratings_df = load_table(ratings_path, self.cache_dir, compact=self.compact)
+        self.users_df = load_table(users_path, self.cache_dir, compact=self.compact)
         
         # Display initial information
         print("\nProducts Dataset:")
         print(f"Shape: {self.products_df.shape}")
+        print(f"Memory: {memory_mb(self.products_df):.1f} MB")
         print("\nMissing Values:")
         print(self.products_df.isnull().sum())
         
         print("\nRatings Dataset:")
-        print(f"Shape: {self.ratings_df.shape}")
-        print("\nMissing Values:")
-        print(self.ratings_df.isnull().sum())
+        if self.out_of_core:
+            print(f"Streamed from {ratings_path} (out-of-core)")
+        else:
+            if self.time_window is not None:
+                start, end = self.time_window
+                print(f"Time window: {start or 'start'} to {end or 'latest'}")
+            print(f"Shape: {self.ratings_df.shape}")
+            print(f"Memory: {memory_mb(self.ratings_df):.1f} MB")
+            print("\nMissing Values:")
+            print(self.ratings_df.isnull().sum())
         
         return self.products_df, self.ratings_df, self.users_df
     
@@ -49,28 +128,44 @@ class ProductAnalysis:
         print("---------------")
         
         # Handle missing values
+        from sklearn.impute import SimpleImputer
         imputer = SimpleImputer(strategy='mean')
         numeric_columns = self.products_df.select_dtypes(include=[np.number]).columns
         self.products_df[numeric_columns] = imputer.fit_transform(self.products_df[numeric_columns])
         
         # Remove duplicates
         initial_products = len(self.products_df)
-        initial_ratings = len(self.ratings_df)
-        
         self.products_df.drop_duplicates(inplace=True)
-        self.ratings_df.drop_duplicates(inplace=True)
+        if self.out_of_core:
+            # Identical rows hash to the same partition, so deduplicating
+            # each partition on its own deduplicates the whole table
+            self._spill_path = tempfile.mkdtemp(prefix='ratings-spill-', dir=self.spill_dir)
+            self.rating_partitions, initial_ratings = partition_by_row_hash(
+                self.ratings_path, self._spill_path, self.partition_bytes, self.chunk_size)
+            final_ratings = dedupe_partitions(self.rating_partitions)
+        else:
+            initial_ratings = len(self.ratings_df)
+            self.ratings_df.drop_duplicates(inplace=True)
+            final_ratings = len(self.ratings_df)
         
         print(f"\nDuplicates removed from products: {initial_products - len(self.products_df)}")
-        print(f"Duplicates removed from ratings: {initial_ratings - len(self.ratings_df)}")
+        print(f"Duplicates removed from ratings: {initial_ratings - final_ratings}")
         
         # Handle inconsistent categories
         self.products_df['category'] = self.products_df['category'].str.strip().str.title()
         
         return self.products_df, self.ratings_df
     
-    def feature_engineering(self):
+    def feature_engineering(self, incremental=False):
         """
-        Create new features and select relevant ones for analysis
+        Create new features and select relevant ones for analysis.
+
+        Rating metrics come from per-product sufficient statistics. With
+        incremental=True they are loaded from stats_dir and only ratings
+        appended to the ratings file since the last run are folded in,
+        skipping rows that repeat earlier ones; the result is identical to a
+        full recompute over the file as it stands, after clean_data's
+        drop_duplicates.
         """
         print("\n3. Feature Engineering")
         print("--------------------")
@@ -79,16 +174,35 @@ class ProductAnalysis:
         self.products_df['price_category'] = pd.qcut(self.products_df['price'], q=5, labels=['Very Low', 'Low', 'Medium', 'High', 'Very High'])
         
         # Calculate product metrics
-        product_metrics = self.ratings_df.groupby('product_id').agg({
-            'rating': ['count', 'mean', 'std']
-        }).reset_index()
-        product_metrics.columns = ['product_id', 'rating_count', 'avg_rating', 'rating_std']
+        if incremental and self.out_of_core:
+            raise ValueError("Incremental statistics are not available in out-of-core mode")
+        if incremental and self.time_window is not None:
+            raise ValueError("Incremental statistics cover the whole ratings log, not a time window")
+        if incremental:
+            stats = RatingStats.load(self.stats_dir) or RatingStats()
+            folded = stats.update_from_log(self.ratings_path)
+            stats.save(self.stats_dir)
+            print(f"\nFolded {folded:,} new ratings into the saved statistics")
+        elif self.out_of_core:
+            stats, self.rating_value_counts = aggregate_partitions(self.rating_partitions,
+                                                                   workers=self.workers)
+            shutil.rmtree(self._spill_path, ignore_errors=True)
+            self.rating_partitions = self._spill_path = None
+        else:
+            stats = parallel_rating_stats(self.ratings_df, self.workers)
+        product_metrics = stats.metrics()
         
-        # Merge with products
-        self.products_df = self.products_df.merge(product_metrics, on='product_id', how='left')
+        # Gather onto products (metrics are sorted by product_id, so each
+        # product's row is a binary search, not a hash join); ratings-derived
+        # metrics replace catalogue ones
+        self.products_df = self.products_df.drop(columns=['rating_count', 'avg_rating', 'rating_std'],
+                                                 errors='ignore').reset_index(drop=True)
+        rows = IdDictionary(stats.product_ids).encode(self.products_df['product_id'].to_numpy())
+        for name in ['rating_count', 'avg_rating', 'rating_std']:
+            self.products_df[name] = gather(product_metrics[name].to_numpy(), rows)
         
         # Create popularity score
-        self.products_df['popularity_score'] = self.products_df['avg_rating'] * np.log1p(self.products_df['rating_count'])
+        self.products_df['popularity_score'] = popularity_score(self.products_df)
         
         print("\nNew Features Created:")
         print("- price_category: Price range categorization")
@@ -99,22 +213,58 @@ class ProductAnalysis:
         
         return self.products_df
     
-    def analyze_patterns(self):
+    def analyze_patterns(self, plot=True):
         """
-        Identify patterns, trends, and anomalies in the data
+        Identify patterns, trends, and anomalies in the data. plot=False
+        skips the figure (and loading matplotlib and seaborn).
         """
         print("\n4. Pattern Analysis")
         print("-----------------")
         
+        # Quartiles, whiskers and outliers are computed once and shared by
+        # the box plot and the outlier report
+        numeric_cols = ['price', 'avg_rating', 'rating_count']
+        self.box_stats = {col: box_stats(self.products_df, col) for col in numeric_cols}
+        if plot:
+            self._plot_patterns()
+        
+        # Identify outliers
+        print("\nOutlier Analysis:")
+        for col in numeric_cols:
+            stats = self.box_stats[col]
+            outliers = stats['n_outliers'][0] if stats['groups'] else 0
+            print(f"- {col}: {outliers} outliers detected")
+    
+    def _plot_patterns(self, path='analysis_patterns.png'):
+        plt = _pyplot()
+        import seaborn as sns
+        price_by_category = box_stats(self.products_df, 'price', by='category')
+        
         # Analyze rating distribution
         plt.figure(figsize=(15, 5))
         
         plt.subplot(1, 3, 1)
-        sns.histplot(self.ratings_df['rating'], bins=10)
+        if self.ratings_df is not None:
+            sns.histplot(self.ratings_df['rating'], bins=10)
+        else:
+            counts = self.rating_value_counts
+            sns.histplot(x=counts.index.to_numpy(), weights=counts.to_numpy(), bins=10).set_xlabel('rating')
         plt.title('Rating Distribution')
         
-        plt.subplot(1, 3, 2)
-        sns.boxplot(data=self.products_df, y='price', x='category')
+        ax = plt.subplot(1, 3, 2)
+        ax.bxp([
+            {
+                'label': group,
+                'q1': price_by_category['q1'][i],
+                'med': price_by_category['median'][i],
+                'q3': price_by_category['q3'][i],
+                'whislo': price_by_category['lowerfence'][i],
+                'whishi': price_by_category['upperfence'][i],
+                'mean': price_by_category['mean'][i],
+                'fliers': price_by_category['outliers'][i]
+            }
+            for i, group in enumerate(price_by_category['groups'])
+        ], showmeans=True)
         plt.xticks(rotation=45)
         plt.title('Price Distribution by Category')
         
@@ -123,18 +273,8 @@ class ProductAnalysis:
                        size='rating_count', hue='category', alpha=0.6)
         plt.title('Price vs Rating by Category')
         plt.tight_layout()
-        plt.savefig('analysis_patterns.png')
-        
-        # Identify outliers
-        print("\nOutlier Analysis:")
-        numeric_cols = ['price', 'avg_rating', 'rating_count']
-        for col in numeric_cols:
-            Q1 = self.products_df[col].quantile(0.25)
-            Q3 = self.products_df[col].quantile(0.75)
-            IQR = Q3 - Q1
-            outliers = len(self.products_df[(self.products_df[col] < (Q1 - 1.5 * IQR)) | 
-                                         (self.products_df[col] > (Q3 + 1.5 * IQR))])
-            print(f"- {col}: {outliers} outliers detected")
+        plt.savefig(path)
+        plt.close()
     
     def generate_summary(self):
         """
@@ -166,24 +306,91 @@ class ProductAnalysis:
         print(f"\nPrice-Rating Correlation: {correlation:.2f}")
         
         # Save summary to file
+        if self.ratings_df is not None:
+            n_ratings, mean_rating = len(self.ratings_df), self.ratings_df['rating'].mean()
+        else:
+            counts = self.rating_value_counts
+            n_ratings = int(counts.sum())
+            mean_rating = (counts.index.to_numpy() * counts.to_numpy()).sum() / n_ratings
         with open('analysis_summary.txt', 'w') as f:
             f.write("Product Analysis Summary\n")
             f.write("======================\n\n")
             f.write(f"Total Products: {len(self.products_df)}\n")
-            f.write(f"Total Ratings: {len(self.ratings_df)}\n")
-            f.write(f"Average Rating: {self.ratings_df['rating'].mean():.2f}\n")
+            f.write(f"Total Ratings: {n_ratings}\n")
+            f.write(f"Average Rating: {mean_rating:.2f}\n")
             f.write(f"Price-Rating Correlation: {correlation:.2f}\n")
             
-    def run_full_analysis(self, products_path, ratings_path, users_path):
+    def row_counts(self):
+        """Rows per loaded table"""
+        tables = {'products': self.products_df, 'ratings': self.ratings_df, 'users': self.users_df}
+        return {name: len(df) for name, df in tables.items() if df is not None}
+
+    def run_full_analysis(self, products_path, ratings_path, users_path, incremental=False, plot=True,
+                          recorder=None):
         """
-        Run the complete analysis pipeline
+        Run the complete analysis pipeline. With a PhaseRecorder, every
+        phase is timed and measured into it.
         """
-        self.load_data(products_path, ratings_path, users_path)
-        self.clean_data()
-        self.feature_engineering()
-        self.analyze_patterns()
-        self.generate_summary()
+        def phase(name):
+            return recorder.phase(name, self.row_counts) if recorder else nullcontext()
+
+        with phase('load_data'):
+            self.load_data(products_path, ratings_path, users_path)
+        with phase('clean_data'):
+            self.clean_data()
+        with phase('feature_engineering'):
+            self.feature_engineering(incremental)
+        with phase('analyze_patterns'):
+            self.analyze_patterns(plot)
+        with phase('generate_summary'):
+            self.generate_summary()
         
 if __name__ == "__main__":
-    analyzer = ProductAnalysis()
-    analyzer.run_full_analysis('data/products.csv', 'data/ratings.csv', 'data/users.csv')
+    parser = argparse.ArgumentParser(description="Product analysis")
+    parser.add_argument('--incremental', action='store_true',
+                        help="fold only new ratings into the saved rating statistics")
+    parser.add_argument('--no-plots', action='store_true', help="skip analysis_patterns.png")
+    parser.add_argument('--report', default=None, help="write per-phase timings and memory as JSON to this path")
+    parser.add_argument('--prometheus', default=None, help="also write them as a Prometheus textfile")
+    parser.add_argument('--profile', choices=PROFILERS, default=None, help="profile every phase")
+    parser.add_argument('--profile-dir', default='profiles')
+    parser.add_argument('--no-trace-memory', action='store_true', help="skip tracemalloc (it slows allocation)")
+    parser.add_argument('--out-of-core', action='store_true',
+                        help="stream ratings through hash-partitioned spill files instead of loading them")
+    parser.add_argument('--spill-dir', default=None, help="directory for out-of-core spill files")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="processes for the per-product rating aggregation")
+    parser.add_argument('--since', default=None, help="only ratings at or after this time (e.g. 2025-04-01)")
+    parser.add_argument('--until', default=None, help="only ratings before this time")
+    parser.add_argument('--last-days', type=int, default=None,
+                        help="only ratings from the N days up to the newest one")
+    args = parser.parse_args()
+    if args.out_of_core and args.incremental:
+        parser.error("--out-of-core and --incremental cannot be combined")
+    windowed = args.since or args.until or args.last_days
+    if windowed and (args.out_of_core or args.incremental):
+        parser.error("a time window cannot be combined with --out-of-core or --incremental")
+    if args.last_days and (args.since or args.until):
+        parser.error("--last-days cannot be combined with --since/--until")
+
+    time_window = None
+    if args.last_days:
+        time_window = last_days(args.last_days, 'data/ratings.csv')
+    elif windowed:
+        time_window = (args.since, args.until)
+
+    recorder = None
+    if args.report or args.prometheus or args.profile:
+        recorder = PhaseRecorder(not args.no_trace_memory, args.profile, args.profile_dir)
+
+    analyzer = ProductAnalysis(out_of_core=args.out_of_core, spill_dir=args.spill_dir, workers=args.workers,
+                               time_window=time_window)
+    analyzer.run_full_analysis('data/products.csv', 'data/ratings.csv', 'data/users.csv', args.incremental,
+                               plot=not args.no_plots, recorder=recorder)
+
+    if recorder:
+        recorder.print_table()
+        if args.report:
+            recorder.write_json(args.report)
+        if args.prometheus:
+            recorder.write_prometheus(args.prometheus)
@@ -0,0 +1,325 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+
+STATS_VERSION = 3
+DEFAULT_STATS_DIR = os.path.join('data', 'rating_stats')
+# Ratings are stored in fixed point (tenths), so sums are exact integers
+RATING_SCALE = 10
+# Bytes before the log offset that must be unchanged for an incremental read
+TAIL_CHECK_BYTES = 4096
+MOMENTS = ['count', 'total', 'total_sq']
+
+
+def _tail_sha256(path, offset):
+    with open(path, 'rb') as f:
+        f.seek(max(offset - TAIL_CHECK_BYTES, 0))
+        return hashlib.sha256(f.read(min(offset, TAIL_CHECK_BYTES))).hexdigest()
+
+
+def scaled_moments(codes, ratings, n_codes, scale=RATING_SCALE):
+    """
+    Rating count, sum and sum of squares per code in [0, n_codes), with
+    ratings in fixed point. NaN ratings are left out of all three. The sums
+    are exact int64 when every rating is on the 1/scale grid, float64 if not.
+    """
+    rated = ~np.isnan(ratings)
+    scaled = np.where(rated, ratings * scale, 0.0)
+    rounded = np.rint(scaled)
+    exact = np.allclose(scaled, rounded)
+    if exact:
+        scaled = rounded
+    count = np.bincount(codes[rated], minlength=n_codes).astype(np.int64)
+    total = np.bincount(codes, weights=scaled, minlength=n_codes)
+    total_sq = np.bincount(codes, weights=scaled * scaled, minlength=n_codes)
+    if exact:
+        total, total_sq = np.rint(total).astype(np.int64), np.rint(total_sq).astype(np.int64)
+    return count, total, total_sq
+
+
+def _promoted(values, other):
+    """values, as float64 if other is (exact sums meeting off-grid ones)"""
+    return values.astype(np.result_type(values, other), copy=False)
+
+
+def read_appended(path, offset):
+    """
+    Rows of a CSV log after byte offset `offset`, up to the last complete
+    line, with the header from the top of the file. Returns the frame (None
+    if there are no new complete lines) and the offset to continue from.
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+        start = max(offset, f.tell())
+        f.seek(start)
+        data = f.read()
+    end = data.rfind(b'\n') + 1
+    if end == 0:
+        return None, start
+    return pd.read_csv(io.BytesIO(header + data[:end])), start + end
+
+
+def row_hashes(frame):
+    """
+    64-bit hashes of the rows of a frame read from CSV, over a canonical
+    form of each value: float64 where it parses as a number (so 4, 4.0 and
+    "4" agree), text otherwise. A row hashes the same whichever dtypes
+    read_csv infers for the batch it arrives in.
+    """
+    canonical = {}
+    for name in frame.columns:
+        values = frame[name]
+        if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+            number, text = values.astype(np.float64), ''
+        else:
+            number = pd.to_numeric(values, errors='coerce').astype(np.float64)
+            text = values.where(number.isna(), '').astype(str)
+        canonical[f'{name}:number'] = number
+        canonical[f'{name}:text'] = text
+    return pd.util.hash_pandas_object(pd.DataFrame(canonical, index=frame.index), index=False).to_numpy()
+
+
+class RatingStats:
+    """
+    Per-product sufficient statistics of ratings: count, sum and sum of
+    squares.
+
+    Ratings are held in fixed point (RATING_SCALE) as int64, so merging a
+    batch is plain integer addition. That is associative, so statistics
+    folded in batch by batch are bit-identical to ones built from all
+    ratings at once, and so are the derived means, stds and popularity
+    scores. Ratings off the 1/RATING_SCALE grid (quarter steps, say) turn
+    the sums into float64: results then agree with a groupby to rounding,
+    not bit for bit. As in a groupby, NaN ratings are not counted and rows
+    without a product ID are skipped. A timestamp watermark and a byte
+    offset into the ratings log record what has been folded in.
+    """
+
+    def __init__(self, scale=RATING_SCALE):
+        self.scale = scale
+        self.product_ids = np.empty(0, dtype=np.int64)
+        self.count = np.empty(0, dtype=np.int64)
+        self.total = np.empty(0, dtype=np.int64)
+        self.total_sq = np.empty(0, dtype=np.int64)
+        self.watermark = None
+        self.watermark_rows = 0
+        self.source = None
+        self.offset = 0
+        self.tail_sha256 = None
+        # Sorted hashes of the log rows folded in, to skip repeats of them
+        self.row_hashes = np.empty(0, dtype=np.uint64)
+
+    @classmethod
+    def from_ratings(cls, ratings_df, scale=RATING_SCALE):
+        """Statistics over every rating in a frame (a full recompute)"""
+        stats = cls(scale)
+        stats._fold(ratings_df)
+        return stats
+
+    def _fold(self, ratings_df):
+        """Add a batch of ratings and advance the watermark past it"""
+        if len(ratings_df) == 0:
+            return 0
+        keep = ratings_df['product_id'].notna().to_numpy()
+        product_ids = ratings_df['product_id'].to_numpy()[keep]
+        if product_ids.dtype == object:
+            product_ids = product_ids.astype(str)
+        ratings = ratings_df['rating'].to_numpy(dtype=np.float64)[keep]
+
+        ids, inverse = np.unique(product_ids, return_inverse=True)
+        moments = scaled_moments(inverse, ratings, len(ids), self.scale)
+        if len(self.product_ids) == 0:
+            self.product_ids = self.product_ids.astype(ids.dtype)
+        merged_ids = np.union1d(self.product_ids, ids)
+        if len(merged_ids) != len(self.product_ids):
+            # New products: widen the arrays, keeping the IDs sorted
+            existing = np.searchsorted(merged_ids, self.product_ids)
+            for name in MOMENTS:
+                widened = np.zeros(len(merged_ids), dtype=getattr(self, name).dtype)
+                widened[existing] = getattr(self, name)
+                setattr(self, name, widened)
+            self.product_ids = merged_ids
+
+        positions = np.searchsorted(self.product_ids, ids)
+        for name, values in zip(MOMENTS, moments):
+            current = _promoted(getattr(self, name), values)
+            current[positions] += values
+            setattr(self, name, current)
+
+        timestamps = pd.to_datetime(ratings_df['timestamp']).to_numpy()
+        latest = timestamps.max()
+        if self.watermark is None or latest > self.watermark:
+            self.watermark, self.watermark_rows = latest, int((timestamps == latest).sum())
+        elif latest == self.watermark:
+            self.watermark_rows += int((timestamps == latest).sum())
+        return len(ratings_df)
+
+    def merge(self, other):
+        """
+        Add the ratings summarized by another RatingStats (for example one
+        built over a different partition of the ratings). Exact, like every
+        other update of on-grid ratings; returns self.
+        """
+        if other.scale != self.scale:
+            raise ValueError(f"Cannot merge statistics with scales {self.scale} and {other.scale}")
+        if len(self.product_ids) == 0:
+            merged_ids = other.product_ids.copy()
+        else:
+            merged_ids = np.union1d(self.product_ids, other.product_ids)
+        for name in MOMENTS:
+            merged = np.zeros(len(merged_ids), dtype=np.result_type(getattr(self, name), getattr(other, name)))
+            merged[np.searchsorted(merged_ids, self.product_ids)] += getattr(self, name)
+            merged[np.searchsorted(merged_ids, other.product_ids)] += getattr(other, name)
+            setattr(self, name, merged)
+        self.product_ids = merged_ids
+
+        if other.watermark is not None:
+            if self.watermark is None or other.watermark > self.watermark:
+                self.watermark, self.watermark_rows = other.watermark, other.watermark_rows
+            elif other.watermark == self.watermark:
+                self.watermark_rows += other.watermark_rows
+        return self
+
+    def update(self, ratings_df):
+        """
+        Fold in the ratings newer than the watermark; returns how many.
+        Ratings are assumed to arrive in timestamp order: rows at the
+        watermark timestamp beyond the ones already counted are new.
+        """
+        if self.watermark is None:
+            return self._fold(ratings_df)
+        timestamps = pd.to_datetime(ratings_df['timestamp']).to_numpy()
+        new = timestamps > self.watermark
+        new[np.flatnonzero(timestamps == self.watermark)[self.watermark_rows:]] = True
+        return self._fold(ratings_df[new])
+
+    def update_from_log(self, path):
+        """
+        Fold in the rows appended to a ratings CSV since the last call.
+
+        Only the bytes after the stored offset are read, up to the last
+        complete line, so the cost is proportional to the new ratings, plus
+        one linear copy of the 8-byte row hashes to insert the new ones (no
+        re-sort of the history). A row identical to one already in the log
+        is skipped, as clean_data's drop_duplicates does before a full
+        recompute, so the statistics equal RatingStats.from_ratings over the
+        log with duplicate rows dropped. If the file shrank, is a different
+        file or changed before the offset, the statistics are rebuilt from
+        scratch. Returns the number of rows folded in.
+        """
+        path = os.path.abspath(path)
+        size = os.path.getsize(path)
+        if (self.source != path or size < self.offset
+                or self.offset and _tail_sha256(path, self.offset) != self.tail_sha256):
+            self.__init__(self.scale)
+            self.source = path
+
+        delta, offset = read_appended(path, self.offset)
+        if delta is None:
+            return 0
+        hashes = row_hashes(delta)
+        first = np.zeros(len(hashes), dtype=bool)
+        first[np.unique(hashes, return_index=True)[1]] = True
+        positions = np.searchsorted(self.row_hashes, hashes)
+        inside = positions < len(self.row_hashes)
+        seen = np.zeros(len(hashes), dtype=bool)
+        seen[inside] = self.row_hashes[positions[inside]] == hashes[inside]
+        new = first & ~seen
+        folded = self._fold(delta[new])
+        # Merge the new hashes into the sorted history without re-sorting it
+        added = np.sort(hashes[new])
+        self.row_hashes = np.insert(self.row_hashes, np.searchsorted(self.row_hashes, added), added)
+        self.offset = offset
+        self.tail_sha256 = _tail_sha256(path, self.offset)
+        return folded
+
+    def metrics(self):
+        """rating_count, avg_rating and rating_std (ddof=1) per product_id"""
+        count = self.count.astype(np.float64)
+        total = self.total.astype(np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = total / count
+            variance = (self.total_sq - total * mean) / (count - 1)
+        return pd.DataFrame({
+            'product_id': self.product_ids,
+            'rating_count': self.count,
+            'avg_rating': mean / self.scale,
+            'rating_std': np.sqrt(np.maximum(np.where(count > 1, variance, np.nan), 0)) / self.scale
+        })
+
+    def equals(self, other):
+        """Whether two statistics hold exactly the same per-product values"""
+        return all(np.array_equal(getattr(self, name), getattr(other, name))
+                   for name in ['product_ids', 'count', 'total', 'total_sq'])
+
+    def save(self, path=DEFAULT_STATS_DIR):
+        """Write the statistics (.npy per array) and state.json atomically"""
+        tmp_path = path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name in ['product_ids', 'count', 'total', 'total_sq', 'row_hashes']:
+            np.save(os.path.join(tmp_path, f'{name}.npy'), getattr(self, name))
+        with open(os.path.join(tmp_path, 'state.json'), 'w') as f:
+            json.dump({
+                'version': STATS_VERSION,
+                'scale': self.scale,
+                'watermark': None if self.watermark is None else str(self.watermark),
+                'watermark_rows': self.watermark_rows,
+                'source': self.source,
+                'offset': self.offset,
+                'tail_sha256': self.tail_sha256
+            }, f, indent=2)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_STATS_DIR):
+        """Load saved statistics, or None if there are none of this version"""
+        try:
+            with open(os.path.join(path, 'state.json')) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get('version') != STATS_VERSION:
+            return None
+        stats = cls(state['scale'])
+        for name in ['product_ids', 'count', 'total', 'total_sq', 'row_hashes']:
+            setattr(stats, name, np.load(os.path.join(path, f'{name}.npy')))
+        stats.watermark = None if state['watermark'] is None else np.datetime64(state['watermark'])
+        stats.watermark_rows = state['watermark_rows']
+        stats.source = state['source']
+        stats.offset = state['offset']
+        stats.tail_sha256 = state['tail_sha256']
+        return stats
+
+
+def popularity_score(metrics):
+    """Average rating weighted by log rating count"""
+    return metrics['avg_rating'] * np.log1p(metrics['rating_count'])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fold new ratings into the persisted per-product statistics")
+    parser.add_argument('ratings', nargs='?', default='data/ratings.csv')
+    parser.add_argument('--state', default=DEFAULT_STATS_DIR)
+    parser.add_argument('--verify', action='store_true', help="compare against a full recompute")
+    args = parser.parse_args()
+
+    stats = RatingStats.load(args.state) or RatingStats()
+    start = time.perf_counter()
+    folded = stats.update_from_log(args.ratings)
+    elapsed = time.perf_counter() - start
+    stats.save(args.state)
+    print(f"Folded {folded:,} new ratings in {elapsed:.3f}s "
+          f"({len(stats.product_ids):,} products, watermark {stats.watermark})")
+
+    if args.verify:
+        full = RatingStats.from_ratings(pd.read_csv(args.ratings).drop_duplicates(), stats.scale)
+        same = full.equals(stats) and popularity_score(full.metrics()).equals(popularity_score(stats.metrics()))
+        print(f"Matches full recompute: {same}")
@@ -0,0 +1,239 @@
+import os
+import shutil
+import numpy as np
+import scipy.sparse as sp
+from data_store import load_table
+
+DEFAULT_MODEL_DIR = os.path.join('data', 'models', 'item_item')
+# Similarity blocks are sized to about this many nonzeros (plus at most one
+# item's row), about 100 MB of product at float32 values and int32 indices
+BLOCK_NNZ = 1 << 23
+
+
+def ratings_matrix(ratings_df):
+    """
+    Build the sparse user x item rating matrix.
+
+    Returns the CSR matrix plus the sorted external user and product IDs that
+    its rows and columns correspond to. Repeated (user, product) ratings are
+    averaged.
+    """
+    user_ids, user_index = np.unique(ratings_df['user_id'].to_numpy(), return_inverse=True)
+    item_ids, item_index = np.unique(ratings_df['product_id'].to_numpy(), return_inverse=True)
+    shape = (len(user_ids), len(item_ids))
+    ratings = ratings_df['rating'].to_numpy(dtype=np.float32)
+
+    sums = sp.csr_matrix((ratings, (user_index, item_index)), shape=shape)
+    counts = sp.csr_matrix((np.ones_like(ratings), (user_index, item_index)), shape=shape)
+    sums.data /= counts.data
+    return sums, user_ids, item_ids
+
+
+def top_k_per_row(block, k, diagonal_offset=None):
+    """
+    Column indices and values of the k largest positive entries of every
+    row of a CSR matrix, without densifying it. Rows with fewer entries are
+    padded with -1 / 0. With diagonal_offset, entry (row, row + offset) is
+    skipped (an item's similarity to itself).
+    """
+    n_rows = block.shape[0]
+    neighbors = np.full((n_rows, k), -1, dtype=np.int32)
+    scores = np.zeros((n_rows, k), dtype=np.float32)
+
+    rows = np.repeat(np.arange(n_rows), np.diff(block.indptr))
+    keep = block.data > 0
+    if diagonal_offset is not None:
+        keep &= block.indices != rows + diagonal_offset
+    rows, cols, values = rows[keep], block.indices[keep], block.data[keep]
+
+    # Sort by row, highest similarity first, and rank entries within a row
+    order = np.lexsort((-values, rows))
+    rows, cols, values = rows[order], cols[order], values[order]
+    row_starts = np.searchsorted(rows, np.arange(n_rows))
+    rank = np.arange(len(rows)) - row_starts[rows]
+
+    top = rank < k
+    neighbors[rows[top], rank[top]] = cols[top]
+    scores[rows[top], rank[top]] = values[top]
+    return neighbors, scores
+
+
+def similarity_blocks(items, user_counts, block_nnz=BLOCK_NNZ):
+    """
+    Row bounds of item blocks for items @ items.T of about block_nnz
+    nonzeros each. An item's row has at most one entry per item co-rated
+    with it, bounded by the summed rating counts of its raters (and the
+    number of items); a block holds at most one row past the budget.
+    """
+    n_items = items.shape[0]
+    rows = np.repeat(np.arange(n_items), np.diff(items.indptr))
+    row_nnz = np.minimum(np.bincount(rows, weights=user_counts[items.indices], minlength=n_items), n_items)
+    block = (np.cumsum(row_nnz) - row_nnz) // max(block_nnz, 1)
+    return np.r_[0, np.flatnonzero(np.diff(block)) + 1, n_items].astype(np.int64)
+
+
+class ItemItemRecommender:
+    """
+    Item-item collaborative filtering on the ratings matrix.
+
+    Similarities are (adjusted) cosine between item rating vectors. Only the
+    top-k neighbours of each item are kept; they are found block by block
+    with sparse matrix products, so the item x item matrix is never held in
+    memory. Each block takes as many items as fit in block_nnz nonzeros,
+    going by an upper bound on every item's co-rated items.
+    """
+
+    def __init__(self, k=50, adjusted=True, block_nnz=BLOCK_NNZ):
+        self.k = k
+        self.adjusted = adjusted
+        self.block_nnz = block_nnz
+        self.user_ids = None
+        self.item_ids = None
+        self.user_items = None
+        self.user_means = None
+        self.neighbors = None
+        self.scores = None
+
+    def fit(self, ratings_df):
+        """Build the rating matrix and precompute top-k item neighbours"""
+        matrix, self.user_ids, self.item_ids = ratings_matrix(ratings_df)
+        self.user_items = matrix
+
+        # Adjusted cosine: remove each user's rating bias before comparing items
+        row_counts = np.diff(matrix.indptr)
+        self.user_means = np.zeros(matrix.shape[0], dtype=np.float32)
+        if self.adjusted:
+            row_sums = np.asarray(matrix.sum(axis=1)).ravel()
+            self.user_means = (row_sums / np.maximum(row_counts, 1)).astype(np.float32)
+        centered = matrix.copy()
+        centered.data -= np.repeat(self.user_means, row_counts)
+
+        # Unit-normalize item vectors so dot products are cosine similarities
+        items = centered.T.tocsr()
+        norms = np.sqrt(np.asarray(items.multiply(items).sum(axis=1)).ravel())
+        items = sp.diags(np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)) @ items
+        items = items.tocsr().astype(np.float32)
+        items_t = items.T.tocsr()
+
+        n_items = items.shape[0]
+        bounds = similarity_blocks(items, row_counts, self.block_nnz)
+        self.neighbors = np.empty((n_items, self.k), dtype=np.int32)
+        self.scores = np.empty((n_items, self.k), dtype=np.float32)
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            block = (items[start:stop] @ items_t).tocsr()
+            self.neighbors[start:stop], self.scores[start:stop] = top_k_per_row(block, self.k, diagonal_offset=start)
+        return self
+
+    def _item_index(self, product_id):
+        i = np.searchsorted(self.item_ids, product_id)
+        return i if i < len(self.item_ids) and self.item_ids[i] == product_id else None
+
+    def _user_index(self, user_id):
+        u = np.searchsorted(self.user_ids, user_id)
+        return u if u < len(self.user_ids) and self.user_ids[u] == user_id else None
+
+    def similar_items(self, product_id, k=10):
+        """Up to k (product_id, similarity) pairs most similar to a product"""
+        i = self._item_index(product_id)
+        if i is None:
+            return []
+        neighbors = self.neighbors[i, :k]
+        valid = neighbors >= 0
+        return list(zip(self.item_ids[neighbors[valid]].tolist(), self.scores[i, :k][valid].tolist()))
+
+    def recommend_for_user(self, user_id, k=10, exclude_rated=True):
+        """
+        Up to k (product_id, predicted_rating) pairs for a user, scored as the
+        similarity-weighted average of the user's ratings over the
+        neighbourhoods of the items they rated
+        """
+        u = self._user_index(user_id)
+        if u is None:
+            return []
+        start, stop = self.user_items.indptr[u], self.user_items.indptr[u + 1]
+        rated = self.user_items.indices[start:stop]
+        ratings = self.user_items.data[start:stop] - self.user_means[u]
+
+        neighbors = self.neighbors[rated].ravel()
+        similarities = self.scores[rated].ravel()
+        weights = np.repeat(ratings, self.k)
+        valid = neighbors >= 0
+        if exclude_rated:
+            valid &= ~np.isin(neighbors, rated)
+        if not valid.any():
+            return []
+
+        candidates, inverse = np.unique(neighbors[valid], return_inverse=True)
+        numerator = np.bincount(inverse, weights=similarities[valid] * weights[valid])
+        denominator = np.bincount(inverse, weights=np.abs(similarities[valid]))
+        predicted = numerator / denominator + self.user_means[u]
+
+        top = np.argsort(-predicted)[:k] if len(predicted) <= k else np.argpartition(-predicted, k)[:k]
+        top = top[np.argsort(-predicted[top])]
+        return list(zip(self.item_ids[candidates[top]].tolist(), predicted[top].tolist()))
+
+    def save(self, path=DEFAULT_MODEL_DIR):
+        """
+        Write the model as one .npy file per array, into a new directory that
+        then replaces path, so processes with the old model memory-mapped
+        keep reading its unlinked files
+        """
+        tmp_path = path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        arrays = {
+            'user_ids': self.user_ids,
+            'item_ids': self.item_ids,
+            'user_means': self.user_means,
+            'neighbors': self.neighbors,
+            'scores': self.scores,
+            'indptr': self.user_items.indptr,
+            'indices': self.user_items.indices,
+            'data': self.user_items.data
+        }
+        for name, array in arrays.items():
+            if array.dtype == object:
+                # String IDs as fixed-width unicode: object arrays cannot be memory-mapped
+                array = array.astype(str)
+            np.save(os.path.join(tmp_path, f'{name}.npy'), array)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_MODEL_DIR, mmap=True):
+        """Load a saved model; arrays are memory-mapped unless mmap=False"""
+        mmap_mode = 'r' if mmap else None
+
+        def array(name):
+            return np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+
+        model = cls()
+        model.user_ids = array('user_ids')
+        model.item_ids = array('item_ids')
+        model.user_means = array('user_means')
+        model.neighbors = array('neighbors')
+        model.scores = array('scores')
+        model.k = model.neighbors.shape[1]
+        model.user_items = sp.csr_matrix(
+            (array('data'), array('indices'), array('indptr')),
+            shape=(len(model.user_ids), len(model.item_ids))
+        )
+        return model
+
+
+if __name__ == "__main__":
+    ratings_df = load_table('data/ratings.csv')
+    model = ItemItemRecommender().fit(ratings_df)
+    model.save()
+    print(f"Item-item model saved to {DEFAULT_MODEL_DIR}")
+    print(f"Users: {len(model.user_ids):,}  Products: {len(model.item_ids):,}")
+
+    product_id = ratings_df['product_id'].iloc[0]
+    print(f"\nProducts similar to {product_id}:")
+    for similar_id, score in model.similar_items(product_id, 5):
+        print(f"- {similar_id}: {score:.3f}")
+
+    user_id = ratings_df['user_id'].iloc[0]
+    print(f"\nRecommendations for user {user_id}:")
+    for product_id, score in model.recommend_for_user(user_id, 5):
+        print(f"- {product_id}: {score:.2f}")
@@ -0,0 +1,122 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Compact column types per table (the CSV's base name):
+#   'id'        int32 when every value fits, otherwise left as read
+#               (string IDs from the Amazon data stay strings)
+#   'category'  pandas Categorical
+#   'datetime'  datetime64[ns], left as strings if they do not parse
+#   'side'      long text, kept out of loads that do not ask for it by name
+# Ratings stay float64: as float32, tenths such as 1.4 land just below the
+# histogram bin edges they sit on, which would change the analysis results.
+SCHEMAS = {
+    'products': {'product_id': 'id', 'category': 'category', 'subcategory': 'category', 'description': 'side'},
+    'ratings': {'user_id': 'id', 'product_id': 'id', 'timestamp': 'datetime'},
+    'users': {'user_id': 'id', 'registration_date': 'datetime'}
+}
+INT32 = np.iinfo(np.int32)
+
+
+def table_schema(path):
+    """Column types of the table stored at path ({} for unknown tables)"""
+    return SCHEMAS.get(os.path.splitext(os.path.basename(path))[0], {})
+
+
+def side_columns(path):
+    """Columns of the table left out unless requested by name"""
+    return [name for name, kind in table_schema(path).items() if kind == 'side']
+
+
+def compact_column(series, kind):
+    """A column converted to its compact type, or unchanged if it does not fit"""
+    if kind == 'id':
+        if pd.api.types.is_integer_dtype(series) and (
+                series.empty or (series.min() >= INT32.min and series.max() <= INT32.max)):
+            return series.astype(np.int32)
+        return series
+    if kind == 'category':
+        return series.astype('category')
+    if kind == 'datetime':
+        try:
+            return pd.to_datetime(series)
+        except (ValueError, TypeError):
+            return series
+    return series
+
+
+def apply_schema(df, path):
+    """Convert the columns of a freshly read table to their compact types in place"""
+    for name, kind in table_schema(path).items():
+        if name in df.columns:
+            df[name] = compact_column(df[name], kind)
+    return df
+
+
+def memory_mb(df):
+    """Memory held by a frame, including the strings of object columns"""
+    return df.memory_usage(deep=True).sum() / (1 << 20)
+
+
+def memory_report(paths):
+    """Per-column memory of each table as read_csv infers it vs compact"""
+    for path in paths:
+        raw = pd.read_csv(path)
+        compact = apply_schema(raw.copy(), path).drop(columns=side_columns(path), errors='ignore')
+        before, after = raw.memory_usage(deep=True), compact.memory_usage(deep=True)
+        print(f"\n{path} ({len(raw):,} rows)")
+        print(f"{'column':<20}{'before':>16}{'after':>22}  MB")
+        for name in raw.columns:
+            kind = str(compact[name].dtype) if name in compact else 'side file'
+            after_mb = after[name] / (1 << 20) if name in compact else 0.0
+            print(f"{name:<20}{str(raw[name].dtype):>16}{kind:>22}{before[name] / (1 << 20):>8.1f} -> {after_mb:.1f}")
+        print(f"{'total':<20}{memory_mb(raw):>46.1f} MB -> {memory_mb(compact):.1f} MB")
+
+
+def verify_analysis(paths):
+    """
+    Run ProductAnalysis on tables as read_csv infers them and on compact
+    ones; returns whether the metrics, box statistics and summary match.
+    Both runs write their summary in a temporary directory, leaving
+    analysis_summary.txt alone.
+    """
+    from product_analysis import ProductAnalysis
+
+    paths = [os.path.abspath(p) for p in paths]
+    cwd, work_dir = os.getcwd(), tempfile.mkdtemp(prefix='verify-analysis-')
+    outputs = []
+    try:
+        os.chdir(work_dir)
+        for compact in (False, True):
+            analysis = ProductAnalysis(cache_dir=None, compact=compact)
+            with contextlib.redirect_stdout(io.StringIO()):
+                analysis.run_full_analysis(*paths, plot=False)
+            with open('analysis_summary.txt') as f:
+                summary = f.read()
+            metrics = analysis.products_df[['product_id', 'rating_count', 'avg_rating', 'rating_std',
+                                            'popularity_score']]
+            box = json.dumps(analysis.box_stats, sort_keys=True, default=float)
+            outputs.append((metrics, box, summary))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    (raw_metrics, raw_box, raw_summary), (metrics, box, summary) = outputs
+    return raw_metrics.equals(metrics) and raw_box == box and raw_summary == summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory of the data tables before and after the compact schema")
+    parser.add_argument('paths', nargs='*', default=['data/products.csv', 'data/ratings.csv', 'data/users.csv'])
+    parser.add_argument('--verify', action='store_true',
+                        help="also check that the analysis results are unchanged (needs products, ratings, users)")
+    args = parser.parse_args()
+
+    memory_report(args.paths)
+    if args.verify:
+        print(f"\nAnalysis results unchanged: {verify_analysis(args.paths)}")
@@ -0,0 +1,83 @@
+import argparse
+import gc
+import os
+import signal
+import socket
+from werkzeug.serving import make_server
+
+DEFAULT_WORKERS = 4
+DEFAULT_PORTS = {'dashboard': 8053, 'api': 8054}
+
+
+def load_app(name):
+    """WSGI app of the dashboard or the recommendation API"""
+    if name == 'dashboard':
+        import dashboard
+        return dashboard.server
+    import api
+    return api.create_app()
+
+
+def serve(name='dashboard', workers=DEFAULT_WORKERS, host='127.0.0.1', port=None, threaded=True):
+    """
+    Pre-forking server: bind the socket, load the app and its data once,
+    then fork `workers` processes that accept on the shared socket.
+
+    Workers share the parent's memory copy-on-write, and memory-mapped
+    columns through the page cache. gc.freeze() keeps the collector from
+    touching (and so copying) the preloaded objects. Workers that die are
+    replaced; SIGINT/SIGTERM stop them all. Without fork (or with one
+    worker) the app is served in this process.
+    """
+    port = port or DEFAULT_PORTS[name]
+    listener = socket.create_server((host, port), backlog=1024)
+    app = load_app(name)
+    print(f"Serving {name} on http://{host}:{port} with {workers} worker(s)")
+
+    if workers <= 1 or not hasattr(os, 'fork'):
+        make_server(host, port, app, threaded=threaded, fd=listener.fileno()).serve_forever()
+        return
+
+    gc.collect()
+    gc.freeze()
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                make_server(host, port, app, threaded=threaded, fd=listener.fileno()).serve_forever()
+            finally:
+                os._exit(0)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for _ in range(workers):
+        spawn()
+    while children:
+        pid, status = os.wait()
+        children.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited (status {status}); starting a replacement")
+            spawn()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-worker server for the dashboard or API")
+    parser.add_argument('app', nargs='?', choices=['dashboard', 'api'], default='dashboard')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=None)
+    args = parser.parse_args()
+
+    serve(args.app, args.workers, args.host, args.port)
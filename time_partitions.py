@@ -0,0 +1,210 @@
+import argparse
+import json
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+from data_store import DEFAULT_CACHE_DIR, cache_key, fingerprint_matches, load_table, source_fingerprint
+
+PARTITION_VERSION = 1
+# Rows whose timestamp is missing; only read by loads without a window
+UNDATED = 'undated'
+
+
+def partition_dir_for(ratings_path, cache_dir=DEFAULT_CACHE_DIR):
+    """Directory holding the month partitions of a ratings CSV"""
+    return os.path.join(cache_dir, cache_key(ratings_path) + '_by_month')
+
+
+def _read_manifest(partition_dir):
+    try:
+        with open(os.path.join(partition_dir, 'manifest.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(partition_dir, manifest):
+    tmp_path = os.path.join(partition_dir, 'manifest.json.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(partition_dir, 'manifest.json'))
+
+
+def build_partitions(ratings_path, partition_dir, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Write the ratings as one directory of .npy columns per calendar month,
+    ordered by timestamp within the month, plus a manifest with each
+    partition's row count and min/max timestamp. Returns the manifest.
+    """
+    ratings_df = load_table(ratings_path, cache_dir)
+    timestamps = ratings_df['timestamp'].to_numpy()
+    if not np.issubdtype(timestamps.dtype, np.datetime64):
+        raise ValueError(f"{ratings_path}: timestamps do not parse as dates; cannot partition by month")
+
+    # NaT sorts last, so undated rows form the final run
+    order = np.argsort(timestamps, kind='stable')
+    timestamps = timestamps[order]
+    months = timestamps.astype('datetime64[M]')
+    dated = int((~np.isnat(timestamps)).sum())
+    if dated:
+        starts = np.flatnonzero(np.r_[True, months[1:dated] != months[:dated - 1]])
+    else:
+        starts = np.empty(0, dtype=np.int64)
+    bounds = list(zip(starts, np.r_[starts[1:], dated])) + ([(dated, len(order))] if dated < len(order) else [])
+
+    partitions = []
+    for start, stop in bounds:
+        undated = start >= dated
+        partitions.append({
+            'name': UNDATED if undated else f'month={months[start]}',
+            'rows': int(stop - start),
+            'min_timestamp': None if undated else str(timestamps[start]),
+            'max_timestamp': None if undated else str(timestamps[stop - 1])
+        })
+
+    tmp_path = partition_dir + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    for partition in partitions:
+        os.makedirs(os.path.join(tmp_path, partition['name']))
+    columns = []
+    for name in ratings_df.columns:
+        values = ratings_df[name].to_numpy()
+        if values.dtype == object:
+            values = values.astype(str)
+        values = values[order]
+        for partition, (start, stop) in zip(partitions, bounds):
+            np.save(os.path.join(tmp_path, partition['name'], f'{name}.npy'), values[start:stop])
+        columns.append(name)
+
+    manifest = {
+        'version': PARTITION_VERSION,
+        'source': source_fingerprint(ratings_path),
+        'columns': columns,
+        'partitions': partitions
+    }
+    _write_manifest(tmp_path, manifest)
+    shutil.rmtree(partition_dir, ignore_errors=True)
+    os.replace(tmp_path, partition_dir)
+    return manifest
+
+
+def load_manifest(ratings_path='data/ratings.csv', cache_dir=DEFAULT_CACHE_DIR):
+    """The partition manifest, rebuilding the partitions if the CSV has changed"""
+    partition_dir = partition_dir_for(ratings_path, cache_dir)
+    manifest = _read_manifest(partition_dir)
+    if manifest is None or manifest.get('version') != PARTITION_VERSION:
+        fresh = False
+    else:
+        mtime_ns = manifest['source']['mtime_ns']
+        fresh = fingerprint_matches(ratings_path, manifest['source'])
+        if fresh and manifest['source']['mtime_ns'] != mtime_ns:
+            # Same content under a new mtime: remember it to skip hashing next time
+            _write_manifest(partition_dir, manifest)
+    if not fresh:
+        os.makedirs(cache_dir, exist_ok=True)
+        manifest = build_partitions(ratings_path, partition_dir, cache_dir)
+    return manifest
+
+
+def _bound(value):
+    return None if value is None else pd.Timestamp(value).to_datetime64()
+
+
+def select_partitions(manifest, start=None, end=None):
+    """Partitions whose [min, max] timestamps overlap [start, end)"""
+    start, end = _bound(start), _bound(end)
+    if start is None and end is None:
+        return list(manifest['partitions'])
+    return [p for p in manifest['partitions']
+            if p['min_timestamp'] is not None
+            and (start is None or np.datetime64(p['max_timestamp']) >= start)
+            and (end is None or np.datetime64(p['min_timestamp']) < end)]
+
+
+def latest_timestamp(ratings_path='data/ratings.csv', cache_dir=DEFAULT_CACHE_DIR):
+    """Timestamp of the newest rating, from the partition statistics alone"""
+    dated = [p['max_timestamp'] for p in load_manifest(ratings_path, cache_dir)['partitions'] if p['max_timestamp']]
+    return pd.Timestamp(max(dated)) if dated else None
+
+
+def last_days(days, ratings_path='data/ratings.csv', cache_dir=DEFAULT_CACHE_DIR):
+    """(start, end) window of the `days` days up to and including the newest rating"""
+    latest = latest_timestamp(ratings_path, cache_dir)
+    if latest is None:
+        return None, None
+    return latest - pd.Timedelta(days=days), None
+
+
+def window_rows(ratings_df, start=None, end=None):
+    """Rows of a loaded ratings frame with start <= timestamp < end (a full scan)"""
+    timestamps = pd.to_datetime(ratings_df['timestamp'])
+    mask = np.ones(len(ratings_df), dtype=bool)
+    if start is not None:
+        mask &= (timestamps >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        mask &= (timestamps < pd.Timestamp(end)).to_numpy()
+    return ratings_df[mask]
+
+
+def load_ratings(ratings_path='data/ratings.csv', start=None, end=None, columns=None, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Ratings with start <= timestamp < end (either bound may be None), read
+    from only the month partitions that can hold them. Partitions wholly
+    inside the window are memory-mapped and used as they are; only the ones
+    at its edges are filtered row by row, and with a binary search since
+    rows are in timestamp order within a partition.
+    """
+    manifest = load_manifest(ratings_path, cache_dir)
+    partition_dir = partition_dir_for(ratings_path, cache_dir)
+    columns = list(columns) if columns is not None else manifest['columns']
+    start, end = _bound(start), _bound(end)
+
+    pieces = {name: [] for name in columns}
+    for partition in select_partitions(manifest, start, end):
+        path = os.path.join(partition_dir, partition['name'])
+        first, last = 0, partition['rows']
+        inside = ((start is None or np.datetime64(partition['min_timestamp']) >= start)
+                  and (end is None or np.datetime64(partition['max_timestamp']) < end))
+        if not inside:
+            timestamps = np.load(os.path.join(path, 'timestamp.npy'), mmap_mode='r')
+            if start is not None:
+                first = int(np.searchsorted(timestamps, start, side='left'))
+            if end is not None:
+                last = int(np.searchsorted(timestamps, end, side='left'))
+        for name in columns:
+            pieces[name].append(np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')[first:last])
+
+    data = {}
+    for name in columns:
+        if len(pieces[name]) == 1:
+            data[name] = pieces[name][0]
+        elif pieces[name]:
+            data[name] = np.concatenate(pieces[name])
+        else:
+            # Empty window: zero rows of the column's stored dtype
+            first = manifest['partitions'][0]['name'] if manifest['partitions'] else None
+            dtype = np.load(os.path.join(partition_dir, first, f'{name}.npy'), mmap_mode='r').dtype if first else None
+            data[name] = np.empty(0, dtype=dtype)
+    return pd.DataFrame(data, copy=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Partition ratings by month and read a time window")
+    parser.add_argument('ratings', nargs='?', default='data/ratings.csv')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--last-days', type=int, default=30, help="window to read after building")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    manifest = load_manifest(args.ratings, args.cache_dir)
+    print(f"{len(manifest['partitions'])} partitions in {time.perf_counter() - start_time:.2f}s")
+    for p in manifest['partitions']:
+        print(f"  {p['name']:<16}{p['rows']:>12,}  {p['min_timestamp']} .. {p['max_timestamp']}")
+
+    start, end = last_days(args.last_days, args.ratings, args.cache_dir)
+    start_time = time.perf_counter()
+    window = load_ratings(args.ratings, start, end, cache_dir=args.cache_dir)
+    print(f"Last {args.last_days} days: {len(window):,} ratings from "
+          f"{len(select_partitions(manifest, start, end))} partition(s) in {time.perf_counter() - start_time:.3f}s")